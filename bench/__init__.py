@@ -0,0 +1,4 @@
+"""Benchmarks and local fakes for the mansion tools. Run modules from the repository root, e.g. python -m bench.bench_client.
+
+python -m bench runs the regression suite in bench/suite.py.
+"""
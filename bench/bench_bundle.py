@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-room and per-move latency of the verne web client, served
+directly from verne/ (rooms.json plus raw PNGs fetched on entry) against the
+output of verne/build-bundle.py (per-room JSON, neighbour prefetch).
+
+A synthetic mansion is served by a local static server whose responses share
+one throttled link (--mbps, plus --rtt per request). A simulated player
+walks a fixed random route, pausing --think seconds in each room; a move's
+latency is the time until the next room's data and background are available.
+Fetches run on six connections like a browser, with on-screen requests ahead
+of prefetches, and are cached like immutable assets, so the only difference
+between the two runs is what is fetched when.
+
+    python -m bench.bench_bundle --rooms 16 --image-kb 2000 --mbps 40 --think 1.0
+"""
+
+import argparse
+import functools
+import importlib.util
+import itertools
+import json
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONNECTIONS = 6
+
+
+def load_bundler():
+    """Import verne/build-bundle.py (hyphenated, so not importable by name)."""
+    spec = importlib.util.spec_from_file_location("build_bundle", os.path.join(REPO_ROOT, "verne", "build-bundle.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_mansion(root, count, image_bytes, seed=0):
+    """rooms.json for a grid-ish mansion of `count` rooms, with random-content PNG stand-ins."""
+    rng = random.Random(seed)
+    width = max(2, int(count ** 0.5))
+    names = [f"Room {i}" for i in range(count)]
+    rooms = []
+    for i, name in enumerate(names):
+        neighbours = [j for j in (i - 1, i + 1, i - width, i + width)
+                      if 0 <= j < count and (j // width == i // width or j % width == i % width)]
+        rooms.append({
+            "id": name,
+            "entry_text": f"You are in {name}. " + "Dust hangs in the air. " * 20,
+            "items": [{"name": "note", "type": "hint", "text": "Nothing here."}],
+            "exits": [{"name": f"door {j}", "to": names[j], "locked": False} for j in neighbours],
+        })
+    rooms[-1]["exits"].append({"name": "portal", "to": "END", "locked": False})
+    with open(os.path.join(root, "rooms.json"), "w") as f:
+        json.dump({"start_room": names[0], "end_room": "END", "rooms": rooms}, f, indent=2)
+    for name in names:
+        room_dir = os.path.join(root, "rooms", name.replace(" ", "_"))
+        os.makedirs(room_dir)
+        for state in ("before", "after"):
+            with open(os.path.join(room_dir, f"{state}.png"), "wb") as f:
+                f.write(rng.randbytes(image_bytes))
+    for name in ("verne2.html", "verne2.js", "verne2.css"):
+        shutil.copy(os.path.join(REPO_ROOT, "verne", name), root)
+    return rooms
+
+
+class Link:
+    """A shared bottleneck: bytes from all connections queue for the same bandwidth."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.free_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def send(self, size):
+        with self.lock:
+            start = max(time.monotonic(), self.free_at)
+            self.free_at = start + size / self.rate
+            done = self.free_at
+        time.sleep(max(0.0, done - time.monotonic()))
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    link = None
+    rtt = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.rtt)
+        super().do_GET()
+
+    def copyfile(self, source, outputfile):
+        for block in iter(lambda: source.read(64 * 1024), b""):
+            self.link.send(len(block))
+            outputfile.write(block)
+
+
+def start_server(directory, mbps, rtt):
+    handler = type("Handler", (ThrottledHandler,), {"link": Link(mbps * 1e6 / 8), "rtt": rtt})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+class Loader:
+    """
+    Browser stand-in: a few connections, a cache of every URL ever requested,
+    and requests for what is on screen jumping ahead of queued prefetches.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.queue = queue.PriorityQueue()
+        self.futures = {}
+        self.started = set()
+        self.order = itertools.count()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        for _ in range(CONNECTIONS):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        while True:
+            _, _, path = self.queue.get()
+            if path is None:
+                return
+            with self.lock:
+                if path in self.started:
+                    continue
+                self.started.add(path)
+            future = self.futures[path]
+            try:
+                with urllib.request.urlopen(self.base_url + path) as response:
+                    data = response.read()
+                with self.lock:
+                    self.bytes += len(data)
+                future.set_result(data)
+            except Exception as e:
+                future.set_exception(e)
+
+    def _request(self, path, priority):
+        with self.lock:
+            if path not in self.futures:
+                self.futures[path] = Future()
+            elif path in self.started or priority:
+                return self.futures[path]
+        # A path queued earlier as a prefetch is queued again at the higher priority
+        self.queue.put((priority, next(self.order), path))
+        return self.futures[path]
+
+    def prefetch(self, path):
+        return self._request(path, 1)
+
+    def get(self, path):
+        return self._request(path, 0).result()
+
+    def close(self):
+        for _ in range(CONNECTIONS):
+            self.queue.put((-1, next(self.order), None))
+
+
+def random_route(rooms, moves, seed):
+    rng = random.Random(seed)
+    graph = {room["id"]: [e["to"] for e in room["exits"] if e["to"] != "END"] for room in rooms}
+    route = [rooms[0]["id"]]
+    for _ in range(moves):
+        route.append(rng.choice(graph[route[-1]]))
+    return route
+
+
+def play_direct(base_url, route, think):
+    """verne2.js without a bundle: all of rooms.json up front, each PNG on entry."""
+    loader = Loader(base_url)
+    start = time.monotonic()
+    json.loads(loader.get("rooms.json"))
+    loader.get(f"rooms/{route[0].replace(' ', '_')}/before.png")
+    first_room = time.monotonic() - start
+    moves = []
+    for room_id in route[1:]:
+        time.sleep(think)
+        start = time.monotonic()
+        loader.get(f"rooms/{room_id.replace(' ', '_')}/before.png")
+        moves.append(time.monotonic() - start)
+    loader.close()
+    return first_room, moves, loader.bytes
+
+
+def play_bundle(base_url, route, think):
+    """verne2.js with bundle.json: per-room data, then prefetch what is near."""
+    loader = Loader(base_url)
+
+    def enter(room_id):
+        entry = bundle["rooms"][room_id]
+        loader.get(entry["data"])
+        loader.get(entry["images"]["before"]["src"])
+        for nearby in entry["prefetch"]["rooms"]:
+            loader.prefetch(bundle["rooms"][nearby]["data"])
+        for image_room, state in entry["prefetch"]["images"]:
+            loader.prefetch(bundle["rooms"][image_room]["images"][state]["src"])
+
+    start = time.monotonic()
+    bundle = json.loads(loader.get("bundle.json"))
+    enter(route[0])
+    first_room = time.monotonic() - start
+    moves = []
+    for room_id in route[1:]:
+        time.sleep(think)
+        start = time.monotonic()
+        enter(room_id)
+        moves.append(time.monotonic() - start)
+    loader.close()
+    return first_room, moves, loader.bytes
+
+
+def report(name, first_room, moves, transferred):
+    print(f"{name:<8} {first_room:>10.2f} {percentile(moves, 50):>9.2f} {percentile(moves, 95):>9.2f} "
+          f"{max(moves):>9.2f} {transferred / 1e6:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the web client with and without the asset bundle.")
+    parser.add_argument("--rooms", type=int, default=16)
+    parser.add_argument("--image-kb", type=int, default=2000, help="Size of each room image")
+    parser.add_argument("--mbps", type=float, default=40.0, help="Link bandwidth in Mbit/s")
+    parser.add_argument("--rtt", type=float, default=0.04, help="Seconds added to every request")
+    parser.add_argument("--think", type=float, default=1.0, help="Seconds the player spends in each room")
+    parser.add_argument("--moves", type=int, default=10)
+    parser.add_argument("--prefetch-depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    bundler = load_bundler()
+    with tempfile.TemporaryDirectory() as root:
+        rooms = make_mansion(root, args.rooms, args.image_kb * 1000, args.seed)
+        dist = os.path.join(root, "dist")
+        result = bundler.build(root, dist, depth=args.prefetch_depth)
+        print(f"{args.rooms} rooms, {args.image_kb} KB images, {args.mbps:g} Mbit/s, {args.rtt * 1000:.0f} ms RTT, "
+              f"{args.think:g}s per room; bundle built in {result['seconds']:.2f}s")
+        route = random_route(rooms, args.moves, args.seed)
+
+        print(f"{'client':<8} {'first room':>10} {'move p50':>9} {'move p95':>9} {'move max':>9} {'MB':>9}")
+        for name, directory, play in (("direct", root, play_direct), ("bundle", dist, play_bundle)):
+            server, base_url = start_server(directory, args.mbps, args.rtt)
+            try:
+                report(name, *play(base_url, route, args.think))
+            finally:
+                server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
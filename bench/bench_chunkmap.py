@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Startup time of mansion.py's --lazy chunked mansion against building the
+whole map with mkmap.generate_maze, plus the cost of a walk that keeps
+crossing into new chunks, and a check that evicted chunks come back
+identical.
+
+    python -m bench.bench_chunkmap --sizes 32 64 128 --floors 3
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import mkmap
+from chunkmap import ChunkedMansion
+
+
+def full_generation(size, floors, seed):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        mkmap.generate_maze(size, size, floors, seed=seed)
+    return time.perf_counter() - start
+
+
+def lazy_startup(size, floors, seed, chunk_size):
+    start = time.perf_counter()
+    mansion = ChunkedMansion(size, size, floors, seed=seed, chunk_size=chunk_size)
+    mansion.preload_around(*mansion.foyer_coords)
+    return time.perf_counter() - start
+
+
+def walk(mansion, steps, seed):
+    """Random walk through the doors; returns (seconds, rooms seen by id)."""
+    rng = random.Random(seed)
+    coords = mansion.foyer_coords
+    seen = {}
+    start = time.perf_counter()
+    for _ in range(steps):
+        room = mansion.get(coords)
+        seen[room["id"]] = room
+        exits = [target for target in room["connections"].values() if target]
+        coords = tuple(int(part) for part in rng.choice(exits).split("-"))
+        mansion.preload_around(*coords)
+    return time.perf_counter() - start, seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lazy chunked generation against mkmap.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>12} {'mkmap s':>9} {'lazy s':>9}")
+    for size in args.sizes:
+        rooms = size * size * args.floors
+        print(f"{rooms:>12} {full_generation(size, args.floors, args.seed):>9.3f} "
+              f"{lazy_startup(size, args.floors, args.seed, args.chunk_size):>9.4f}")
+    huge = 1_000_000
+    print(f"{huge * huge * 100:>12.0e} {'-':>9} {lazy_startup(huge, huge, 100, args.chunk_size):>9.4f}")
+
+    # Small LRU so that the walk keeps evicting and regenerating chunks
+    mansion = ChunkedMansion(huge, huge, 10, seed=args.seed, chunk_size=args.chunk_size, max_chunks=9)
+    seconds, seen = walk(mansion, args.steps, args.seed)
+    print(f"\nWalk of {args.steps} steps: {seconds:.2f}s, {len(seen)} rooms, "
+          f"{mansion.generated} chunks generated, {mansion.evicted} evicted, "
+          f"{mansion.loaded_chunks()} in memory")
+    fresh = ChunkedMansion(huge, huge, 10, seed=args.seed, chunk_size=args.chunk_size)
+    mismatched = sum(1 for room in seen.values() if fresh.get(tuple(room["coords"])) != room)
+    print(f"Rooms differing when regenerated from scratch: {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Throughput and backoff benchmark for llm_client against the local fake server.
+
+    python -m bench.bench_client --requests 64 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import time
+
+from llm_client import AsyncLLMClient, TokenBucket
+from bench.fake_openai import start_server
+
+
+def run_batch(base_url, n, **client_options):
+    client = AsyncLLMClient(api_key="fake", base_url=base_url, backoff_base=0.05, **client_options)
+    messages = [{"role": "user", "content": "Describe the Library."}]
+    start = time.monotonic()
+    client.run_all([client.chat(model="fake", messages=messages) for _ in range(n)])
+    return time.monotonic() - start, client.stats
+
+
+def run_serial(base_url, n):
+    """One blocking call at a time, as the tools did before the shared client."""
+    client = AsyncLLMClient(api_key="fake", base_url=base_url, max_in_flight=1)
+    messages = [{"role": "user", "content": "Describe the Library."}]
+    start = time.monotonic()
+    for _ in range(n):
+        client.chat_sync(model="fake", messages=messages)
+    return time.monotonic() - start
+
+
+async def drain(bucket, n):
+    for _ in range(n):
+        await bucket.acquire(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared LLM client against a fake server.")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    n = args.requests
+
+    server, url = start_server(latency=args.latency)
+    elapsed = run_serial(url, n)
+    print(f"serial            {n:>4} requests  {elapsed:6.2f}s  {n / elapsed:7.1f} req/s")
+    for window in (4, 16, 64):
+        server.state.max_in_flight = 0
+        elapsed, stats = run_batch(url, n, max_in_flight=window)
+        print(f"window={window:<10} {n:>4} requests  {elapsed:6.2f}s  {n / elapsed:7.1f} req/s"
+              f"  (server saw {server.state.max_in_flight} concurrent)")
+
+    # Token bucket pacing: with no burst allowance the rate is exactly the limit
+    bucket_rate = 1200
+    bucket = TokenBucket(bucket_rate, capacity=1)
+    start = time.monotonic()
+    asyncio.run(drain(bucket, 20))
+    elapsed = time.monotonic() - start
+    print(f"bucket {bucket_rate}/min     20 acquires  {elapsed:6.2f}s  {20 / elapsed:7.1f} /s"
+          f"  (limit {bucket_rate / 60:.0f}/s)")
+    server.shutdown()
+
+    # Backoff: a third of requests get 429 + Retry-After, all must still succeed
+    server, url = start_server(latency=args.latency, rate_limit_prob=0.3, retry_after=0.05)
+    elapsed, stats = run_batch(url, n, max_in_flight=16)
+    print(f"429 x 30%         {n:>4} requests  {elapsed:6.2f}s  retries={stats.retries} "
+          f"failures={stats.failures} backoff={stats.backoff_seconds:.2f}s "
+          f"(server sent {server.state.rate_limited} 429s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
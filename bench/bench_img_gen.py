@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Wall time of img-gen's job-graph scheduler against the previous per-room
+thread pool (generate then edit in the same worker), using the local fake
+image server with jittered latency. Both run with the same number of
+requests in flight: N pool workers against -j N/2, which allows N/2
+generations and N/2 edits at once.
+
+    python -m bench.bench_img_gen --rooms 24 --latency 0.3 --jitter 0.25
+"""
+
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_openai import start_server
+from llm_client import AsyncLLMClient, get_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_img_gen(base_url):
+    """Import verne/img-gen.py (hyphenated, so not importable by name) against the fake server."""
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["OPENAI_BASE_URL"] = base_url
+    # Its sibling modules are found through the script directory when run directly
+    sys.path.insert(0, os.path.join(REPO_ROOT, "verne"))
+    spec = importlib.util.spec_from_file_location("img_gen", os.path.join(REPO_ROOT, "verne", "img-gen.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.client = get_client() # main() would create it only once there are jobs
+    return module
+
+
+def make_rooms(root, count):
+    room_dirs = []
+    for i in range(count):
+        room_dir = os.path.join(root, f"Room_{i:03d}")
+        os.makedirs(room_dir)
+        with open(os.path.join(room_dir, "img-prompt.json"), "w") as f:
+            json.dump({"prompt": f"Room {i}", "transform": f"Room {i}, transformed"}, f)
+        room_dirs.append(room_dir)
+    return room_dirs
+
+
+def run_thread_pool(base_url, room_dirs, jobs):
+    """The previous strategy: one worker per room does before, then after."""
+    client = AsyncLLMClient(api_key="fake", base_url=base_url, max_in_flight=64)
+
+    def process_room(room_dir):
+        prompt = json.load(open(os.path.join(room_dir, "img-prompt.json")))
+        before = os.path.join(room_dir, "before.png")
+        response = client.generate_image_sync(model="fake", prompt=prompt["prompt"], n=1, size="1536x1024")
+        with open(before, "wb") as f:
+            f.write(base64.b64decode(response.data[0].b64_json))
+        response = client.edit_image_sync(before, model="fake", prompt=prompt["transform"])
+        with open(os.path.join(room_dir, "after.png"), "wb") as f:
+            f.write(base64.b64decode(response.data[0].b64_json))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(process_room, room_dirs))
+    return time.monotonic() - start
+
+
+def plan(img_gen, room_dirs, store_root):
+    store = img_gen.ImageStore(store_root)
+    planner = img_gen.Planner(store)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for room_dir in room_dirs:
+            planner.plan_room(room_dir)
+    return store, list(planner.jobs.values())
+
+
+def run_scheduler(img_gen, room_dirs, store_root, jobs):
+    """img-gen -j jobs: up to jobs generations and jobs edits in flight."""
+    start = time.monotonic()
+    store, planned = plan(img_gen, room_dirs, store_root)
+    with contextlib.redirect_stdout(io.StringIO()):
+        done, failed = img_gen.client.run(img_gen.run_jobs(planned, store, jobs, jobs))
+    assert failed == 0 and done == 2 * len(room_dirs), (done, failed)
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark img-gen scheduling against a fake image server.")
+    parser.add_argument("--rooms", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.25)
+    args = parser.parse_args()
+
+    server, url = start_server(latency=args.latency, jitter=args.jitter)
+    img_gen = load_img_gen(url)
+    print(f"{args.rooms} rooms, image latency {args.latency}s +/- {args.jitter}s")
+    print(f"{'in flight':>9} {'thread pool':>12} {'scheduler':>10} {'speedup':>8}")
+    for in_flight in (2, 4, 8, 16):
+        with tempfile.TemporaryDirectory() as old_root, tempfile.TemporaryDirectory() as new_root:
+            old = run_thread_pool(url, make_rooms(old_root, args.rooms), in_flight)
+            new = run_scheduler(img_gen, make_rooms(new_root, args.rooms), os.path.join(new_root, "store"),
+                                in_flight // 2)
+        print(f"{in_flight:>9} {old:>11.2f}s {new:>9.2f}s {old / new:>7.2f}x")
+
+    # Reruns: nothing to do when unchanged; one edited prompt redoes only that room
+    with tempfile.TemporaryDirectory() as root:
+        room_dirs = make_rooms(root, args.rooms)
+        store_root = os.path.join(root, "store")
+        run_scheduler(img_gen, room_dirs, store_root, 8)
+        print(f"rerun after completion plans {len(plan(img_gen, room_dirs, store_root)[1])} jobs")
+        with open(os.path.join(room_dirs[0], "img-prompt.json"), "w") as f:
+            json.dump({"prompt": "Room 0", "transform": "Room 0, flooded"}, f)
+        print(f"rerun after editing one transform prompt plans {len(plan(img_gen, room_dirs, store_root)[1])} jobs")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
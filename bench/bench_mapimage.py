@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+mkmap's PNG and SVG floor images: time to render every floor with numpy and
+with the plain Python fallback, in one process and in parallel, the file
+sizes, and checks that the outputs agree. Both paths must write the same
+bytes; tiling with one row of rooms per band must give the same pixels and
+the same SVG runs; and a decoded scale-1 PNG must show walls exactly where
+the ASCII map has '#', stairs on '<', '>' and 'X', and the Foyer and Portal
+on 'F' and 'P'. Exits with status 1 on any difference.
+
+    python -m bench.bench_mapimage --sizes 64x64x3 256x256x4
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+
+import mkmap
+
+
+def decode_png(path):
+    """
+    (width, height, pixel rows) of an 8-bit palette PNG without interlacing,
+    as written by mkmap: rows filtered with None, Sub or Up.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    width, height = struct.unpack(">II", data[16:24])
+    pos, idat = 8, []
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        if kind == b"IDAT":
+            idat.append(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    raw = zlib.decompress(b"".join(idat))
+    rows, previous = [], bytes(width)
+    for start in range(0, height * (width + 1), width + 1):
+        kind, line = raw[start], raw[start + 1:start + 1 + width]
+        if kind == 1:
+            line = bytes(itertools.accumulate(line, lambda a, b: (a + b) & 0xFF))
+        elif kind == 2:
+            line = bytes((a + b) & 0xFF for a, b in zip(previous, line))
+        elif kind != 0:
+            raise ValueError(f"{path}: unexpected PNG filter {kind}")
+        rows.append(line)
+        previous = line
+    return width, height, rows
+
+
+def ascii_mismatches(png_path, txt_path):
+    """Pixels of a scale-1 floor image that disagree with the ASCII map of the same floor."""
+    expected = {'#': {mkmap.WALL}, '<': {mkmap.STAIRS}, '>': {mkmap.STAIRS}, 'X': {mkmap.STAIRS},
+                'F': {mkmap.LANDMARK}, 'P': {mkmap.LANDMARK}}
+    open_cell = {mkmap.ROOM, mkmap.UNREACHED}
+    _, _, rows = decode_png(png_path)
+    with open(txt_path) as f:
+        lines = f.read().splitlines()
+    return sum(pixel not in expected.get(char, open_cell)
+               for row, line in zip(rows, lines) for pixel, char in zip(row, line))
+
+
+def render(rooms, workdir, name, formats, use_numpy, **options):
+    """Seconds to render every floor, and the paths written."""
+    saved = mkmap.np
+    if not use_numpy:
+        mkmap.np = None
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            paths = mkmap.output_image_maps(rooms, formats, prefix=os.path.join(workdir, name), **options)
+        return time.perf_counter() - start, paths
+    finally:
+        mkmap.np = saved
+
+
+def svg_runs(path):
+    """The set of (colour, x, y, length) runs drawn by an SVG of mkmap's, whatever paths they are in."""
+    runs = set()
+    with open(path) as f:
+        for colour, d in re.findall(r'<path fill="(#[0-9a-f]{6})" d="([^"]*)"', f.read()):
+            runs.update((colour, *run) for run in re.findall(r"M *(\d+) +(\d+)h *(\d+)", d))
+    return runs
+
+
+def same_files(first, second):
+    for a, b in zip(first, second):
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            if fa.read() != fb.read():
+                return False
+    return True
+
+
+def measure(size, args, workdir):
+    xmax, ymax, zmax = size
+    with contextlib.redirect_stdout(io.StringIO()):
+        rooms = mkmap.generate_maze(xmax, ymax, zmax, seed=args.seed)
+        old = os.getcwd()
+        os.chdir(workdir)
+        try:
+            mkmap.output_visual_maps(rooms)
+        finally:
+            os.chdir(old)
+
+    problems = []
+    timings = {}
+    outputs = {}
+    for fmt in ("png", "svg"):
+        for use_numpy in ((True, False) if mkmap.np is not None else (False,)):
+            key = (fmt, use_numpy)
+            timings[key], outputs[key] = render(rooms, workdir, f"{fmt}_{use_numpy}", [fmt], use_numpy,
+                                                scale=args.scale, workers=1)
+        if mkmap.np is not None and not same_files(outputs[fmt, True], outputs[fmt, False]):
+            problems.append(f"{fmt}: numpy and Python differ")
+    parallel, _ = render(rooms, workdir, "parallel", ["png"], mkmap.np is not None,
+                         scale=args.scale, workers=args.workers)
+
+    _, heat = render(rooms, workdir, "heat", ["png", "svg"], True, scale=args.scale, heatmap=True, workers=1)
+    _, heat_python = render(rooms, workdir, "heat_python", ["png", "svg"], False, scale=args.scale,
+                            heatmap=True, workers=1)
+    if not same_files(heat, heat_python):
+        problems.append("heatmap: numpy and Python differ")
+    _, banded = render(rooms, workdir, "banded", ["png", "svg"], True, scale=args.scale, workers=1,
+                       band_pixels=1)
+    if (decode_png(banded[0]) != decode_png(outputs["png", True][0])
+            or svg_runs(banded[1]) != svg_runs(outputs["svg", True][0])):
+        problems.append("one room row per band changes the image")
+
+    _, plain = render(rooms, workdir, "plain", ["png"], True, scale=1, workers=1)
+    mismatches = sum(ascii_mismatches(path, os.path.join(workdir, f"mansion_floor_{z}.txt"))
+                     for z, path in enumerate(plain))
+    if mismatches:
+        problems.append(f"{mismatches} pixels differ from the ASCII map")
+
+    fast = mkmap.np is not None
+    png_bytes = sum(os.path.getsize(path) for path in outputs["png", fast])
+    svg_bytes = sum(os.path.getsize(path) for path in outputs["svg", fast])
+    print(f"{xmax * ymax * zmax:>8} {timings['png', fast]:>7.2f} {timings['png', False]:>9.2f} {parallel:>10.2f} "
+          f"{timings['svg', fast]:>7.2f} {timings['svg', False]:>9.2f} {png_bytes / 1e6:>7.2f} {svg_bytes / 1e6:>7.2f}"
+          f"  {', '.join(problems) or 'ok'}")
+    return len(problems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check mkmap's PNG and SVG floor images.")
+    parser.add_argument("--sizes", nargs="+", default=["64x64x3", "256x256x4"], help="Map sizes as XxYxZ")
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the parallel render")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if mkmap.np is None:
+        print("numpy is not installed; timing the Python fallback only\n")
+
+    print(f"{'rooms':>8} {'png s':>7} {'png py s':>9} {'parallel s':>10} {'svg s':>7} {'svg py s':>9} "
+          f"{'png MB':>7} {'svg MB':>7}  check")
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for spec in args.sizes:
+            failures += measure(tuple(int(part) for part in spec.split("x")), args, workdir)
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        return 1
+    print("\nEvery image matched.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Time of mkmap.generate_maze by phase, with the extra-connection pass and
+the Portal selection run on numpy arrays and on the plain Python fallback,
+plus a check that both give the same map for the same seed. --draw-only
+times just the whole-grid draws and masks of the extra-connection pass
+(no Room objects), for grids too large to build.
+
+    python -m bench.bench_mkmap --sizes 64 128 256 --floors 3
+    python -m bench.bench_mkmap --draw-only --sizes 1000 2000 --floors 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import mkmap
+
+
+class PhaseTimer:
+    """Wraps mkmap's phase functions while active and adds up the time spent in each."""
+
+    PHASES = ("add_extra_connections", "calculate_distances_bfs", "farthest_cells")
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+
+    def _wrap(self, name, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+        return timed
+
+    def __enter__(self):
+        self.saved = {name: getattr(mkmap, name) for name in self.PHASES}
+        for name, function in self.saved.items():
+            setattr(mkmap, name, self._wrap(name, function))
+        return self
+
+    def __exit__(self, *exc):
+        for name, function in self.saved.items():
+            setattr(mkmap, name, function)
+
+
+def generate(size, floors, seed, numpy_module):
+    """(total seconds, seconds per phase, map as JSON) with mkmap.np set to numpy_module."""
+    saved_np, mkmap.np = mkmap.np, numpy_module
+    try:
+        with PhaseTimer() as timer, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            rooms = mkmap.generate_maze(size, size, floors, seed=seed)
+            total = time.perf_counter() - start
+    finally:
+        mkmap.np = saved_np
+    room_dicts = [room.to_dict() for plane in rooms for column in plane for room in column]
+    return total, timer.seconds, json.dumps(room_dicts, sort_keys=True)
+
+
+def draw_only(size, floors, seed, prob=0.05):
+    np = mkmap.np
+    rng = mkmap.CounterRNG(seed)
+    start = time.perf_counter()
+    index = np.arange(size * size * floors, dtype=np.uint64)
+    east = rng.random_array(mkmap.PURPOSE_EXTRA_EAST, index) < prob
+    south = rng.random_array(mkmap.PURPOSE_EXTRA_SOUTH, index) < prob
+    selected = int(np.count_nonzero(east)) + int(np.count_nonzero(south))
+    return time.perf_counter() - start, selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mkmap generation phases with and without numpy.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--draw-only", action="store_true", help="Only time the vectorised draws (needs numpy)")
+    args = parser.parse_args()
+
+    if mkmap.np is None:
+        parser.error("numpy is not installed; there is nothing to compare the Python fallback with")
+
+    if args.draw_only:
+        print(f"{'cells':>12} {'draw s':>9} {'selected':>10}")
+        for size in args.sizes:
+            seconds, selected = draw_only(size, args.floors, args.seed)
+            print(f"{size * size * args.floors:>12} {seconds:>9.3f} {selected:>10}")
+        return
+
+    print(f"{'cells':>10} {'path':>7} {'total s':>8} {'extras s':>9} {'BFS s':>7} {'portal s':>9} {'same map':>9}")
+    for size in args.sizes:
+        results = {name: generate(size, args.floors, args.seed, module)
+                   for name, module in (("numpy", mkmap.np), ("python", None))}
+        same = results["numpy"][2] == results["python"][2]
+        for name, (total, phases, _) in results.items():
+            print(f"{size * size * args.floors:>10} {name:>7} {total:>8.2f} "
+                  f"{phases['add_extra_connections']:>9.3f} {phases['calculate_distances_bfs']:>7.2f} "
+                  f"{phases['farthest_cells']:>9.4f} {'yes' if same else 'NO':>9}")
+
+
+if __name__ == "__main__":
+    main()
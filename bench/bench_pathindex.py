@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+pathindex.PathIndex on mkmap mansions: build time and memory, the first
+query toward a new goal, hint queries (next_step) toward a known one, and a
+whole route, against a plain BFS from the goal over the same passages.
+Every distance and next step of --pairs random queries is checked against
+that BFS, with clusters one floor deep and spanning all floors, and again
+after shiftmap has moved passages and the index has been updated. Exits
+with status 1 on any difference.
+
+    python -m bench.bench_pathindex --sizes 32x32x3 100x100x10 --pairs 200
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+import tracemalloc
+from array import array
+
+import mkmap
+from pathindex import PathIndex
+from shiftmap import DynamicMansion
+
+
+def bfs(index, target):
+    """Distances from target to every cell (-1 where unreachable) over the index's passages."""
+    distances = array('i', [-1]) * len(index.doors)
+    distances[target] = 0
+    frontier = [target]
+    distance = 0
+    doors, steps = index.doors, index.steps
+    while frontier:
+        distance += 1
+        following = []
+        for cell in frontier:
+            bits = doors[cell]
+            for _, bit, stride in steps:
+                if bits & bit and distances[cell + stride] < 0:
+                    distances[cell + stride] = distance
+                    following.append(cell + stride)
+        frontier = following
+    return distances
+
+
+def check(index, pairs, rng):
+    """Number of queries where the index disagrees with BFS."""
+    failures = 0
+    cells = len(index.doors)
+    targets = [rng.randrange(cells) for _ in range(max(1, pairs // 20))]
+    for target in targets:
+        expected = bfs(index, target)
+        target_id = index.room_id(target)
+        for _ in range(20):
+            start = rng.randrange(cells)
+            start_id = index.room_id(start)
+            distance = index.distance(start_id, target_id)
+            if distance != (expected[start] if expected[start] >= 0 else None):
+                failures += 1
+                continue
+            step = index.next_step(start_id, target_id)
+            if distance and expected[index.cell(step[1])] != distance - 1:
+                failures += 1
+    return failures
+
+
+def measure(size, args, rng):
+    xmax, ymax, zmax = size
+    with contextlib.redirect_stdout(io.StringIO()):
+        rooms = mkmap.generate_maze(xmax, ymax, zmax, seed=args.seed)
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = PathIndex.from_rooms(rooms, cluster_size=args.cluster_size)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rooms
+
+    cells = len(index.doors)
+    target = index.room_id(rng.randrange(cells))
+    start = time.perf_counter()
+    index.distance(index.room_id(0), target)
+    cold = time.perf_counter() - start
+
+    starts = [index.room_id(rng.randrange(cells)) for _ in range(1000)]
+    for start_id in starts: # Fill the clusters first; hints come from where the player is
+        index.next_step(start_id, target)
+    start = time.perf_counter()
+    for start_id in starts:
+        index.next_step(start_id, target)
+    hint = (time.perf_counter() - start) / len(starts)
+
+    start = time.perf_counter()
+    route = index.route(starts[0], target)
+    walk = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bfs(index, index.cell(target))
+    flat = time.perf_counter() - start
+
+    stats = index.stats()
+    failures = check(index, args.pairs, rng)
+    failures += check(PathIndex(xmax, ymax, zmax, bytearray(index.doors), cluster_size=args.cluster_size,
+                                cluster_floors=1), args.pairs, rng)
+    print(f"{cells:>8} {stats['entrances']:>9} {stats['skeleton']:>9} {build:>8.2f} {memory / cells:>7.0f} "
+          f"{cold * 1000:>8.1f} {hint * 1e6:>8.1f} {walk * 1000:>8.1f} {len(route or ()):>6} {flat * 1000:>8.1f}  "
+          f"{'ok' if not failures else f'{failures} MISMATCHES'}")
+    return failures
+
+
+def shifted(args, rng):
+    """Queries stay exact after DynamicMansion.shift and PathIndex.update."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        rooms = mkmap.generate_maze(24, 24, 3, seed=args.seed)
+    dynamic = DynamicMansion(rooms, rng=random.Random(args.seed))
+    index = PathIndex.from_rooms(rooms, cluster_size=args.cluster_size)
+    failures = 0
+    for _ in range(20):
+        dynamic.shift(4)
+        index.update(dynamic.by_id[room_id].to_dict() for room_id in dynamic.changed)
+        failures += check(index, 40, rng)
+    print(f"\nAfter 20 shifts of a 24x24x3 mansion: {'ok' if not failures else f'{failures} MISMATCHES'}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the hierarchical path index.")
+    parser.add_argument("--sizes", nargs="+", default=["32x32x3", "64x64x3", "100x100x10"], help="Map sizes as XxYxZ")
+    parser.add_argument("--cluster-size", type=int, default=8)
+    parser.add_argument("--pairs", type=int, default=200, help="Random queries checked against BFS per map")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'rooms':>8} {'entrances':>9} {'skeleton':>9} {'build s':>8} {'B/room':>7} {'cold ms':>8} "
+          f"{'hint us':>8} {'route ms':>8} {'steps':>6} {'BFS ms':>8}  check")
+    failures = 0
+    for spec in args.sizes:
+        failures += measure(tuple(int(part) for part in spec.split("x")), args, rng)
+    failures += shifted(args, rng)
+    if failures:
+        print(f"\n{failures} queries differed from BFS")
+        return 1
+    print("\nEvery query matched BFS.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
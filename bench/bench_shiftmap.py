@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Cost of shifting passages with incremental difficulty repair (shiftmap)
+against a full BFS from the Foyer after every change, on mkmap mansions of
+growing size. Every --check shifts the incremental difficulties are
+compared with a full recomputation.
+
+    python -m bench.bench_shiftmap --sizes 20 40 80 --floors 3 --shifts 500
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import mkmap
+from shiftmap import DynamicMansion
+
+
+def build(size, floors, seed):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return mkmap.generate_maze(size, size, floors, seed=seed)
+
+
+def run(size, floors, shifts, changes, seed, check):
+    mansion = DynamicMansion(build(size, floors, seed), rng=random.Random(seed))
+    incremental = full = 0.0
+    touched = 0
+    mismatches = 0
+    for i in range(shifts):
+        start = time.perf_counter()
+        mansion.shift(changes)
+        incremental += time.perf_counter() - start
+        touched += len(mansion.changed)
+
+        if check and i % check == 0:
+            expected = {room.id: room.difficulty for room in mansion.room_list}
+        start = time.perf_counter()
+        mansion.recompute()
+        full += time.perf_counter() - start
+        if check and i % check == 0:
+            mismatches += sum(1 for room in mansion.room_list if room.difficulty != expected[room.id])
+    return incremental, full, touched, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental difficulty repair against full BFS.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 40, 80])
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--shifts", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=2, help="Passages closed/opened per shift")
+    parser.add_argument("--check", type=int, default=10, help="Verify against full BFS every N shifts (0: never)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>8} {'incremental ms':>15} {'full BFS ms':>12} {'speedup':>8} {'rooms touched':>14} {'mismatches':>11}")
+    for size in args.sizes:
+        incremental, full, touched, mismatches = run(size, args.floors, args.shifts, args.changes,
+                                                     args.seed, args.check)
+        print(f"{size * size * args.floors:>8} {incremental / args.shifts * 1000:>15.3f} "
+              f"{full / args.shifts * 1000:>12.3f} {full / incremental:>7.0f}x "
+              f"{touched / args.shifts:>14.1f} {mismatches:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the generation tools, measured with `python -X importtime`:
+wall time and total import time of --help and other runs that should never
+need the API, and whether the openai SDK was imported at all. `import
+openai` on its own is shown for reference. Exits with status 1 if any of
+these runs imported the SDK, so it can serve as an acceptance check.
+
+    python -m bench.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERNE = os.path.join(REPO_ROOT, "verne")
+
+# (label, argv after the interpreter, working directory, may import openai)
+CASES = [
+    ("import openai", ["-c", "import openai"], REPO_ROOT, True),
+    ("import scaffold", ["-c", "import scaffold"], REPO_ROOT, False),
+    ("scaffold.py --help", ["scaffold.py", "--help"], REPO_ROOT, False),
+    ("img-gen.py --help", ["img-gen.py", "--help"], VERNE, False),
+    ("img-prompt-writer.py --help", ["img-prompt-writer.py", "--help"], VERNE, False),
+    ("img-prompt-writer.py --report-savings", ["img-prompt-writer.py", "--report-savings"], VERNE, False),
+]
+
+
+def parse_importtime(stderr):
+    """(total import microseconds, imported module names) from -X importtime output."""
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "): # Top-level imports; nested ones are inside their cumulative time
+            total += int(cumulative)
+    return total, modules
+
+
+def measure(argv, cwd, runs):
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None) # None of these runs should need credentials
+    env["HOME"] = os.path.join(cwd, "nonexistent-home") # ... or ~/.openai.secret
+    walls, imports = [], []
+    modules = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=cwd, env=env,
+                                capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        total, seen = parse_importtime(result.stderr)
+        imports.append(total)
+        modules |= seen
+    return statistics.median(walls), statistics.median(imports), "openai" in modules, result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tool startup with -X importtime.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'run':<40} {'wall ms':>8} {'imports ms':>11} {'openai':>7} {'exit':>5}")
+    failures = []
+    for label, argv, cwd, may_import in CASES:
+        wall, imports, imported, status = measure(argv, cwd, args.runs)
+        print(f"{label:<40} {wall * 1000:>8.0f} {imports / 1000:>11.0f} {'yes' if imported else 'no':>7} {status:>5}")
+        if imported and not may_import:
+            failures.append(label)
+    if failures:
+        print(f"\nImported the openai SDK: {', '.join(failures)}")
+        return 1
+    print("\nNo tool imported the openai SDK before it needed it.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON extraction, replayed from recorded .chat logs.
+
+  - replay: every recorded reply (plain, in a ```json fence, after a
+    preamble) is streamed by the local fake server and parsed as it arrives
+    with json_stream.IncrementalJSONParser; the result must equal the
+    recorded JSON, and the point at which each top-level field completed is
+    shown;
+  - extract: json_stream.extract_json against the regex extractor scaffold.py
+    used before, on replies buried in growing amounts of noise;
+  - pipeline: scaffold.py's room pipeline against the fake server with and
+    without --stream, where a streamed room definition lets the puzzle start
+    as soon as the objects are listed.
+
+Exits with status 1 if any reply is parsed or extracted differently, so it
+doubles as the check for json_stream.py.
+
+    python -m bench.bench_stream --chat-dir artifacts --rooms 4 -j 8 --chunk-delay 0.002
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import tempfile
+import time
+
+import llm_client
+import scaffold
+from bench.fake_openai import start_server
+from json_stream import IncrementalJSONParser, extract_json
+from llm_client import AsyncLLMClient
+
+VARIANTS = {
+    "plain": "{}",
+    "fenced": "```json\n{}\n```",
+    "preamble": "Here is the room you asked for:\n\n{}\n\nLet me know if you need changes.",
+}
+
+
+def recorded_replies(directories):
+    """(path, reply text) of every .chat log whose reply is a JSON object."""
+    replies = []
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, "**", "*.chat"), recursive=True)):
+            with open(path) as f:
+                log = f.read()
+            reply = log.split("## Assistant Message ##\n", 1)[-1].split("\n---------- USAGE", 1)[0].strip()
+            try:
+                if isinstance(json.loads(reply), dict):
+                    replies.append((path, reply))
+            except json.JSONDecodeError:
+                pass
+    return replies
+
+
+def legacy_extract(text):
+    """scaffold.extract_json_from_response before json_stream, kept for comparison."""
+    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
+    if match:
+        try:
+            return json.dumps(json.loads(match.group(1)))
+        except json.JSONDecodeError:
+            pass
+    match = re.search(r"(\{[\s\S]*\})", text)
+    if match:
+        try:
+            return json.dumps(json.loads(match.group(1)))
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+# ---------------------------------------------------------------------------
+#  Replay through the streaming stub
+# ---------------------------------------------------------------------------
+def replay(replies, base_url):
+    """Stream each reply variant and parse it incrementally; returns the number of mismatches."""
+    client = AsyncLLMClient(api_key="fake", base_url=base_url)
+    failures = 0
+    print(f"{'reply':<48} {'variant':<9} {'chars':>6}  fields complete at (% of reply)")
+    for index, (path, reply) in enumerate(replies):
+        expected = json.loads(reply)
+        for variant in VARIANTS:
+            parser = IncrementalJSONParser()
+            received = [0]
+            arrivals = []
+
+            def on_delta(text):
+                received[0] += len(text)
+                before = len(parser.fields)
+                parser.feed(text)
+                arrivals.extend((name, received[0]) for name in list(parser.fields)[before:])
+
+            messages = [{"role": "user", "content": f"replay {index} {variant}"}]
+            response = client.chat_stream_sync(on_delta=on_delta, model="fake", messages=messages)
+            total = len(response.choices[0].message.content)
+            ok = parser.done and parser.result() == expected
+            failures += not ok
+            fields = ", ".join(f"{name} {at / total:.0%}" for name, at in arrivals)
+            print(f"{os.path.relpath(path)[-48:]:<48} {variant:<9} {total:>6}  {fields}{'' if ok else '  MISMATCH'}")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+#  Fallback extraction
+# ---------------------------------------------------------------------------
+def noisy(reply, size):
+    """reply after size characters of prose holding stray braces, with an unclosed '{' and trailing text."""
+    prose = "The clockwork {mechanism} hums. "
+    return (prose * (size // len(prose) + 1))[:size] + " { see below:\n```json\n" + reply + "\n```\nDone. }"
+
+
+def time_call(function, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def extract(replies, sizes):
+    failures = 0
+    reply = max((reply for _, reply in replies), key=len)
+    expected = json.loads(reply)
+    print(f"\n{'noise chars':>12} {'regex ms':>10} {'linear ms':>10}  result")
+    for size in sizes:
+        text = noisy(reply, size)
+        legacy_time, legacy = time_call(legacy_extract, text)
+        linear_time, linear = time_call(extract_json, text)
+        ok = linear is not None and json.loads(linear) == expected
+        failures += not ok
+        legacy_ok = "found" if legacy is not None and json.loads(legacy) == expected else "missed"
+        print(f"{size:>12} {legacy_time * 1000:>10.2f} {linear_time * 1000:>10.2f}  "
+              f"{'ok' if ok else 'MISMATCH'} (regex {legacy_ok})")
+    # Unbalanced braces make the greedy regex backtrack over the whole text from every '{'
+    for size in sizes:
+        text = "{" * size
+        legacy_time, _ = time_call(legacy_extract, text, repeat=1)
+        linear_time, _ = time_call(extract_json, text, repeat=1)
+        print(f"{size:>12} {legacy_time * 1000:>10.2f} {linear_time * 1000:>10.2f}  unclosed braces only")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+#  scaffold.py pipeline
+# ---------------------------------------------------------------------------
+def pipeline_responder(room_reply, rooms):
+    """Replies for scaffold.py's stages: the recorded room definition, and others of typical length."""
+    structure = {"rooms": [{"name": f"Room {i}", "theme": "Dust and brass.", "exits": {"N": "door"}}
+                           for i in range(rooms)]}
+    sentence = "The brass gears turn slowly beneath a film of dust. "
+    puzzle = {field: sentence * 8 for field in ("puzzle_setup", "interactions", "logic", "solution", "reward")}
+    clues = {"clues": [{"location": "Study", "form": "A note.", "hint_text": sentence * 10} for _ in range(3)]}
+
+    def respond(request):
+        system = request["messages"][0]["content"]
+        if system == scaffold.GAME_STRUCTURE_SYSTEM:
+            return json.dumps(structure)
+        if system == scaffold.ROOM_DEFINITION_SYSTEM:
+            return room_reply
+        if system == scaffold.PUZZLE_GENERATOR_SYSTEM:
+            return json.dumps(puzzle)
+        if system == scaffold.CLUE_GENERATOR_SYSTEM:
+            return json.dumps(clues)
+        return json.dumps({"description": sentence * 6})
+    return respond
+
+
+def run_scaffold(stream, jobs, workdir):
+    """Wall time of scaffold.main_example with an empty cache in workdir."""
+    os.makedirs(workdir)
+    scaffold.CHAT_CACHE_PATH = os.path.join(workdir, "chat_cache.sqlite3")
+    scaffold.BUILD_MANIFEST_PATH = os.path.join(workdir, "build_manifest.json")
+    scaffold._response_cache = scaffold._build_manifest = None
+    saved = os.getcwd()
+    os.chdir(workdir) # The .chat logs go to artifacts/ in the working directory
+    try:
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scaffold.main_example(jobs=jobs, stream=stream)
+        return time.monotonic() - start
+    finally:
+        scaffold.get_build_manifest().save()
+        os.chdir(saved)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded replies through the streaming JSON parser.")
+    parser.add_argument("--chat-dir", action="append", help="Directory searched for .chat logs (default: artifacts)")
+    parser.add_argument("--stream-chunk", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.002, help="Seconds between streamed chunks")
+    parser.add_argument("--noise", type=int, nargs="+", default=[1000, 10000, 100000], help="Noise sizes for the extractor")
+    parser.add_argument("--rooms", type=int, default=4, help="Rooms in the pipeline comparison (0 to skip it)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="scaffold.py -j; above the room count so early puzzles get a worker")
+    args = parser.parse_args()
+
+    replies = recorded_replies(args.chat_dir or ["artifacts"])
+    if not replies:
+        parser.error("no recorded .chat replies found")
+
+    def respond(request):
+        content = request["messages"][-1]["content"]
+        if content.startswith("replay "):
+            _, index, variant = content.split()
+            return VARIANTS[variant].replace("{}", replies[int(index)][1])
+        return responder(request)
+
+    room_reply = next((reply for path, reply in replies if "interactable_objects" in reply), replies[0][1])
+    responder = pipeline_responder(room_reply, args.rooms)
+    server, base_url = start_server(stream_chunk=args.stream_chunk, chunk_delay=args.chunk_delay, chat_responder=respond)
+    failures = replay(replies, base_url)
+    failures += extract(replies, args.noise)
+
+    if args.rooms:
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["OPENAI_BASE_URL"] = base_url
+        llm_client._shared_client = None
+        with tempfile.TemporaryDirectory() as workdir:
+            plain = run_scaffold(False, args.jobs, os.path.join(workdir, "plain"))
+            streamed = run_scaffold(True, args.jobs, os.path.join(workdir, "stream"))
+        print(f"\nscaffold.py, {args.rooms} rooms, -j {args.jobs}: {plain:.2f}s, with --stream {streamed:.2f}s "
+              f"({1 - streamed / plain:+.0%} faster)")
+    server.shutdown()
+
+    if failures:
+        print(f"\n{failures} replies parsed differently from the recording")
+        return 1
+    print("\nAll recorded replies parsed identically.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
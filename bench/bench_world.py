@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+mkmap mansions turned into verne worlds by mapworld.py, at growing sizes:
+conversion time and tracemalloc peak against mapworld's own estimate, then
+load time (JSON and schema validation) and command dispatch throughput of
+verne/mansion_game.py on the result. Exits with status 1 if a world fails
+validation (an unsolvable lock included) or a conversion used more memory
+than estimated, so it doubles as the check for mapworld.py.
+
+    python -m bench.bench_world --sizes 10x10x10 32x32x10 100x100x10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import mapworld
+import mkmap
+import schema
+from verne import mansion_game
+
+
+def make_map(size, workdir, seed):
+    xmax, ymax, zmax = size
+    path = os.path.join(workdir, f"map_{xmax}x{ymax}x{zmax}.json")
+    with contextlib.redirect_stdout(io.StringIO()):
+        mkmap.output_json(mkmap.generate_maze(xmax, ymax, zmax, seed=seed), path)
+    return path
+
+
+def convert(map_path, world_path, lock_prob):
+    tracemalloc.start()
+    try:
+        summary = mapworld.convert(map_path, world_path, seed=1, lock_prob=lock_prob)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summary, peak
+
+
+def dispatch(data, commands, seed=1):
+    """Commands per second of a scripted player choosing among the actions on offer."""
+    rng = random.Random(seed)
+    remaining = [commands]
+    game = mansion_game.MansionGame(data)
+
+    def scripted_input(prompt=""):
+        remaining[0] -= 1
+        if remaining[0] < 0:
+            return "quit"
+        return rng.choice(mansion_game.list_actions(game.rooms[game.current]) or ["inventory"])
+
+    mansion_game.input = scripted_input # Shadows the builtin inside the module
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            while remaining[0] >= 0:
+                try:
+                    game.play()
+                except SystemExit: # Walked through the portal; start again
+                    game = mansion_game.MansionGame(data)
+    finally:
+        del mansion_game.input
+    return commands / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mapworld.py conversions and the worlds they produce.")
+    parser.add_argument("--sizes", nargs="+", default=["10x10x10", "32x32x10", "100x100x10"],
+                        help="Map sizes as XxYxZ")
+    parser.add_argument("--lock-prob", type=float, default=0.05)
+    parser.add_argument("--commands", type=int, default=20000, help="Commands dispatched per world")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'rooms':>8} {'locks':>6} {'convert s':>10} {'peak MB':>8} {'est MB':>7} {'MB out':>7} "
+          f"{'load s':>7} {'validate s':>11} {'cmds/s':>8}  result")
+    with tempfile.TemporaryDirectory() as workdir:
+        for spec in args.sizes:
+            size = tuple(int(part) for part in spec.split("x"))
+            map_path = make_map(size, workdir, args.seed)
+            world_path = os.path.join(workdir, "world.json")
+            summary, peak = convert(map_path, world_path, args.lock_prob)
+
+            start = time.perf_counter()
+            data = mansion_game.load_game(Path(world_path)) # Validates, exiting on errors
+            load = time.perf_counter() - start
+            with open(world_path) as f:
+                document = json.load(f)
+            start = time.perf_counter()
+            errors = schema.validate_game(document)
+            validate = time.perf_counter() - start
+            rate = dispatch(data, args.commands, args.seed)
+
+            problems = []
+            if errors:
+                problems.append(f"{len(errors)} validation errors")
+            if peak > summary["estimated_bytes"]:
+                problems.append("over the memory estimate")
+            failures += bool(problems)
+            print(f"{summary['rooms']:>8} {summary['locks']:>6} {summary['seconds']:>10.2f} {peak / 1e6:>8.1f} "
+                  f"{summary['estimated_bytes'] / 1e6:>7.1f} {os.path.getsize(world_path) / 1e6:>7.1f} "
+                  f"{load:>7.2f} {validate:>11.2f} {rate:>8.0f}  {', '.join(problems) or 'ok'}")
+    if failures:
+        print(f"\n{failures} world(s) failed")
+        return 1
+    print("\nEvery world validated and stayed within its memory estimate.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
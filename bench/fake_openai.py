@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the OpenAI HTTP API the tools use:
+    POST /v1/chat/completions
+    POST /v1/images/generations
+    POST /v1/images/edits
+
+Latency, jitter and a fraction of 429 responses (with Retry-After) are
+configurable so throughput and backoff can be measured without the network.
+Chat requests with "stream": true are answered as server-sent events, the
+reply split into --stream-chunk character pieces sent --chunk-delay seconds
+apart; a non-streamed reply takes just as long, so the two compare fairly.
+Point any tool at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python -m bench.fake_openai --port 8765 --latency 0.2 --rate-limit 0.1
+"""
+
+import argparse
+import base64
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def tiny_png(width=4, height=4, rgb=(90, 70, 40)):
+    """A valid solid-colour PNG, small enough to hand back for every image request."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    raw = b"".join(b"\x00" + bytes(rgb) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+def default_chat_responder(request):
+    """Reply with a small JSON object so callers using response_format=json_object are happy."""
+    last = request.get("messages", [{}])[-1].get("content", "")
+    return json.dumps({"echo": last[:40], "description": "A fake room.", "prompt": "p", "transform": "t"})
+
+
+class FakeOpenAIState:
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_prob=0.0, retry_after=0.0,
+                 chat_responder=default_chat_responder, image_latency=None, stream_chunk=16, chunk_delay=0.0):
+        self.latency = latency
+        self.stream_chunk = max(1, stream_chunk)
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+        self.image_latency = latency if image_latency is None else image_latency
+        self.rate_limit_prob = rate_limit_prob
+        self.retry_after = retry_after
+        self.chat_responder = chat_responder
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.image_bytes = tiny_png()
+
+    def enter(self, path):
+        with self.lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request, pieces, usage, chunk_delay):
+        """Server-sent chat.completion.chunk events, ending with usage if asked for and [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(choices, chunk_usage=None):
+            return json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                               "model": request.get("model", "fake"), "choices": choices, "usage": chunk_usage})
+
+        event(chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        for piece in pieces:
+            time.sleep(chunk_delay)
+            event(chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+        event(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event(chunk([], usage))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0]
+        state.enter(path)
+        try:
+            if random.random() < state.rate_limit_prob:
+                with state.lock:
+                    state.rate_limited += 1
+                self._send_json(429, {"error": {"message": "Rate limit reached (fake)", "type": "requests"}},
+                                {"Retry-After": str(state.retry_after)})
+                return
+
+            is_image = path.startswith("/v1/images/")
+            delay = state.image_latency if is_image else state.latency
+            time.sleep(max(0.0, delay + random.uniform(-state.jitter, state.jitter)))
+
+            if path == "/v1/chat/completions":
+                request = json.loads(body or b"{}")
+                content = state.chat_responder(request)
+                prompt_tokens = max(1, len(json.dumps(request.get("messages", []))) // 4)
+                completion_tokens = max(1, len(content) // 4)
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                pieces = [content[i:i + state.stream_chunk] for i in range(0, len(content), state.stream_chunk)]
+                if request.get("stream"):
+                    self._send_stream(request, pieces, usage, state.chunk_delay)
+                    return
+                time.sleep(len(pieces) * state.chunk_delay) # As long as streaming the same reply
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                })
+            elif is_image:
+                self._send_json(200, {
+                    "created": int(time.time()),
+                    "data": [{"b64_json": base64.b64encode(state.image_bytes).decode("ascii")}],
+                })
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {path}"}})
+        finally:
+            state.leave()
+
+
+def start_server(port=0, **state_options):
+    """Start the fake server on a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.state = FakeOpenAIState(**state_options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per chat request")
+    parser.add_argument("--image-latency", type=float, default=None, help="Seconds per image request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on latency")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--stream-chunk", type=int, default=16, help="Characters per streamed chat chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chat chunks")
+    args = parser.parse_args()
+
+    server, url = start_server(args.port, latency=args.latency, jitter=args.jitter,
+                               rate_limit_prob=args.rate_limit, retry_after=args.retry_after,
+                               image_latency=args.image_latency, stream_chunk=args.stream_chunk,
+                               chunk_delay=args.chunk_delay)
+    print(f"Fake OpenAI API listening on {url} (Ctrl-C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
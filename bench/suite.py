@@ -0,0 +1,364 @@
+"""
+Benchmark suite for the main code paths, run as `python -m bench`:
+
+  - mkmap: generate_maze, calculate_distances_bfs, output_json and
+    output_visual_maps over a sweep of map sizes;
+  - mansion.py: loading a map and building frames, with a headless stand-in
+    for curses driving the real game loop;
+  - verne/mansion_game: load_game and command dispatch throughput.
+
+Each case is timed over --repeat runs (the median is reported), then run
+once more under tracemalloc for its peak memory. Results can be saved as a
+JSON baseline; later runs compared with it fail (exit status 1) when a case
+got slower or hungrier by more than the threshold.
+
+    python -m bench --save-baseline
+    python -m bench --compare --threshold 0.25
+    python -m bench -k mkmap --sizes 32 64
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import mansion
+import mkmap
+from verne import mansion_game
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class Discard(io.TextIOBase):
+    """stdout sink for the tools' progress prints."""
+
+    def write(self, text):
+        return len(text)
+
+
+def quiet():
+    return contextlib.redirect_stdout(Discard())
+
+
+# ---------------------------------------------------------------------------
+#  Headless curses for mansion.py
+# ---------------------------------------------------------------------------
+class FakeCurses:
+    """The parts of the curses module mansion.py uses, without a terminal."""
+
+    A_BOLD = 1 << 16
+    A_REVERSE = 1 << 17
+    COLOR_BLACK, COLOR_RED, COLOR_GREEN, COLOR_YELLOW, COLOR_BLUE, COLOR_MAGENTA, COLOR_CYAN, COLOR_WHITE = range(8)
+
+    class error(Exception):
+        pass
+
+    @staticmethod
+    def color_pair(n):
+        return n << 8
+
+    @staticmethod
+    def curs_set(visibility):
+        pass
+
+    @staticmethod
+    def start_color():
+        pass
+
+    @staticmethod
+    def init_pair(pair, foreground, background):
+        pass
+
+
+class FakeScreen:
+    """A stdscr that takes keys from a script and only counts what is drawn."""
+
+    def __init__(self, keys, rows=50, cols=160):
+        self.keys = iter(keys)
+        self.rows, self.cols = rows, cols
+        self.frames = 0
+        self.cells = 0
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def getkey(self):
+        return next(self.keys, 'q')
+
+    def getch(self):
+        return -1
+
+    def addch(self, y, x, char, attr=0):
+        self.cells += 1
+
+    def addstr(self, y, x, text, attr=0):
+        self.cells += len(text)
+
+    def refresh(self):
+        self.frames += 1
+
+    def erase(self):
+        pass
+
+    clear = erase
+
+    def nodelay(self, flag):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+
+def mansion_args(map_path):
+    """mansion.py's own defaults, for --map map_path."""
+    saved = sys.argv
+    sys.argv = ["mansion.py", "--map", map_path]
+    try:
+        return mansion.parse_args()
+    finally:
+        sys.argv = saved
+
+
+# ---------------------------------------------------------------------------
+#  Cases: each setup returns (function to time, operations per call)
+# ---------------------------------------------------------------------------
+def build_maze(size, floors, seed=1):
+    with quiet():
+        return mkmap.generate_maze(size, size, floors, seed=seed)
+
+
+def case_generate_maze(size, floors):
+    return (lambda: build_maze(size, floors)), size * size * floors
+
+
+def case_distances(size, floors):
+    rooms = build_maze(size, floors)
+    foyer = next(room for plane in rooms for column in plane for room in column if room.is_foyer)
+
+    def run():
+        with quiet():
+            mkmap.calculate_distances_bfs(foyer, rooms, size, size, floors)
+    return run, size * size * floors
+
+
+def case_output_json(size, floors, workdir):
+    rooms = build_maze(size, floors)
+    path = os.path.join(workdir, f"map_{size}.json")
+
+    def run():
+        with quiet():
+            mkmap.output_json(rooms, path)
+    return run, size * size * floors
+
+
+def case_output_visual(size, floors, workdir):
+    rooms = build_maze(size, floors)
+
+    def run():
+        saved = os.getcwd()
+        os.chdir(workdir) # output_visual_maps writes mansion_floor_<z>.txt to the working directory
+        try:
+            with quiet():
+                mkmap.output_visual_maps(rooms)
+        finally:
+            os.chdir(saved)
+    return run, size * size * floors
+
+
+def write_map(size, floors, workdir):
+    path = os.path.join(workdir, f"map_{size}.json")
+    if not os.path.exists(path):
+        with quiet():
+            mkmap.output_json(build_maze(size, floors), path)
+    return path
+
+
+def case_mansion_load(size, floors, workdir):
+    path = write_map(size, floors, workdir)
+    screen = FakeScreen([])
+    return (lambda: mansion.load_json_map(screen, path)), 1
+
+
+def case_mansion_frames(size, floors, workdir, moves=200, seed=1):
+    path = write_map(size, floors, workdir)
+    args = mansion_args(path)
+    rng = random.Random(seed)
+    keys = [rng.choice("hjkl<>") for _ in range(moves)] + ['q']
+
+    def run():
+        screen = FakeScreen(keys)
+        saved, mansion.curses = mansion.curses, FakeCurses
+        try:
+            mansion.main(screen, args)
+        finally:
+            mansion.curses = saved
+        return screen.frames
+    return run, len(keys)
+
+
+def make_game(rooms, seed=1):
+    """A verne rooms.json-shaped mansion: a grid of rooms with hint items and unlocked exits, and a locked way out."""
+    rng = random.Random(seed)
+    width = max(2, int(rooms ** 0.5))
+    names = [f"Room {i}" for i in range(rooms)]
+    room_list = []
+    for i, name in enumerate(names):
+        neighbours = [j for j in (i - 1, i + 1, i - width, i + width)
+                      if 0 <= j < rooms and (j // width == i // width or j % width == i % width)]
+        room_list.append({
+            "id": name,
+            "entry_text": f"You are in **{name}**. " + "Dust hangs in the air. " * rng.randint(5, 20),
+            "items": [{"name": f"note{i}", "type": "hint", "text": "Nothing **here**."}],
+            "exits": [{"name": f"door{j}", "to": names[j], "locked": False} for j in neighbours],
+        })
+    # A way out, so the game passes load-time validation; the scripted player never gives the answer
+    room_list[-1]["items"].append({"name": "dial", "type": "riddle", "prompt": "Set the dial.",
+                                   "answer": "seventeen", "success_text": "Click.", "gives_item": "brass key"})
+    room_list[-1]["exits"].append({"name": "portal", "to": "END", "locked": True, "key": "brass key"})
+    return {"start_room": names[0], "end_room": "END", "rooms": room_list}
+
+
+def case_load_game(rooms, workdir):
+    path = Path(workdir) / f"game_{rooms}.json"
+    path.write_text(json.dumps(make_game(rooms)))
+    return (lambda: mansion_game.load_game(path)), rooms
+
+
+def case_dispatch(rooms, commands=5000, seed=1):
+    data = make_game(rooms)
+    data["room_index"] = {room["id"]: room for room in data["rooms"]}
+
+    def run():
+        game = mansion_game.MansionGame(data)
+        rng = random.Random(seed)
+        remaining = [commands]
+
+        def scripted_input(prompt=""):
+            remaining[0] -= 1
+            if remaining[0] < 0:
+                return "quit"
+            roll = rng.random()
+            if roll < 0.05:
+                return rng.choice(("inventory", "help", "xyzzy"))
+            return rng.choice(mansion_game.list_actions(game.rooms[game.current]))
+
+        mansion_game.input = scripted_input # Shadows the builtin inside the module
+        try:
+            with quiet():
+                game.play()
+        finally:
+            del mansion_game.input
+    return run, commands
+
+
+def cases(sizes, floors, game_sizes, workdir):
+    """(name, setup) for every case; setup is only called for the selected ones."""
+    for size in sizes:
+        tag = f"[{size}x{size}x{floors}]"
+        yield f"mkmap.generate_maze{tag}", lambda s=size: case_generate_maze(s, floors)
+        yield f"mkmap.calculate_distances_bfs{tag}", lambda s=size: case_distances(s, floors)
+        yield f"mkmap.output_json{tag}", lambda s=size: case_output_json(s, floors, workdir)
+        yield f"mkmap.output_visual_maps{tag}", lambda s=size: case_output_visual(s, floors, workdir)
+        yield f"mansion.load_json_map{tag}", lambda s=size: case_mansion_load(s, floors, workdir)
+        yield f"mansion.frames{tag}", lambda s=size: case_mansion_frames(s, floors, workdir)
+    for rooms in game_sizes:
+        yield f"mansion_game.load_game[{rooms}]", lambda r=rooms: case_load_game(r, workdir)
+        yield f"mansion_game.dispatch[{rooms}]", lambda r=rooms: case_dispatch(r)
+
+
+# ---------------------------------------------------------------------------
+#  Running and comparing
+# ---------------------------------------------------------------------------
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "peak_bytes": peak}
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Lines describing every case that regressed beyond the thresholds."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append(f"{name}: {before['seconds'] * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms")
+        if result["peak_bytes"] > before["peak_bytes"] * (1 + memory_threshold):
+            regressions.append(f"{name}: peak {before['peak_bytes'] / 1e3:.1f} kB -> {result['peak_bytes'] / 1e3:.1f} kB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark generation, loading, rendering and game logic.")
+    parser.add_argument("-k", dest="select", action="append", default=[], help="Only run cases whose name contains this (repeatable)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 32, 64], help="mkmap/mansion.py map sizes (rooms per side)")
+    parser.add_argument("--floors", type=int, default=3)
+    parser.add_argument("--game-rooms", type=int, nargs="+", default=[100, 1000], help="verne mansion sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file (default: bench/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail if a case regressed against --baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (default: 0.25)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="Allowed peak memory growth (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        except FileNotFoundError:
+            parser.error(f"no baseline at {args.baseline}; run with --save-baseline first")
+
+    results = {}
+    print(f"{'case':<44} {'median ms':>10} {'min ms':>9} {'ops/s':>12} {'peak MB':>8} {'vs base':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup in cases(args.sizes, args.floors, args.game_rooms, workdir):
+            if args.select and not any(s in name for s in args.select):
+                continue
+            function, ops = setup()
+            result = measure(function, args.repeat)
+            results[name] = result
+            before = baseline.get(name)
+            change = f"{result['seconds'] / before['seconds'] - 1:+.0%}" if before else "-"
+            print(f"{name:<44} {result['seconds'] * 1000:>10.2f} {result['min_seconds'] * 1000:>9.2f} "
+                  f"{ops / result['seconds']:>12.0f} {result['peak_bytes'] / 1e6:>8.2f} {change:>8}")
+
+    if args.save_baseline:
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                saved = json.load(f)["results"]
+        saved.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.node(), "results": saved}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond the thresholds:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions.")
+    return 0
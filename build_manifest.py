@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+What each content-pipeline step was last built from.
+
+The response cache (chat_cache.py) already makes reruns incremental: a step
+whose model, temperature and messages are unchanged is answered from the
+cache, and since a step's prompt embeds its upstream outputs, a changed
+room only misses along its own chain. What the cache cannot say is *why* a
+step misses, or which steps a rerun would touch before it is made.
+
+The manifest records, per step (its .chat log base, e.g.
+artifacts/puzzle/Study_Desk), the hashes of its inputs and output:
+model parameters, system prompt (template text), user prompt (template
+plus room inputs and upstream outputs) and response. scaffold.py updates it
+on every call and uses it in --dry-run to explain each step that would be
+rebuilt.
+
+Usage:
+    python build_manifest.py [artifacts/build_manifest.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_MANIFEST_PATH = os.path.join("artifacts", "build_manifest.json")
+
+
+def sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint(model, temperature, messages):
+    """Hashes of the inputs of one model call, kept apart so a change can be explained."""
+    system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    user = "\n".join(m["content"] for m in messages if m["role"] != "system")
+    return {"model": model, "temperature": float(temperature), "system": sha(system), "user": sha(user)}
+
+
+class BuildManifest:
+    """step -> {"inputs": fingerprint, "output": hash}; safe to share between pipeline threads."""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path) as f:
+                self.steps = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.steps = {}
+
+    def record(self, step, inputs, output):
+        entry = {"inputs": inputs, "output": sha(output)}
+        with self._lock:
+            if self.steps.get(step) != entry:
+                self.steps[step] = entry
+                self._dirty = True
+
+    def why_stale(self, step, inputs):
+        """Why a step with these inputs would be rebuilt, or None if they match the last build."""
+        with self._lock:
+            entry = self.steps.get(step)
+        if entry is None:
+            return "never built"
+        previous = entry["inputs"]
+        if previous == inputs:
+            return None
+        if (previous["model"], previous["temperature"]) != (inputs["model"], inputs["temperature"]):
+            return f"model parameters changed ({previous['model']} t={previous['temperature']} -> " \
+                   f"{inputs['model']} t={inputs['temperature']})"
+        if previous["system"] != inputs["system"]:
+            return "system prompt changed"
+        return "prompt changed (template or inputs)"
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.steps, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the steps recorded in a build manifest.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_MANIFEST_PATH)
+    args = parser.parse_args()
+    manifest = BuildManifest(args.path)
+    for step, entry in sorted(manifest.steps.items()):
+        inputs = entry["inputs"]
+        print(f"{step:<60} {inputs['model']:<18} t={inputs['temperature']:<4} "
+              f"system={inputs['system']} user={inputs['user']} -> {entry['output']}")
+    print(f"{len(manifest.steps)} steps")
+
+
+if __name__ == "__main__":
+    main()
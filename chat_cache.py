@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for chat completions.
+
+Entries are keyed by a hash of (model, temperature, messages) and kept in a
+single SQLite file, so a changed prompt is a cache miss and two rooms with
+similar names can never share an entry. The human-readable .chat logs written
+by scaffold.py are only a side artefact; they can be imported once so that
+existing runs stay warm (see import_chat_log).
+
+Usage:
+    python chat_cache.py stats
+    python chat_cache.py import artifacts
+    python chat_cache.py evict --max-mb 64 --max-age-days 30
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+DEFAULT_CACHE_PATH = os.path.join("artifacts", "chat_cache.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICT_EVERY = 64 # Check size limits after this many writes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    response TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+CREATE INDEX IF NOT EXISTS entries_created ON entries(created);
+"""
+
+
+def make_key(model, temperature, messages):
+    """Stable hash of everything that determines a completion."""
+    payload = json.dumps(
+        {"model": model, "temperature": float(temperature), "messages": messages},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_chat_log(log_file_path):
+    """
+    Parse a .chat log written by scaffold.create_chat_completion.
+    Returns a dict with model, temperature, messages, response and token
+    counts, or None if the file is missing or not in the expected format.
+    """
+    try:
+        with open(log_file_path, "r") as f:
+            content = f.read()
+    except OSError:
+        return None
+
+    model = re.search(r"^# Model: (.*)$", content, re.M)
+    temperature = re.search(r"^# Temperature: (.*)$", content, re.M)
+    system = re.search(r"## System Message ##\n([\s\S]*?)\n\n## User Message ##\n", content)
+    user = re.search(r"## User Message ##\n([\s\S]*?)\n\n---------- RESPONSE ----------", content)
+    response = re.search(r"## Assistant Message ##\n([\s\S]*?)\n\n---------- USAGE ----------", content)
+    if not (model and temperature and response):
+        return None
+
+    messages = []
+    if system and system.group(1) != "N/A":
+        messages.append({"role": "system", "content": system.group(1)})
+    if user and user.group(1) != "N/A":
+        messages.append({"role": "user", "content": user.group(1)})
+
+    prompt_tokens = re.search(r"^Prompt Tokens: (\d+)", content, re.M)
+    completion_tokens = re.search(r"^Completion Tokens: (\d+)", content, re.M)
+    try:
+        temperature = float(temperature.group(1))
+    except ValueError:
+        return None
+    return {
+        "model": model.group(1).strip(),
+        "temperature": temperature,
+        "messages": messages,
+        "response": response.group(1).strip(),
+        "prompt_tokens": int(prompt_tokens.group(1)) if prompt_tokens else None,
+        "completion_tokens": int(completion_tokens.group(1)) if completion_tokens else None,
+    }
+
+
+class ChatCache:
+    """
+    SQLite-backed response store with size- and age-based eviction.
+    Safe to share between the pipeline's worker threads. A read_only cache
+    works on an in-memory copy of the file (empty if there is none), so
+    lookups, imports and evictions change nothing on disk.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age_seconds=None, read_only=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._writes = 0
+        if read_only:
+            self._db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+            if os.path.exists(path):
+                source = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+                try:
+                    source.backup(self._db)
+                finally:
+                    source.close()
+        else:
+            cache_dir = os.path.dirname(path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.evict()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, key):
+        """Return the cached entry dict for key, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, prompt_tokens, completion_tokens, created FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if self.max_age_seconds is not None and now - row[3] > self.max_age_seconds:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        return {"response": row[0], "prompt_tokens": row[1], "completion_tokens": row[2]}
+
+    def contains(self, key):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key, model, temperature, response, prompt_tokens=None, completion_tokens=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, float(temperature), response, prompt_tokens, completion_tokens,
+                 len(response.encode("utf-8")), now, now),
+            )
+            self._writes += 1
+            check = self._writes % EVICT_EVERY == 0
+        if check:
+            self.evict()
+
+    def evict(self, max_bytes=None, max_age_seconds=None):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age_seconds = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        removed = 0
+        with self._lock:
+            if max_age_seconds is not None:
+                cur = self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - max_age_seconds,))
+                removed += cur.rowcount
+            if max_bytes is not None:
+                total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > max_bytes:
+                    excess = total - max_bytes
+                    doomed = []
+                    for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+                        if excess <= 0:
+                            break
+                        doomed.append((key,))
+                        excess -= size
+                    self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+                    removed += len(doomed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count, size, oldest = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created) FROM entries"
+            ).fetchone()
+        return {"entries": count, "bytes": size, "oldest": oldest}
+
+    def import_chat_log(self, log_file_path):
+        """
+        Import a legacy .chat log. Returns the key it was stored under, or
+        None if the file could not be parsed or the response isn't JSON.
+        """
+        entry = parse_chat_log(log_file_path)
+        if entry is None or not entry["messages"]:
+            return None
+        try:
+            json.loads(entry["response"])
+        except json.JSONDecodeError:
+            return None
+        key = make_key(entry["model"], entry["temperature"], entry["messages"])
+        if not self.contains(key):
+            self.put(key, entry["model"], entry["temperature"], entry["response"],
+                     entry["prompt_tokens"], entry["completion_tokens"])
+        return key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the chat completion cache.")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help=f"Cache file (default: {DEFAULT_CACHE_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show entry count and size")
+    imp = sub.add_parser("import", help="Import existing .chat logs")
+    imp.add_argument("root", nargs="?", default="artifacts", help="Directory to scan (default: artifacts)")
+    ev = sub.add_parser("evict", help="Apply size/age limits now")
+    ev.add_argument("--max-mb", type=float, default=None, help="Keep at most this many MB")
+    ev.add_argument("--max-age-days", type=float, default=None, help="Drop entries older than this")
+    args = parser.parse_args()
+
+    cache = ChatCache(args.cache)
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} KiB in {args.cache}")
+    elif args.command == "import":
+        imported = skipped = 0
+        for dirpath, _, filenames in os.walk(args.root):
+            for name in sorted(filenames):
+                if not name.endswith(".chat"):
+                    continue
+                if cache.import_chat_log(os.path.join(dirpath, name)):
+                    imported += 1
+                else:
+                    skipped += 1
+                    print(f"Skipped {os.path.join(dirpath, name)}")
+        print(f"Imported {imported} chat logs ({skipped} skipped).")
+    elif args.command == "evict":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        max_age = args.max_age_days * 86400 if args.max_age_days is not None else None
+        print(f"Evicted {cache.evict(max_bytes=max_bytes, max_age_seconds=max_age)} entries.")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Lazily generated mansion for mansion.py, for maps too large to build up front.
+
+Each floor is cut into chunk_size x chunk_size chunks. A chunk is carved on
+its own, with a DFS maze as in mkmap.generate_maze, from a random stream
+seeded by a hash of (seed, chunk coordinates), so it comes out the same
+every time it is generated. What two chunks share is derived from hashes of
+the shared feature rather than from either chunk:
+  - doors across a chunk border (always at least one, plus extras with
+    probability extra_prob) hash (seed, border);
+  - stairs between two floors (stairs_per_chunk per chunk column) hash
+    (seed, chunk column, lower floor).
+Every chunk is connected inside, and every border and floor pair has at
+least one opening, so the whole mansion stays connected.
+
+Chunks are generated when first looked up and kept in an LRU of max_chunks;
+an evicted chunk is regenerated identically when the player comes back.
+peek() reads only loaded chunks, for callers such as the map view that
+must not generate or evict any.
+Room dicts have the same shape as mkmap's Room.to_dict(), except that
+difficulty is -1: distances from the Foyer would need the whole map. The
+Portal is placed in a far corner of the top floor for the same reason.
+"""
+
+import collections
+import hashlib
+import random
+
+from mkmap import Room
+
+
+class ChunkedMansion:
+    def __init__(self, xmax, ymax, zmax, seed=0, chunk_size=16, extra_prob=0.05,
+                 stairs_per_chunk=1, max_chunks=64):
+        if xmax <= 0 or ymax <= 0 or zmax <= 0:
+            raise ValueError("Dimensions must be positive integers")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        self.xmax, self.ymax, self.zmax = xmax, ymax, zmax
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.extra_prob = extra_prob
+        self.stairs_per_chunk = stairs_per_chunk
+        self.max_chunks = max(1, max_chunks)
+        self.foyer_coords = (xmax // 2, 0, 0)
+        # A far corner of the top floor, chosen by the seed
+        corner_x = 0 if self._hash("portal") % 2 and self.foyer_coords[0] != 0 else xmax - 1
+        self.portal_coords = (corner_x, ymax - 1, zmax - 1)
+        self._chunks = collections.OrderedDict()
+        self.generated = 0
+        self.evicted = 0
+
+    def _hash(self, *parts):
+        data = repr((self.seed,) + parts).encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+    def _bounds(self, cx, cy):
+        x0, y0 = cx * self.chunk_size, cy * self.chunk_size
+        return x0, y0, min(x0 + self.chunk_size, self.xmax), min(y0 + self.chunk_size, self.ymax)
+
+    def chunk_of(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    # -------------------------------------------------------------------
+    #  Features shared between neighbouring chunks
+    # -------------------------------------------------------------------
+    def _border_doors(self, cx, cy, z, direction):
+        """
+        Doors on the east ('E') or south ('S') border of chunk (cx, cy): the
+        y (for 'E') or x (for 'S') coordinates of the rooms on this side.
+        """
+        x0, y0, x1, y1 = self._bounds(cx, cy)
+        cells = range(y0, y1) if direction == 'E' else range(x0, x1)
+        rng = random.Random(self._hash("door", direction, cx, cy, z))
+        doors = {cells[rng.randrange(len(cells))]}
+        doors.update(c for c in cells if rng.random() < self.extra_prob)
+        return doors
+
+    def _stairs(self, cx, cy, z):
+        """(x, y) of the stairs from floor z up to z + 1 in chunk column (cx, cy)."""
+        x0, y0, x1, y1 = self._bounds(cx, cy)
+        rng = random.Random(self._hash("stairs", cx, cy, z))
+        cells = [(x, y) for x in range(x0, x1) for y in range(y0, y1)]
+        return rng.sample(cells, min(self.stairs_per_chunk, len(cells)))
+
+    # -------------------------------------------------------------------
+    #  Chunk generation
+    # -------------------------------------------------------------------
+    def _generate(self, cx, cy, z):
+        x0, y0, x1, y1 = self._bounds(cx, cy)
+        rooms = {(x, y): Room(x, y, z) for x in range(x0, x1) for y in range(y0, y1)}
+        rng = random.Random(self._hash("chunk", cx, cy, z))
+
+        # Spanning tree inside the chunk (DFS, as in mkmap.generate_maze)
+        start = rooms[(x0, y0)]
+        start.visited = True
+        stack = [start]
+        while stack:
+            current = stack[-1]
+            potential = [(current.x + 1, current.y, 'E'), (current.x - 1, current.y, 'W'),
+                         (current.x, current.y + 1, 'S'), (current.x, current.y - 1, 'N')]
+            rng.shuffle(potential)
+            for nx, ny, direction in potential:
+                neighbour = rooms.get((nx, ny))
+                if neighbour and not neighbour.visited:
+                    current.connect(neighbour, direction)
+                    neighbour.visited = True
+                    stack.append(neighbour)
+                    break
+            else:
+                stack.pop()
+
+        # Extra connections inside the chunk
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                room = rooms[(x, y)]
+                if x + 1 < x1 and room.connections['E'] is None and rng.random() < self.extra_prob:
+                    room.connect(rooms[(x + 1, y)], 'E')
+                if y + 1 < y1 and room.connections['S'] is None and rng.random() < self.extra_prob:
+                    room.connect(rooms[(x, y + 1)], 'S')
+
+        # Doors to the neighbouring chunks on this floor
+        if x1 < self.xmax:
+            for y in self._border_doors(cx, cy, z, 'E'):
+                rooms[(x1 - 1, y)].connections['E'] = f"{x1}-{y}-{z}"
+        if cx > 0:
+            for y in self._border_doors(cx - 1, cy, z, 'E'):
+                rooms[(x0, y)].connections['W'] = f"{x0 - 1}-{y}-{z}"
+        if y1 < self.ymax:
+            for x in self._border_doors(cx, cy, z, 'S'):
+                rooms[(x, y1 - 1)].connections['S'] = f"{x}-{y1}-{z}"
+        if cy > 0:
+            for x in self._border_doors(cx, cy - 1, z, 'S'):
+                rooms[(x, y0)].connections['N'] = f"{x}-{y0 - 1}-{z}"
+
+        # Stairs to the floors above and below
+        if z + 1 < self.zmax:
+            for x, y in self._stairs(cx, cy, z):
+                rooms[(x, y)].connections['U'] = f"{x}-{y}-{z + 1}"
+        if z > 0:
+            for x, y in self._stairs(cx, cy, z - 1):
+                rooms[(x, y)].connections['D'] = f"{x}-{y}-{z - 1}"
+
+        for room in rooms.values():
+            coords = (room.x, room.y, room.z)
+            room.is_foyer = coords == self.foyer_coords
+            room.is_portal = coords == self.portal_coords
+        self.generated += 1
+        return {(room.x, room.y, room.z): room.to_dict() for room in rooms.values()}
+
+    def chunk(self, cx, cy, z):
+        """Rooms of one chunk keyed by (x, y, z), generating it if it is not cached."""
+        key = (cx, cy, z)
+        if key in self._chunks:
+            self._chunks.move_to_end(key)
+            return self._chunks[key]
+        rooms = self._generate(cx, cy, z)
+        self._chunks[key] = rooms
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+            self.evicted += 1
+        return rooms
+
+    def preload_around(self, x, y, z, radius=1):
+        """Generate the chunks within radius chunks of (x, y) on floor z ahead of need."""
+        cx, cy = self.chunk_of(x, y)
+        max_cx, max_cy = self.chunk_of(self.xmax - 1, self.ymax - 1)
+        for ncx in range(max(0, cx - radius), min(max_cx, cx + radius) + 1):
+            for ncy in range(max(0, cy - radius), min(max_cy, cy + radius) + 1):
+                self.chunk(ncx, ncy, z)
+        # The player's own chunk stays the most recently used
+        self.chunk(cx, cy, z)
+
+    # Read access compatible with the rooms dict mansion.py builds from a JSON map
+    def get(self, coords, default=None):
+        x, y, z = coords
+        if not (0 <= x < self.xmax and 0 <= y < self.ymax and 0 <= z < self.zmax):
+            return default
+        return self.chunk(x // self.chunk_size, y // self.chunk_size, z).get(coords, default)
+
+    def peek(self, coords, default=None):
+        """Like get(), but only from loaded chunks: never generates one or changes the LRU order."""
+        x, y, z = coords
+        chunk = self._chunks.get((x // self.chunk_size, y // self.chunk_size, z))
+        return default if chunk is None else chunk.get(coords, default)
+
+    def __getitem__(self, coords):
+        room = self.get(coords)
+        if room is None:
+            raise KeyError(coords)
+        return room
+
+    def __contains__(self, coords):
+        return self.get(coords) is not None
+
+    def foyer(self):
+        return self.get(self.foyer_coords)
+
+    def loaded_chunks(self):
+        return len(self._chunks)
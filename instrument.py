@@ -0,0 +1,173 @@
+"""
+Phase timing and profiling shared by the command-line tools.
+
+Code marks its phases with named spans:
+
+    with instrument.span("dfs"):
+        ...
+
+and each tool adds the options with add_arguments(parser) and turns on what
+was asked for with start(args):
+
+    --timings       per-span count, total and slowest time (monotonic clock),
+                    printed to stderr on exit
+    --memory        also the tracemalloc peak while each span was open
+    --trace PATH    Chrome trace JSON of every span (chrome://tracing, Perfetto)
+    --profile PATH  cProfile of the whole run, dumped for pstats/snakeviz, with
+                    the top functions printed to stderr
+
+When none of them is given, span() returns a shared no-op context manager,
+so leaving spans in hot paths costs one function call and a flag check.
+Spans may be opened from several threads or interleaved asyncio tasks; a
+span's memory peak is the process peak while it was open.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+_NULL_SPAN = contextlib.nullcontext()
+
+_enabled = False
+_memory = False
+_trace_path = None
+_profiler = None
+_profile_path = None
+_summary = False
+_lock = threading.Lock()
+_open = set() # Spans whose memory peak is still being tracked
+_events = []  # Finished spans: (name, start ns, duration ns, thread id, peak bytes, args)
+_origin = time.perf_counter_ns()
+
+
+class Span:
+    __slots__ = ("name", "args", "start", "peak")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.peak = 0
+
+    def __enter__(self):
+        if _memory:
+            with _lock:
+                _fold_peak()
+                _open.add(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        with _lock:
+            if _memory:
+                _fold_peak()
+                _open.discard(self)
+            _events.append((self.name, self.start - _origin, duration, threading.get_ident(), self.peak, self.args))
+        return False
+
+
+def _fold_peak():
+    """Credit the peak since the last reset to every open span, then start a new interval."""
+    _, peak = tracemalloc.get_traced_memory()
+    for span in _open:
+        span.peak = max(span.peak, peak)
+    tracemalloc.reset_peak()
+
+
+def span(name, **args):
+    """Context manager timing one phase; args are attached to the trace event."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def enabled():
+    return _enabled
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--timings", action="store_true", help="Print time spent per phase on exit")
+    group.add_argument("--memory", action="store_true", help="With the timings, track peak memory per phase (slower)")
+    group.add_argument("--trace", metavar="PATH", help="Write a Chrome trace JSON of the phases to PATH")
+    group.add_argument("--profile", metavar="PATH", help="Profile the run with cProfile and dump the stats to PATH")
+
+
+def start(args=None, timings=False, memory=False, trace=None, profile=None):
+    """Enable what args (from add_arguments) or the keywords ask for; results are written at exit."""
+    global _enabled, _memory, _trace_path, _profiler, _profile_path, _summary
+    if args is not None:
+        timings, memory = args.timings, args.memory
+        trace, profile = args.trace, args.profile
+    _summary = timings or memory
+    _memory = memory
+    _trace_path = trace
+    _enabled = bool(_summary or trace)
+    if _memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if profile:
+        _profile_path = profile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if _enabled or _profiler:
+        atexit.register(finish)
+
+
+def summary():
+    """Per-span table: calls, total, mean and slowest time, and the memory peak if tracked."""
+    with _lock:
+        events = list(_events)
+    if not events:
+        return "No spans recorded."
+    by_name = {}
+    for name, _, duration, _, peak, _ in events:
+        entry = by_name.setdefault(name, [0, 0, 0, 0])
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+        entry[3] = max(entry[3], peak)
+    header = f"{'span':<28} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}" + (f" {'peak MB':>8}" if _memory else "")
+    lines = [header, "-" * len(header)]
+    for name, (calls, total, longest, peak) in sorted(by_name.items(), key=lambda kv: -kv[1][1]):
+        line = f"{name:<28} {calls:>7} {total / 1e9:>9.3f} {total / calls / 1e6:>9.3f} {longest / 1e6:>9.3f}"
+        if _memory:
+            line += f" {peak / 1e6:>8.2f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def write_trace(path):
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = [{"name": name, "ph": "X", "ts": begin / 1000, "dur": duration / 1000, "pid": pid, "tid": tid,
+              "args": dict(args, peak_bytes=peak) if _memory else args}
+             for name, begin, duration, tid, peak, args in events]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+def finish():
+    """Write the trace and profile and print the summaries (registered with atexit by start)."""
+    global _profiler, _enabled, _trace_path, _summary
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+        print(f"\nProfile written to {_profile_path}", file=sys.stderr)
+        pstats.Stats(_profile_path, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+        _profiler = None
+    if _trace_path:
+        write_trace(_trace_path)
+        print(f"Trace of {len(_events)} spans written to {_trace_path}", file=sys.stderr)
+    if _summary:
+        print("\n" + summary(), file=sys.stderr)
+    _enabled = False
+    _trace_path = None
+    _summary = False
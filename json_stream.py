@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+JSON extraction for model replies, incremental and after the fact.
+
+IncrementalJSONParser takes a streamed reply a piece at a time. It skips
+any preamble up to the first '{' (prose, a ```json fence), checks the
+structure of the top-level object as it arrives and reports each top-level
+field as soon as its value is complete, so a caller can act on
+"interactable_objects" while the rest of the room is still being written.
+Every character is looked at once; string contents are skipped with a
+regex search rather than character by character.
+
+extract_json() is the fallback for a complete reply that is not plain JSON.
+One scan finds the balanced {...} spans outside strings, and json.loads is
+tried from the outside in, stopping at the first span that parses. A span
+that does not parse fails at its first bad character (usually prose right
+after the brace), so in practice this stays linear in the length of the
+reply, where the greedy regexes it replaces backtracked and parsed the same
+text several times.
+
+Usage:
+    python json_stream.py artifacts/room_definition/Grand_Vestibule.chat
+"""
+
+import argparse
+import bisect
+import json
+import re
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRING_OR_LINE_END = re.compile(r'["\\\n]')
+_BRACE_OR_QUOTE = re.compile(r'[{}"]')
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_WHITESPACE = " \t\r\n"
+_CLOSERS = {"}": "{", "]": "["}
+
+# Top-level states of IncrementalJSONParser
+_PREAMBLE, _KEY, _COLON, _VALUE, _COMMA, _DONE = range(6)
+
+
+class JSONStreamError(ValueError):
+    """The streamed text is not a well-formed JSON object."""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at character {position}")
+        self.position = position
+
+
+class IncrementalJSONParser:
+    """
+    Feed a reply with feed(chunk); completed top-level fields appear in
+    fields (and are passed to on_field(name, value)) as they arrive, and
+    result() returns the whole object once done is set. The first error is
+    raised by feed() and kept in error; later chunks are ignored.
+    """
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.fields = {}
+        self.done = False
+        self.error = None
+        self._chunks = []   # Text from the opening '{' on
+        self._starts = []   # Offset of each chunk in the text
+        self._length = 0    # Characters in _chunks
+        self._state = _PREAMBLE
+        self._stack = []    # Open brackets inside the current value
+        self._in_string = False
+        self._escape = False
+        self._token_start = None # Start of the current key or value, as an offset into _chunks
+        self._key = None
+
+    @property
+    def text(self):
+        """The object's JSON text received so far."""
+        return "".join(self._chunks)
+
+    def result(self):
+        if not self.done:
+            raise JSONStreamError("Reply ended before the JSON object was closed", self._length)
+        return dict(self.fields)
+
+    def feed(self, chunk):
+        if self.error is not None or self.done or not chunk:
+            return
+        if self._state == _PREAMBLE:
+            start = chunk.find("{")
+            if start < 0:
+                return
+            chunk = chunk[start:]
+        base = self._length
+        self._chunks.append(chunk)
+        self._starts.append(base)
+        self._length += len(chunk)
+        try:
+            self._scan(chunk, base)
+        except JSONStreamError as e:
+            self.error = e
+            raise
+
+    def _slice(self, start, end):
+        """text[start:end], joining only the chunks it spans."""
+        first = bisect.bisect_right(self._starts, start) - 1
+        last = bisect.bisect_left(self._starts, end)
+        offset = self._starts[first]
+        return "".join(self._chunks[first:last])[start - offset:end - offset]
+
+    def _scan(self, chunk, base):
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, i)
+                if match is None:
+                    return # The string continues in the next chunk
+                i = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                    continue
+                self._in_string = False
+                if self._state == _KEY:
+                    self._key = json.loads(self._slice(self._token_start, base + i))
+                    self._state = _COLON
+                elif not self._stack:
+                    self._finish_value(base + i)
+                continue
+
+            char = chunk[i]
+            state = self._state
+            if state == _VALUE:
+                if self._token_start is None:
+                    if char in _WHITESPACE:
+                        i += 1
+                        continue
+                    self._token_start = base + i
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._stack.append(char)
+                elif char in "}]":
+                    if not self._stack:
+                        if char == "}" and self._token_start < base + i:
+                            # The end of a bare number/true/false/null closes the object too
+                            self._finish_value(base + i)
+                            self._close(base + i)
+                            return
+                        raise JSONStreamError(f"Unexpected {char!r}", base + i)
+                    if self._stack.pop() != _CLOSERS[char]:
+                        raise JSONStreamError(f"Mismatched {char!r}", base + i)
+                    if not self._stack:
+                        self._finish_value(base + i + 1)
+                elif not self._stack and (char == "," or char in _WHITESPACE):
+                    self._finish_value(base + i)
+                    continue # The comma is handled in the _COMMA state
+                i += 1
+                continue
+
+            if char in _WHITESPACE:
+                i += 1
+            elif state == _PREAMBLE: # At the opening '{'
+                self._state = _KEY
+                i += 1
+            elif state == _KEY and char == '"':
+                self._token_start = base + i
+                self._in_string = True
+                i += 1
+            elif state == _KEY and char == "}" and not self.fields and self._key is None:
+                self._close(base + i) # {}
+                return
+            elif state == _COLON and char == ":":
+                self._state = _VALUE
+                self._token_start = None
+                i += 1
+            elif state == _COMMA and char == ",":
+                self._state = _KEY
+                i += 1
+            elif state == _COMMA and char == "}":
+                self._close(base + i)
+                return
+            else:
+                expected = {_KEY: "a key", _COLON: "':'", _COMMA: "',' or '}'"}[state]
+                raise JSONStreamError(f"Expected {expected}, got {char!r}", base + i)
+
+    def _finish_value(self, end):
+        raw = self._slice(self._token_start, end)
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Bad value for {self._key!r}: {e.msg}", self._token_start + e.pos) from None
+        self.fields[self._key] = value
+        self._state = _COMMA
+        self._token_start = None
+        if self.on_field is not None:
+            self.on_field(self._key, value)
+
+    def _close(self, end):
+        self.done = True
+        self._state = _DONE
+        # Keep just the object; whatever follows (a closing fence) is not part of it
+        text = self._slice(0, end + 1)
+        self._chunks = [text]
+        self._length = len(text)
+
+
+def object_spans(text):
+    """
+    (start, end) of every balanced {...} in text, outer spans before the
+    spans inside them, ignoring braces inside strings. A '{' that is never
+    closed (prose before the reply) does not hide the objects after it.
+    """
+    closed = []
+    openers = []
+    i = 0
+    n = len(text)
+    while i < n:
+        if not openers:
+            i = text.find("{", i)
+            if i < 0:
+                break
+            openers.append(i)
+            i += 1
+            continue
+        match = _BRACE_OR_QUOTE.search(text, i)
+        if match is None:
+            break
+        i = match.start()
+        char = match.group()
+        if char == '"':
+            # Skip to the closing quote, honouring escapes. JSON strings hold no
+            # raw newlines, so one ends a quote that was prose, not a string.
+            while True:
+                match = _STRING_OR_LINE_END.search(text, i + 1)
+                if match is None:
+                    i = n
+                    break
+                i = match.start()
+                if match.group() == "\\":
+                    i += 1
+                    continue
+                break
+        elif char == "{":
+            openers.append(i)
+        else:
+            closed.append((openers.pop(), i + 1))
+        i += 1
+    closed.sort(key=lambda span: (span[0], -span[1]))
+    return closed
+
+
+def extract_json(text):
+    """
+    The largest JSON object embedded in text (in a ```json fence, after a
+    preamble, ...) re-serialised compactly, or None if there is none.
+    """
+    best = None
+    parsed_until = -1
+    for start, end in object_spans(text):
+        if start < parsed_until or (best is not None and end - start <= len(best[0])):
+            continue # Inside an object already parsed, or too small to win
+        if not _OBJECT_START.match(text, start):
+            continue # {prose}: not a key or an empty object after the brace
+        try:
+            value = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            continue # Braces in prose around the object; the spans inside are tried next
+        parsed_until = end
+        best = (text[start:end], value)
+    return json.dumps(best[1]) if best else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a recorded .chat reply through the incremental parser.")
+    parser.add_argument("chat_log", help="A .chat log written by scaffold.py")
+    parser.add_argument("--chunk", type=int, default=16, help="Characters per streamed piece")
+    args = parser.parse_args()
+
+    with open(args.chat_log) as f:
+        log = f.read()
+    reply = log.split("## Assistant Message ##\n", 1)[-1].split("\n---------- USAGE", 1)[0]
+    stream = IncrementalJSONParser()
+    for i in range(0, len(reply), args.chunk):
+        before = len(stream.fields)
+        stream.feed(reply[i:i + args.chunk])
+        for name in list(stream.fields)[before:]:
+            print(f"{min(i + args.chunk, len(reply)):>7} of {len(reply)} chars: {name}")
+    print("complete" if stream.done else "incomplete")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Shared OpenAI client layer for scaffold.py and the verne image tools.
+
+One AsyncOpenAI client (and so one HTTP connection pool) is shared by every
+caller in the process. Requests go through:
+  - a bounded in-flight window (asyncio.Semaphore),
+  - token buckets for requests/minute and tokens/minute,
+  - exponential backoff with full jitter on 429s, timeouts and 5xx errors,
+    honouring Retry-After when the server sends one.
+Each call is recorded in metrics.py with its queue wait, latency and tokens.
+
+Async code awaits chat()/generate_image()/edit_image() directly. Synchronous
+code (the existing scripts and their worker threads) uses the *_sync variants,
+which run the coroutine on a private event loop thread so that all callers
+still share the same connection pool and limits.
+
+The openai package is only imported when the first request is made, so
+tools that end up answering from caches (or only parse arguments) never
+pay for the SDK import or need credentials.
+
+Configuration comes from the environment so every tool picks it up:
+    OPENAI_BASE_URL       point at a local mock server (see bench/fake_openai.py)
+    OPENAI_MAX_IN_FLIGHT  concurrent requests (default 8)
+    OPENAI_RPM            requests per minute (default unlimited)
+    OPENAI_TPM            tokens per minute (default unlimited)
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import metrics
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_RETRIES = 6
+
+
+def load_api_key():
+    """Return the API key from OPENAI_API_KEY or ~/.openai.secret, or None."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key:
+        return api_key
+    try:
+        with open(os.path.expanduser("~/.openai.secret")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def require_api_key():
+    """load_api_key(), or exit with instructions when no key is configured."""
+    api_key = load_api_key()
+    if not api_key:
+        print("Error: OPENAI_API_KEY environment variable not set.")
+        print("Please set your OpenAI API key with:")
+        print("    export OPENAI_API_KEY='your-api-key'")
+        sys.exit(1)
+    return api_key
+
+
+def estimate_tokens(messages):
+    """Rough prompt size (about 4 characters per token) used to pre-charge the token bucket."""
+    return max(1, len(json.dumps(messages)) // 4)
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at rate_per_minute.
+    acquire() waits until enough tokens are available; adjust() lets callers
+    settle an estimate against the real cost afterwards (the balance may go
+    negative, which simply delays the next caller).
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request bigger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class StreamInterrupted(Exception):
+    """A streamed reply failed after part of it had been delivered, so it is not retried here."""
+
+
+class RequestStats:
+    """Counters shared by all requests of a client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self.backoff_seconds = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def is_retryable(error):
+    from openai import APIConnectionError, APIStatusError, RateLimitError # Loaded by the request that failed
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def retry_after(error):
+    """Seconds requested by a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def streamed_response(content, usage, prompt_estimate):
+    """A chat completion-shaped result for a streamed reply; usage is estimated if the server sent none."""
+    if usage is None:
+        completion = max(1, len(content) // 4)
+        usage = SimpleNamespace(prompt_tokens=prompt_estimate, completion_tokens=completion,
+                                total_tokens=prompt_estimate + completion)
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+class AsyncLLMClient:
+    def __init__(self, api_key=None, base_url=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=1.0, backoff_max=60.0, timeout=600.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_in_flight = max(1, max_in_flight)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = RequestStats()
+        # Created on first use inside the event loop they belong to
+        self._client = None
+        self._window = None
+        self._request_bucket = None
+        self._token_bucket = None
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def _setup(self):
+        if self._client is None:
+            from openai import AsyncOpenAI # Deferred: the SDK import is the slowest part of startup
+            # Retries are handled here so that they share the rate limiter
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       max_retries=0, timeout=self.timeout)
+            self._window = asyncio.Semaphore(self.max_in_flight)
+            if self.requests_per_minute:
+                self._request_bucket = TokenBucket(self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._token_bucket = TokenBucket(self.tokens_per_minute)
+
+    def backoff_delay(self, attempt, error=None):
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        requested = retry_after(error) if error is not None else None
+        if requested is not None:
+            delay = max(delay, min(requested, self.backoff_max))
+        return delay
+
+    async def _request(self, call, tokens=0, stage=None, model=None):
+        self._setup()
+        queued = time.monotonic()
+        queue_wait = 0.0
+        async with self._window:
+            attempt = 0
+            while True:
+                start = time.monotonic()
+                if self._request_bucket:
+                    await self._request_bucket.acquire(1)
+                if self._token_bucket and tokens:
+                    await self._token_bucket.acquire(tokens)
+                throttled = time.monotonic() - start
+                self.stats.throttled_seconds += throttled
+                queue_wait += throttled if attempt else time.monotonic() - queued
+                self.stats.requests += 1
+                try:
+                    response = await call()
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        self.stats.failures += 1
+                        metrics.record(stage, model=model, queue_wait=queue_wait,
+                                       latency=time.monotonic() - queued - queue_wait,
+                                       retries=attempt, error=e)
+                        raise
+                    delay = self.backoff_delay(attempt, e)
+                    self.stats.retries += 1
+                    self.stats.backoff_seconds += delay
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                usage = getattr(response, "usage", None)
+                if self._token_bucket and tokens and usage is not None:
+                    self._token_bucket.adjust((getattr(usage, "total_tokens", None) or tokens) - tokens)
+                prompt_tokens, completion_tokens = metrics.usage_tokens(usage)
+                metrics.record(stage, model=model, queue_wait=queue_wait,
+                               latency=time.monotonic() - queued - queue_wait,
+                               prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                               retries=attempt)
+                return response
+
+    # -------------------------------------------------------------------
+    #  Async API
+    # -------------------------------------------------------------------
+    async def chat(self, stage="chat", **kwargs):
+        """Same arguments as client.chat.completions.create(); stage labels the metrics record."""
+        self._setup()
+        tokens = estimate_tokens(kwargs.get("messages", []))
+        return await self._request(lambda: self._client.chat.completions.create(**kwargs), tokens,
+                                   stage=stage, model=kwargs.get("model"))
+
+    async def chat_stream(self, on_delta, stage="chat", **kwargs):
+        """
+        chat() with stream=True: on_delta(text) is called (on the client's
+        event loop) with each piece of the reply as it arrives. Returns a
+        response shaped like chat()'s, with the assembled message and usage.
+        Failures before the first piece are retried like any request; later
+        ones raise StreamInterrupted, since the caller has seen part of it.
+        """
+        self._setup()
+        tokens = estimate_tokens(kwargs.get("messages", []))
+
+        async def call():
+            stream = await self._client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, **kwargs)
+            parts = []
+            usage = None
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    for choice in chunk.choices:
+                        if choice.delta.content:
+                            parts.append(choice.delta.content)
+                            on_delta(choice.delta.content)
+            except Exception as e:
+                if parts:
+                    raise StreamInterrupted(f"Stream failed after {sum(map(len, parts))} characters: {e}") from e
+                raise
+            return streamed_response("".join(parts), usage, tokens)
+
+        return await self._request(call, tokens, stage=stage, model=kwargs.get("model"))
+
+    async def generate_image(self, stage="generate_image", **kwargs):
+        """Same arguments as client.images.generate()."""
+        self._setup()
+        return await self._request(lambda: self._client.images.generate(**kwargs),
+                                   stage=stage, model=kwargs.get("model"))
+
+    async def edit_image(self, image_path, stage="edit_image", **kwargs):
+        """client.images.edit() with the base image read from image_path."""
+        self._setup()
+        with open(image_path, "rb") as f:
+            image = (os.path.basename(image_path), f.read(), "image/png")
+        return await self._request(lambda: self._client.images.edit(image=image, **kwargs),
+                                   stage=stage, model=kwargs.get("model"))
+
+    async def gather(self, coros):
+        """Run coroutines concurrently; the in-flight window bounds the actual requests."""
+        return await asyncio.gather(*coros)
+
+    # -------------------------------------------------------------------
+    #  Synchronous bridge
+    # -------------------------------------------------------------------
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="llm-client-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coro):
+        """Run a coroutine on the client's loop from any thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def chat_sync(self, **kwargs):
+        return self.run(self.chat(**kwargs))
+
+    def chat_stream_sync(self, on_delta, **kwargs):
+        return self.run(self.chat_stream(on_delta, **kwargs))
+
+    def generate_image_sync(self, **kwargs):
+        return self.run(self.generate_image(**kwargs))
+
+    def edit_image_sync(self, image_path, **kwargs):
+        return self.run(self.edit_image(image_path, **kwargs))
+
+    def run_all(self, coros):
+        """Synchronously run a batch of coroutines concurrently and return their results."""
+        return self.run(self.gather(coros))
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_client(api_key=None, **overrides):
+    """Return the process-wide client, creating it from the environment on first use."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            options = {
+                "api_key": api_key or load_api_key(),
+                "base_url": os.getenv("OPENAI_BASE_URL") or None,
+                "max_in_flight": _env_int("OPENAI_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+                "requests_per_minute": _env_int("OPENAI_RPM"),
+                "tokens_per_minute": _env_int("OPENAI_TPM"),
+            }
+            options.update(overrides)
+            _shared_client = AsyncLLMClient(**options)
+        return _shared_client
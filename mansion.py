@@ -1,7 +1,18 @@
+import argparse
+import collections
 import curses
 import json
+import math
 import sys
 import os
+import time
+
+import instrument
+import schema
+from chunkmap import ChunkedMansion
+from mkmap import rooms_from_json
+from pathindex import WORDS, PathIndex
+from shiftmap import DynamicMansion
 
 # Helper to find the Foyer room from loaded data
 def find_foyer(rooms_data):
@@ -14,27 +25,104 @@ def find_foyer(rooms_data):
 def get_room_at(x, y, z, rooms_dict):
     return rooms_dict.get((x, y, z))
 
-def main(stdscr):
-    # --- Initialization ---
-    curses.curs_set(0) # Hide cursor
-    stdscr.nodelay(False) # Wait for user input
-    stdscr.keypad(True) # Enable special keys (like arrows)
-    curses.start_color()
-    curses.init_pair(1, curses.COLOR_YELLOW, curses.COLOR_BLACK) # Player
-    curses.init_pair(2, curses.COLOR_GREEN, curses.COLOR_BLACK)  # Foyer/Portal
-    curses.init_pair(3, curses.COLOR_CYAN, curses.COLOR_BLACK)   # Stairs
-    curses.init_pair(4, curses.COLOR_WHITE, curses.COLOR_BLACK) # Normal Room / Walls / Passages
-    curses.init_pair(5, curses.COLOR_RED, curses.COLOR_BLACK)    # Error/Win message
-    curses.init_pair(6, curses.COLOR_BLUE, curses.COLOR_BLACK)   # Unexplored markers
-
-    map_filename = "mansion_map.json"
+def parse_room_id(room_id):
+    x_str, y_str, z_str = room_id.split('-')
+    return int(x_str), int(y_str), int(z_str)
+
+TRAVEL_MAX_SECONDS = 2.0 # Longest a travel animation may take, however long the route
+CURSOR_KEYS = {
+    'KEY_UP': (0, -1), 'k': (0, -1), 'KEY_DOWN': (0, 1), 'j': (0, 1),
+    'KEY_LEFT': (-1, 0), 'h': (-1, 0), 'KEY_RIGHT': (1, 0), 'l': (1, 0),
+}
+
+class TravelPlanner:
+    """
+    Routes for the travel command over the rooms the player has visited
+    (stairs included, since a floor need not be connected on its own). BFS
+    trees are cached by the room they start from, the last max_trees of them,
+    and only invalidate() drops them (a room visited for the first time, or
+    passages shifted): walking around known rooms changes nothing. A route
+    is read from the tree of its start or, since passages go both ways, of
+    its destination, so travelling back to where a trip began needs no BFS
+    either; moving the cursor or asking again costs a dictionary walk.
+    """
+
+    def __init__(self, rooms_dict, visited_room_ids, max_trees=8):
+        self.rooms_dict = rooms_dict
+        self.visited = visited_room_ids
+        self.max_trees = max_trees
+        self._trees = collections.OrderedDict() # root id -> (BFS order, parent links), least recently used first
+
+    def invalidate(self):
+        self._trees.clear()
+
+    def _tree(self, root_id):
+        cached = self._trees.get(root_id)
+        if cached is not None:
+            self._trees.move_to_end(root_id)
+            return cached
+        parents = {root_id: None}
+        order = [root_id]
+        queue = collections.deque([root_id])
+        while queue:
+            room = self.rooms_dict.get(parse_room_id(queue.popleft()))
+            for neighbour_id in room['connections'].values():
+                if neighbour_id and neighbour_id in self.visited and neighbour_id not in parents:
+                    parents[neighbour_id] = room['id']
+                    order.append(neighbour_id)
+                    queue.append(neighbour_id)
+        cached = self._trees[root_id] = (order, parents)
+        if len(self._trees) > self.max_trees:
+            self._trees.popitem(last=False)
+        return cached
+
+    def route(self, start_id, target_id):
+        """Room ids to step through from start to target (excluding start), or None if unknown."""
+        if start_id not in self._trees and target_id in self._trees:
+            _, parents = self._tree(target_id) # Parent links lead from start towards the target
+            if start_id not in parents:
+                return None
+            path = []
+            while start_id != target_id:
+                start_id = parents[start_id]
+                path.append(start_id)
+            return path
+        _, parents = self._tree(start_id)
+        if target_id not in parents:
+            return None
+        path = []
+        while target_id != start_id:
+            path.append(target_id)
+            target_id = parents[target_id]
+        return path[::-1]
+
+    def nearest(self, start_id, accept):
+        """Route to the closest other visited room for which accept(room dict) is true."""
+        order, _ = self._tree(start_id)
+        for room_id in order[1:]:
+            if accept(self.rooms_dict.get(parse_room_id(room_id))):
+                return self.route(start_id, room_id)
+        return None
+
+    def nearest_frontier(self, start_id):
+        """Route that ends by stepping into the closest unvisited room."""
+        order, _ = self._tree(start_id)
+        for room_id in order:
+            room = self.rooms_dict.get(parse_room_id(room_id))
+            for neighbour_id in room['connections'].values():
+                if neighbour_id and neighbour_id not in self.visited:
+                    return self.route(start_id, room_id) + [neighbour_id]
+        return None
+
+def load_json_map(stdscr, map_filename):
+    """Load a map written by mkmap.py; returns (dimensions, rooms by coords, foyer) or None."""
     if not os.path.exists(map_filename):
         stdscr.clear()
         stdscr.addstr(0, 0, f"Error: Map file '{map_filename}' not found.", curses.color_pair(5) | curses.A_BOLD)
         stdscr.addstr(1, 0, "Please run mkmap.py first.", curses.color_pair(5))
         stdscr.addstr(3, 0, "Press any key to exit.")
         stdscr.getch()
-        return
+        return None
 
     try:
         with open(map_filename, 'r') as f:
@@ -44,26 +132,31 @@ def main(stdscr):
         stdscr.addstr(0, 0, f"Error: Could not decode JSON from '{map_filename}'.", curses.color_pair(5) | curses.A_BOLD)
         stdscr.addstr(2, 0, "Press any key to exit.")
         stdscr.getch()
-        return
+        return None
     except Exception as e:
         stdscr.clear()
         stdscr.addstr(0, 0, f"Error loading map: {e}", curses.color_pair(5) | curses.A_BOLD)
         stdscr.addstr(2, 0, "Press any key to exit.")
         stdscr.getch()
-        return
-
-    dimensions = map_data.get("dimensions", {})
-    xmax = dimensions.get("xmax")
-    ymax = dimensions.get("ymax")
-    zmax = dimensions.get("zmax")
-    all_rooms_list = map_data.get("rooms", [])
+        return None
 
-    if xmax is None or ymax is None or zmax is None or not all_rooms_list:
+    # Every structural problem at once, rather than a KeyError halfway through the game
+    with instrument.span("validate_map"):
+        errors = schema.validate_map(map_data)
+    if errors:
         stdscr.clear()
-        stdscr.addstr(0, 0, "Error: Map file is missing dimensions or rooms.", curses.color_pair(5) | curses.A_BOLD)
-        stdscr.addstr(2, 0, "Press any key to exit.")
+        h, w = stdscr.getmaxyx()
+        stdscr.addstr(0, 0, f"Error: '{map_filename}' is not a valid map ({len(errors)} problems):"[:w - 1], curses.color_pair(5) | curses.A_BOLD)
+        shown = errors[:max(1, h - 4)]
+        for row, error in enumerate(shown, start=1):
+            stdscr.addstr(row, 0, error[:w - 1], curses.color_pair(5))
+        stdscr.addstr(len(shown) + 2, 0, "Press any key to exit.")
         stdscr.getch()
-        return
+        return None
+
+    dimensions = map_data["dimensions"]
+    xmax, ymax, zmax = dimensions["xmax"], dimensions["ymax"], dimensions["zmax"]
+    all_rooms_list = map_data["rooms"]
 
     # Convert room list to a dictionary keyed by coordinates for faster lookup
     rooms_dict = {(r['coords'][0], r['coords'][1], r['coords'][2]): r for r in all_rooms_list}
@@ -74,17 +167,60 @@ def main(stdscr):
         stdscr.addstr(0, 0, "Error: Foyer room not found in map data.", curses.color_pair(5) | curses.A_BOLD)
         stdscr.addstr(2, 0, "Press any key to exit.")
         stdscr.getch()
-        return
+        return None
+    return (xmax, ymax, zmax), rooms_dict, foyer_room
+
+def main(stdscr, args):
+    # --- Initialization ---
+    curses.curs_set(0) # Hide cursor
+    stdscr.nodelay(False) # Wait for user input
+    stdscr.keypad(True) # Enable special keys (like arrows)
+    curses.start_color()
+    curses.init_pair(1, curses.COLOR_YELLOW, curses.COLOR_BLACK) # Player
+    curses.init_pair(2, curses.COLOR_GREEN, curses.COLOR_BLACK)  # Foyer/Portal
+    curses.init_pair(3, curses.COLOR_CYAN, curses.COLOR_BLACK)   # Stairs
+    curses.init_pair(4, curses.COLOR_WHITE, curses.COLOR_BLACK) # Normal Room / Walls / Passages
+    curses.init_pair(5, curses.COLOR_RED, curses.COLOR_BLACK)    # Error/Win message
+    curses.init_pair(6, curses.COLOR_BLUE, curses.COLOR_BLACK)   # Unexplored markers
+
+    if args.lazy:
+        # Chunks are generated as the player approaches them, so any size starts instantly
+        xmax, ymax, zmax = args.size
+        rooms_dict = ChunkedMansion(xmax, ymax, zmax, seed=args.seed, chunk_size=args.chunk_size,
+                                    max_chunks=args.max_chunks)
+        foyer_room = rooms_dict.foyer()
+        rooms_dict.preload_around(*foyer_room['coords'])
+    else:
+        with instrument.span("load_map"):
+            loaded = load_json_map(stdscr, args.map)
+        if loaded is None:
+            return
+        (xmax, ymax, zmax), rooms_dict, foyer_room = loaded
+
+    dynamic = None
+    if args.shifting:
+        # Passages rearrange every few moves; only the rooms a shift touched are refreshed
+        with instrument.span("shifting_setup"):
+            dynamic = DynamicMansion(rooms_from_json(rooms_dict.values(), xmax, ymax, zmax))
+        rooms_dict = {(room.x, room.y, room.z): room.to_dict() for room in dynamic.room_list}
+    moves_made = 0
 
     # --- Player State ---
     player_x, player_y, player_z = foyer_room['coords']
     visited_room_ids = {foyer_room['id']} # Start with Foyer visited
-    message = "Welcome! Use arrow keys to move, <> for stairs, q to quit."
+    message = "Welcome! Use arrow keys to move, <> for stairs, t to travel, ? for a hint, q to quit."
     won = False
-
-    # --- Main Game Loop ---
-    while True:
-        stdscr.clear()
+    planner = TravelPlanner(rooms_dict, visited_room_ids)
+    paths = None # Shortest paths over the whole map for hints, built on the first '?'; a lazy mansion has no whole map
+    portal_id = None
+    cursor = None # (x, y) on the player's floor while choosing a travel destination
+    # A lazy mansion is drawn from its loaded chunks only, the rest left blank: generating every
+    # chunk in view would evict and regenerate them each frame when the view needs more than --max-chunks
+    drawn_room = rooms_dict.peek if args.lazy else rooms_dict.get
+
+    def draw():
+        nonlocal message
+        stdscr.erase() # Only changed cells are sent to the terminal
         h, w = stdscr.getmaxyx()
 
         # --- Drawing ---
@@ -93,18 +229,30 @@ def main(stdscr):
         map_start_row = 1
         map_start_col = 2
 
+        # Only the part of the floor around the player that fits the terminal is drawn
+        view_height = min(vis_height, h - map_start_row - 2)
+        view_width = min(vis_width, w - map_start_col - 1)
+
         # Basic boundary check for drawing
-        if map_start_row + vis_height >= h or map_start_col + vis_width >= w:
+        if view_height < 3 or view_width < 3:
              stdscr.addstr(0,0, "Terminal too small!", curses.color_pair(5) | curses.A_BOLD)
-             stdscr.addstr(1,0, f"Need at least {vis_width+map_start_col}x{vis_height+map_start_row+2}")
 
         else:
+            # Centred on the travel cursor while choosing a destination
+            focus_x, focus_y = cursor if cursor else (player_x, player_y)
+            top = min(max(0, 2 * focus_y + 1 - view_height // 2), vis_height - view_height)
+            left = min(max(0, 2 * focus_x + 1 - view_width // 2), vis_width - view_width)
+
             # Draw Floor Indicator
-            stdscr.addstr(0, map_start_col, f"--- Floor {player_z} ---", curses.A_BOLD)
+            header = f"--- Floor {player_z} ---"
+            if args.lazy:
+                header += (f"  ({player_x},{player_y})  chunks: {rooms_dict.loaded_chunks()} loaded, "
+                           f"{rooms_dict.generated} generated")
+            stdscr.addstr(0, map_start_col, header[:w - map_start_col - 1], curses.A_BOLD)
 
             # Draw Map Area
-            for r in range(vis_height):
-                for c in range(vis_width):
+            for r in range(top, top + view_height):
+                for c in range(left, left + view_width):
                     map_char = ' ' # Default empty space
                     char_attr = curses.color_pair(4) # Default color
 
@@ -119,9 +267,11 @@ def main(stdscr):
                     elif is_room_row and is_room_col:
                         # --- Room Cell ---
                         room_x, room_y = c // 2, r // 2
-                        current_cell_room = get_room_at(room_x, room_y, player_z, rooms_dict)
+                        current_cell_room = drawn_room((room_x, room_y, player_z))
 
-                        if current_cell_room and current_cell_room['id'] in visited_room_ids:
+                        if current_cell_room is None:
+                            pass # In a chunk that is not loaded: left blank
+                        elif current_cell_room['id'] in visited_room_ids:
                             if room_x == player_x and room_y == player_y:
                                 map_char = '@'
                                 char_attr = curses.color_pair(1) | curses.A_BOLD # Player color
@@ -138,14 +288,16 @@ def main(stdscr):
                             # Unvisited room
                             map_char = '.' # Indicate potentially explorable but unseen
                             char_attr = curses.color_pair(6) # Unexplored color
+                        if cursor == (room_x, room_y):
+                            char_attr |= curses.A_REVERSE # Travel destination
 
                     elif is_room_row and not is_room_col:
                         # --- Horizontal Connection Cell ---
                         left_room_x, left_room_y = (c - 1) // 2, r // 2
                         right_room_x, right_room_y = (c + 1) // 2, r // 2
 
-                        left_room = get_room_at(left_room_x, left_room_y, player_z, rooms_dict)
-                        right_room = get_room_at(right_room_x, right_room_y, player_z, rooms_dict)
+                        left_room = drawn_room((left_room_x, left_room_y, player_z))
+                        right_room = drawn_room((right_room_x, right_room_y, player_z))
 
                         # Show passage if the left room is visited and connects East,
                         # OR if the right room is visited and connects West.
@@ -167,8 +319,8 @@ def main(stdscr):
                         top_room_x, top_room_y = c // 2, (r - 1) // 2
                         bottom_room_x, bottom_room_y = c // 2, (r + 1) // 2
 
-                        top_room = get_room_at(top_room_x, top_room_y, player_z, rooms_dict)
-                        bottom_room = get_room_at(bottom_room_x, bottom_room_y, player_z, rooms_dict)
+                        top_room = drawn_room((top_room_x, top_room_y, player_z))
+                        bottom_room = drawn_room((bottom_room_x, bottom_room_y, player_z))
 
                         # Show passage if the top room is visited and connects South,
                         # OR if the bottom room is visited and connects North.
@@ -190,14 +342,99 @@ def main(stdscr):
                          map_char = ' '
 
 
-                    stdscr.addch(map_start_row + r, map_start_col + c, map_char, char_attr)
+                    stdscr.addch(map_start_row + r - top, map_start_col + c - left, map_char, char_attr)
 
             # Draw Message Line
-            stdscr.addstr(map_start_row + vis_height + 1, 0, message, curses.color_pair(5) if won else curses.color_pair(4))
+            stdscr.addstr(map_start_row + view_height + 1, 0, message[:w - 1], curses.color_pair(5) if won else curses.color_pair(4))
             message = "" # Clear message after displaying
 
         stdscr.refresh()
 
+    def move_to(target_room_id):
+        """Step into target_room_id; returns True if the known map changed (new room or shifted passages)."""
+        nonlocal player_x, player_y, player_z, moves_made, won, message, portal_id
+        changed = target_room_id not in visited_room_ids
+        previous = (player_x, player_y, player_z)
+        try:
+            nx_str, ny_str, nz_str = target_room_id.split('-')
+            player_x, player_y, player_z = int(nx_str), int(ny_str), int(nz_str)
+            visited_room_ids.add(target_room_id)
+            if args.lazy:
+                rooms_dict.preload_around(player_x, player_y, player_z)
+            moves_made += 1
+            shifted = False
+            if dynamic and moves_made % args.shift_every == 0:
+                with instrument.span("shift"):
+                    shifted = dynamic.shift(args.shift_changes)
+            if shifted:
+                refreshed = []
+                for room_id in dynamic.changed:
+                    room = dynamic.by_id[room_id]
+                    refreshed.append(room.to_dict())
+                    rooms_dict[(room.x, room.y, room.z)] = refreshed[-1]
+                    if room.is_portal:
+                        portal_id = room.id
+                if paths is not None:
+                    paths.update(refreshed)
+                message = "The walls groan and grind: somewhere, the passages have shifted."
+                changed = True
+
+            # Check for win condition
+            new_room = get_room_at(player_x, player_y, player_z, rooms_dict)
+            if new_room and new_room.get('is_portal'):
+                won = True
+                message = f"Congratulations! You reached the Portal (Room {target_room_id})!"
+
+        except (ValueError, KeyError):
+             message = f"Error: Invalid room ID format '{target_room_id}' in connections."
+             # Don't move if ID is bad
+             player_x, player_y, player_z = previous # Revert potential bad intermediate state
+             changed = False
+        if changed:
+            planner.invalidate()
+        return changed
+
+    def travel(route):
+        """
+        Walk a planned route. With --travel-fps 0 the screen is redrawn once at
+        the end; otherwise frames are capped at that rate, with several steps
+        per frame on long routes, and any key press stops the walk.
+        """
+        nonlocal message
+        frames = args.travel_fps * TRAVEL_MAX_SECONDS
+        stride = max(1, math.ceil(len(route) / frames)) if frames else len(route)
+        last_frame = time.monotonic()
+        for step, room_id in enumerate(route, 1):
+            here = get_room_at(player_x, player_y, player_z, rooms_dict)
+            if room_id not in here['connections'].values():
+                message = "The way ahead has changed. You stop."
+                return
+            # Stop when something new turns up: a room seen for the first time or shifted passages
+            if move_to(room_id) or won:
+                return
+            if step % stride == 0 and step < len(route):
+                time.sleep(max(0.0, last_frame + 1.0 / args.travel_fps - time.monotonic()))
+                with instrument.span("frame", travel=True):
+                    draw()
+                last_frame = time.monotonic()
+                stdscr.nodelay(True)
+                interrupted = stdscr.getch() != -1
+                stdscr.nodelay(False)
+                if interrupted:
+                    message = "You stop."
+                    return
+
+    def cursor_message():
+        room = get_room_at(cursor[0], cursor[1], player_z, rooms_dict)
+        route = planner.route(f"{player_x}-{player_y}-{player_z}", room['id']) if room else None
+        where = f"{len(route)} steps" if route else ("here" if route == [] else "no known route")
+        return f"Travel ({where}): arrows choose, Enter go, f nearest unexplored, s nearest stairs, Esc cancel"
+
+    # --- Main Game Loop ---
+    while True:
+        with instrument.span("frame"):
+            draw()
+
         # --- Input Handling ---
         if won:
             stdscr.getch() # Wait for key press after winning
@@ -215,8 +452,39 @@ def main(stdscr):
              message = "Error: Player is in an invalid location!" # Should not happen
              continue # Or break with error
 
-        new_x, new_y, new_z = player_x, player_y, player_z
-        moved = False
+        if cursor is not None:
+            # --- Choosing a travel destination ---
+            here = current_room['id']
+            route = None
+            if key in CURSOR_KEYS:
+                dx, dy = CURSOR_KEYS[key]
+                cursor = (min(max(0, cursor[0] + dx), xmax - 1), min(max(0, cursor[1] + dy), ymax - 1))
+                message = cursor_message()
+                continue
+            elif key in ('\n', '\r', 'KEY_ENTER'):
+                target = get_room_at(cursor[0], cursor[1], player_z, rooms_dict)
+                route = planner.route(here, target['id']) if target else None
+                if route is None:
+                    message = "You don't know a way there yet."
+            elif key == 'f':
+                route = planner.nearest_frontier(here)
+                if route is None:
+                    message = "Every room you can reach is explored."
+            elif key == 's':
+                route = planner.nearest(here, lambda room: room['connections'].get('U') or room['connections'].get('D'))
+                if route is None:
+                    message = "You don't know of any other stairs."
+            elif key in ('\x1b', 't', 'q'):
+                message = "Travel cancelled."
+            else:
+                message = cursor_message()
+                continue
+            cursor = None
+            if route:
+                with instrument.span("travel", steps=len(route)):
+                    travel(route)
+            continue
+
         target_room_id = None
 
         if key in ('KEY_UP', 'k'):
@@ -237,35 +505,65 @@ def main(stdscr):
         elif key == '>':
             target_room_id = current_room['connections']['D']
             if not target_room_id: message = "No stairs down."
+        elif key == 't':
+            cursor = (player_x, player_y)
+            message = cursor_message()
+        elif key == '?':
+            if paths is None and not args.lazy:
+                with instrument.span("path_index"):
+                    paths = PathIndex.from_room_dicts(rooms_dict.values(), xmax, ymax, zmax)
+                    portal_id = next((room['id'] for room in rooms_dict.values() if room.get('is_portal')), None)
+            if paths is None or portal_id is None:
+                message = "No hints here: the mansion has no known Portal."
+            else:
+                here = current_room['id']
+                with instrument.span("hint"):
+                    step = paths.next_step(here, portal_id)
+                    distance = paths.distance(here, portal_id)
+                if step is None:
+                    message = "The Portal cannot be reached from here." if distance is None else "You are at the Portal."
+                else:
+                    message = f"A faint pull draws you {WORDS[step[0]]}: the Portal is {distance} rooms away."
         elif key == 'q':
             break
         else:
-            message = "Invalid key. Arrows=move, <> = stairs, q=quit"
+            message = "Invalid key. Arrows=move, <> = stairs, t=travel, ?=hint, q=quit"
 
         if target_room_id:
-            try:
-                nx_str, ny_str, nz_str = target_room_id.split('-')
-                new_x, new_y, new_z = int(nx_str), int(ny_str), int(nz_str)
-                moved = True
-                player_x, player_y, player_z = new_x, new_y, new_z
-                visited_room_ids.add(target_room_id)
-
-                # Check for win condition
-                new_room = get_room_at(player_x, player_y, player_z, rooms_dict)
-                if new_room and new_room.get('is_portal'):
-                    won = True
-                    message = f"Congratulations! You reached the Portal (Room {target_room_id})!"
-
-            except (ValueError, KeyError):
-                 message = f"Error: Invalid room ID format '{target_room_id}' in connections."
-                 # Don't move if ID is bad
-                 moved = False
-                 player_x, player_y, player_z = current_room['coords'] # Revert potential bad intermediate state
-                 target_room_id = None
-
+            move_to(target_room_id)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Explore a mansion map in the terminal.")
+    parser.add_argument("--map", default="mansion_map.json", help="Map written by mkmap.py (default: mansion_map.json)")
+    parser.add_argument("--lazy", action="store_true",
+                        help="Generate the mansion chunk by chunk while exploring instead of loading --map")
+    parser.add_argument("--size", type=int, nargs=3, metavar=("X", "Y", "Z"), default=(1000, 1000, 10),
+                        help="Rooms per axis for --lazy (default: 1000 1000 10)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --lazy; the same seed gives the same mansion")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Rooms per chunk side for --lazy (default: 16)")
+    parser.add_argument("--max-chunks", type=int, default=64,
+                        help="Chunks kept in memory for --lazy; older ones are regenerated on return (default: 64)")
+    parser.add_argument("--shifting", action="store_true",
+                        help="Passages open and close as you explore (the mansion stays connected)")
+    parser.add_argument("--shift-every", type=int, default=10, help="Moves between shifts (default: 10)")
+    parser.add_argument("--shift-changes", type=int, default=4,
+                        help="Passages closed or opened per shift (default: 4)")
+    parser.add_argument("--travel-fps", type=int, default=30,
+                        help="Frame rate cap for travel animations; 0 jumps straight to the destination (default: 30)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    if args.shifting and args.lazy:
+        parser.error("--shifting needs a full map and cannot be combined with --lazy")
+    if args.shift_every < 1:
+        parser.error("--shift-every must be at least 1")
+    return args
 
 # --- Run the game ---
 if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("ESCDELAY", "25") # Esc cancels travel without curses' default 1s wait
+    instrument.start(args) # Results are printed at exit, after curses has restored the terminal
     # curses.wrapper handles terminal setup and cleanup
-    curses.wrapper(main)
+    curses.wrapper(main, args)
     print("Game exited.") 
\ No newline at end of file
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Maze statistics for mkmap mansions, so generation parameters can be tuned
+on data rather than by playtesting.
+
+analyze() takes the room dicts of a mansion_map.json (or Room.to_dict() of
+a generate_maze grid) and computes, in time linear in the number of rooms:
+  - dead ends (one passage) and junctions (three or more);
+  - branching factor: the mean number of ways on from a room that is not a
+    dead end (its passages minus the one you came in by);
+  - corridors: chains of two-passage rooms between two other rooms, with a
+    histogram of their lengths in passages;
+  - stair density: stairs up from each floor per room on that floor;
+  - the distribution of distances from the Foyer, recomputed by BFS;
+  - cycles: passages beyond a spanning tree (E - V + components), i.e. what
+    extra_prob added on top of the DFS maze;
+  - diameter: the longest shortest path found by a double BFS sweep. It is
+    exact when the mansion is a tree (no cycles) and a lower bound otherwise.
+
+Summarise one map:
+    python mapstats.py mansion_map.json
+Tabulate many maps, or generate and analyse a sweep in a process pool:
+    python mapstats.py maps/*.json --out stats.csv
+    python mapstats.py --generate 1000 --size 20 20 3 --extra-prob 0 0.05 0.1 --out sweep.jsonl
+CSV cells holding lists are JSON; JSONL rows have the same columns for every
+map, so they load straight into a dataframe or Parquet.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+
+import mkmap
+
+COLUMNS = (
+    "source", "xmax", "ymax", "zmax", "extra_prob", "seed",
+    "rooms", "components", "passages", "stairs", "dead_ends", "dead_end_ratio", "junctions",
+    "mean_degree", "branching_factor", "cycles",
+    "corridors", "mean_corridor_length", "max_corridor_length", "corridor_length_histogram",
+    "stair_density", "difficulty_mean", "difficulty_median", "difficulty_max", "difficulty_histogram",
+    "portal_difficulty", "diameter", "diameter_exact",
+)
+
+
+def _bfs(adjacency, start):
+    """Distances from start (-1 where unreachable) and the last room reached."""
+    distances = [-1] * len(adjacency)
+    distances[start] = 0
+    queue = collections.deque([start])
+    last = start
+    while queue:
+        last = queue.popleft()
+        for neighbour in adjacency[last]:
+            if distances[neighbour] < 0:
+                distances[neighbour] = distances[last] + 1
+                queue.append(neighbour)
+    return distances, last
+
+
+def _corridor_lengths(adjacency, degree):
+    """Length in passages of every corridor: a maximal chain of two-passage rooms and the passages at its ends."""
+    lengths = []
+    walked = bytearray(len(adjacency))
+    for start, neighbours in enumerate(adjacency):
+        if degree[start] == 2:
+            continue
+        for first in neighbours:
+            if degree[first] != 2:
+                if start < first:
+                    lengths.append(1) # A passage straight between two junctions/dead ends
+                continue
+            if walked[first]:
+                continue # Already walked from its other end
+            previous, current, length = start, first, 1
+            while degree[current] == 2:
+                walked[current] = 1
+                a, b = adjacency[current]
+                previous, current = current, (b if a == previous else a)
+                length += 1
+            lengths.append(length)
+    # Whatever is left is a loop of two-passage rooms with no way off it
+    for start in range(len(adjacency)):
+        if degree[start] == 2 and not walked[start]:
+            walked[start] = 1
+            previous, current, length = start, adjacency[start][0], 1
+            while current != start:
+                walked[current] = 1
+                a, b = adjacency[current]
+                previous, current = current, (b if a == previous else a)
+                length += 1
+            lengths.append(length)
+    return lengths
+
+
+def _histogram(values):
+    counts = [0] * (max(values, default=-1) + 1)
+    for value in values:
+        counts[value] += 1
+    return counts
+
+
+def _median(histogram, total):
+    """Lower median of the values counted in histogram."""
+    seen = 0
+    for value, count in enumerate(histogram):
+        seen += count
+        if 2 * seen >= total:
+            return value
+    return None
+
+
+def analyze(room_dicts):
+    """Statistics (a dict with the COLUMNS that describe the map itself) for a list of room dicts."""
+    index = {room["id"]: i for i, room in enumerate(room_dicts)}
+    adjacency = [[] for _ in room_dicts]
+    floor_rooms = collections.Counter()
+    floor_stairs = collections.Counter()
+    foyer = portal = None
+    for i, room in enumerate(room_dicts):
+        z = room["coords"][2]
+        floor_rooms[z] += 1
+        for direction, target in room["connections"].items():
+            if target is None or target not in index:
+                continue
+            adjacency[i].append(index[target])
+            if direction == 'U':
+                floor_stairs[z] += 1
+        if room.get("is_foyer"):
+            foyer = i
+        if room.get("is_portal"):
+            portal = i
+
+    rooms = len(room_dicts)
+    degree = [len(neighbours) for neighbours in adjacency]
+    edges = sum(degree) // 2
+    stairs = sum(floor_stairs.values())
+
+    # Connected components, for the cycle count
+    component = [-1] * rooms
+    components = 0
+    for start in range(rooms):
+        if component[start] >= 0:
+            continue
+        component[start] = components
+        stack = [start]
+        while stack:
+            current = stack.pop()
+            for neighbour in adjacency[current]:
+                if component[neighbour] < 0:
+                    component[neighbour] = components
+                    stack.append(neighbour)
+        components += 1
+
+    dead_ends = sum(1 for d in degree if d == 1)
+    onward = [d - 1 for d in degree if d >= 2]
+    corridors = _corridor_lengths(adjacency, degree)
+
+    origin = foyer if foyer is not None else 0
+    difficulty, farthest = _bfs(adjacency, origin) if rooms else ([], None)
+    reachable = [d for d in difficulty if d >= 0]
+    difficulty_histogram = _histogram(reachable)
+    cycles = edges - rooms + components
+    diameter = max(_bfs(adjacency, farthest)[0]) if rooms else 0
+
+    return {
+        "rooms": rooms,
+        "components": components,
+        "passages": edges - stairs,
+        "stairs": stairs,
+        "dead_ends": dead_ends,
+        "dead_end_ratio": round(dead_ends / rooms, 6) if rooms else 0.0,
+        "junctions": sum(1 for d in degree if d >= 3),
+        "mean_degree": round(sum(degree) / rooms, 6) if rooms else 0.0,
+        "branching_factor": round(sum(onward) / len(onward), 6) if onward else 0.0,
+        "cycles": cycles,
+        "corridors": len(corridors),
+        "mean_corridor_length": round(sum(corridors) / len(corridors), 6) if corridors else 0.0,
+        "max_corridor_length": max(corridors, default=0),
+        "corridor_length_histogram": _histogram(corridors),
+        "stair_density": [round(floor_stairs[z] / floor_rooms[z], 6) for z in sorted(floor_rooms)],
+        "difficulty_mean": round(sum(reachable) / len(reachable), 6) if reachable else 0.0,
+        "difficulty_median": _median(difficulty_histogram, len(reachable)),
+        "difficulty_max": len(difficulty_histogram) - 1,
+        "difficulty_histogram": difficulty_histogram,
+        "portal_difficulty": difficulty[portal] if portal is not None else None,
+        "diameter": diameter,
+        "diameter_exact": cycles == 0 and components == 1,
+    }
+
+
+def analyze_rooms(rooms):
+    """analyze() for a Room grid as returned by mkmap.generate_maze."""
+    return analyze([room.to_dict() for plane in rooms for column in plane for room in column])
+
+
+def analyze_file(path):
+    with open(path) as f:
+        data = json.load(f)
+    row = dict.fromkeys(COLUMNS)
+    dimensions = data.get("dimensions", {})
+    row.update(source=path, xmax=dimensions.get("xmax"), ymax=dimensions.get("ymax"), zmax=dimensions.get("zmax"))
+    row.update(analyze(data["rooms"]))
+    return row
+
+
+def generate_and_analyze(task):
+    """Process pool worker: (xmax, ymax, zmax, extra_prob, seed) -> row."""
+    xmax, ymax, zmax, extra_prob, seed = task
+    with contextlib.redirect_stdout(io.StringIO()):
+        rooms = mkmap.generate_maze(xmax, ymax, zmax, extra_prob, seed=seed)
+    row = dict.fromkeys(COLUMNS)
+    row.update(source="generated", xmax=xmax, ymax=ymax, zmax=zmax, extra_prob=extra_prob, seed=seed)
+    row.update(analyze_rooms(rooms))
+    return row
+
+
+def write_rows(rows, out, fmt):
+    """Write rows to the open file out as CSV (lists as JSON) or JSONL; returns how many were written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in row.items()})
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def print_summary(row):
+    for column in COLUMNS:
+        if row.get(column) is not None:
+            print(f"{column:<26} {row[column]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maze statistics for mansion maps.")
+    parser.add_argument("maps", nargs="*", help="mansion_map.json files to analyse")
+    parser.add_argument("--generate", type=int, metavar="N", help="Generate N maps per --extra-prob (seeds --seed-start..) and analyse them")
+    parser.add_argument("--size", type=int, nargs=3, metavar=("X", "Y", "Z"), default=[20, 20, 3], help="Size of generated maps")
+    parser.add_argument("--extra-prob", type=float, nargs="+", default=[0.05], help="extra_prob values to sweep")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--out", help="Output file (default: stdout; a summary when there is one map)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Output format (default: from --out's extension, else csv)")
+    args = parser.parse_args()
+
+    if not args.maps and not args.generate:
+        parser.error("give map files or --generate N")
+    fmt = args.format or ("jsonl" if args.out and args.out.endswith(".jsonl") else "csv")
+
+    if args.generate:
+        tasks = [(*args.size, prob, seed) for prob in args.extra_prob
+                 for seed in range(args.seed_start, args.seed_start + args.generate)]
+        work, function = tasks, generate_and_analyze
+    else:
+        work, function = args.maps, analyze_file
+
+    if len(work) == 1 and not args.out:
+        print_summary(function(work[0]))
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = pool.map(function, work, chunksize=max(1, len(work) // (workers * 8)))
+        if args.out:
+            with open(args.out, "w", newline="") as out:
+                count = write_rows(rows, out, fmt)
+            print(f"{count} maps analysed; {fmt.upper()} written to {args.out}")
+        else:
+            write_rows(rows, sys.stdout, fmt)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Turn an mkmap mansion into a world verne/mansion_game.py can play.
+
+mansion_map.json is read a block at a time: each room of the "rooms" array
+is decoded, packed into per-cell arrays and dropped, so the map is never in
+memory as JSON. What is kept is about a dozen bytes per room:
+  - doors: one bit per direction (N S E W U D), plus a bit for "present";
+  - locked: the same bits for the doors locked below;
+  - kind and detail: which templates the room's name and text use;
+  - depth and parent: a BFS from the Foyer over the doors.
+
+Exits come from the connections, and every room's name and text from
+templates chosen by a CounterRNG draw on its cell, so the same map and seed
+always give the same world. Doors are locked with probability --lock-prob,
+both sides with the same key, and the key is put in a room 1..--key-spread
+steps back along the BFS path to the nearer side of the door. Such a room is
+strictly closer to the Foyer than either side of the door, so by induction
+on the distance every room stays reachable: the doors on a shortest path to
+a room at distance d are opened by keys lying at distances below d.
+
+rooms.json is written in chunks of about --chunk-kb as rooms are generated,
+to a temporary file that replaces the output when complete. --max-memory
+refuses maps whose arrays, locks and write buffer would not fit, before
+reading further than the dimensions.
+
+    python mapworld.py mansion_map.json -o verne/world.json --lock-prob 0.05
+    python verne/mansion_game.py verne/world.json
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from array import array
+
+import instrument
+from mkmap import CounterRNG, cell_index, np
+
+DIRECTIONS = ('N', 'S', 'E', 'W', 'U', 'D')
+OFFSETS = {'N': (0, -1, 0), 'S': (0, 1, 0), 'E': (1, 0, 0), 'W': (-1, 0, 0), 'U': (0, 0, 1), 'D': (0, 0, -1)}
+OPPOSITE = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E', 'U': 'D', 'D': 'U'}
+BIT = {direction: 1 << i for i, direction in enumerate(DIRECTIONS)}
+PRESENT = 0x80
+WORDS = {'N': "north", 'S': "south", 'E': "east", 'W': "west", 'U': "up", 'D': "down"}
+
+# Bytes per room of doors, locked, kind, detail, depth and parent, and a generous figure per lock
+# (two dict entries and a list slot)
+INDEX_BYTES_PER_ROOM = 12
+BYTES_PER_LOCK = 400
+BYTES_PER_ROOM_DICT = 4096 # A generated room before it is encoded
+READ_BLOCK = 1 << 16
+
+_NON_SPACE = re.compile(r"[^ \t\r\n]")
+ROOMS_PER_DUMP = 256 # Rooms encoded per json.dumps call when writing
+
+PURPOSE_KIND = 1
+PURPOSE_DETAIL = 2
+PURPOSE_LOCK = 3
+PURPOSE_KEY = 4
+PURPOSE_METAL = 5
+
+KINDS = (
+    ("Library", "Shelves of mildewed books lean over a reading table."),
+    ("Gallery", "Portraits with scratched-out faces line the walls."),
+    ("Study", "A writing desk is buried under yellowed letters."),
+    ("Parlour", "Dust sheets cover a circle of armchairs."),
+    ("Conservatory", "Dead vines climb the cracked glass overhead."),
+    ("Billiard Room", "Balls lie frozen mid-game on the faded baize."),
+    ("Music Room", "A piano stands with its lid propped open."),
+    ("Armory", "Empty racks show the outlines of missing swords."),
+    ("Chapel", "Candles have guttered out before a bare altar."),
+    ("Kitchen", "Copper pans hang above a cold iron range."),
+    ("Nursery", "A rocking horse creaks, though nothing moves it."),
+    ("Observatory", "A brass telescope points at a painted-over window."),
+    ("Workshop", "Gears and springs are scattered across a workbench."),
+    ("Bedchamber", "Moth-eaten curtains hang around a four-poster bed."),
+)
+DETAILS = (
+    "The air smells of candle smoke.",
+    "Somewhere a clock ticks out of time.",
+    "Floorboards groan under your weight.",
+    "A draught stirs the cobwebs.",
+    "Faint music seems to come from the walls.",
+    "Your footsteps echo longer than they should.",
+    "The wallpaper peels in long strips.",
+    "A mirror shows the room a moment late.",
+)
+CONTAINERS = ("urn", "chest", "drawer", "vase", "cabinet", "trunk", "bureau", "coffer")
+METALS = ("Brass", "Iron", "Silver", "Bronze", "Copper", "Pewter", "Gold", "Steel")
+
+
+class _MapReader:
+    """
+    ("dimensions", value), ... then ("room", room dict) for each room of a
+    mansion_map.json, decoded a block at a time with JSONDecoder.raw_decode.
+    """
+
+    def __init__(self, f, block_size=READ_BLOCK):
+        self.f = f
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        if self.eof:
+            return False
+        block = self.f.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        if self.pos > self.block_size:
+            self.buffer = self.buffer[self.pos:] # Drop what has been decoded
+            self.pos = 0
+        self.buffer += block
+        return True
+
+    def _next_char(self):
+        """The next non-whitespace character, without consuming it."""
+        while True:
+            match = _NON_SPACE.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return match.group()
+            self.pos = len(self.buffer)
+            if not self._more():
+                raise ValueError("mansion map ended unexpectedly")
+
+    def _expect(self, chars):
+        char = self._next_char()
+        if char not in chars:
+            raise ValueError(f"mansion map: expected {' or '.join(map(repr, chars))} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def _value(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise
+            if end < len(self.buffer) or self.eof or not self._more():
+                # A number at the end of the buffer may continue in the next block
+                self.pos = end
+                return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._next_char() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "rooms":
+                self._expect("[")
+                if self._next_char() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield "room", self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                yield key, self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+class World:
+    """The packed map and the locks placed on it; room(index) generates a rooms.json room."""
+
+    def __init__(self, xmax, ymax, zmax, seed=0):
+        self.xmax, self.ymax, self.zmax = xmax, ymax, zmax
+        size = xmax * ymax * zmax
+        self.rng = CounterRNG(seed)
+        self.doors = bytearray(size)
+        self.locked = bytearray(size)
+        self.kinds = bytearray(size)
+        self.details = bytearray(size)
+        self.strides = {'N': -xmax, 'S': xmax, 'E': 1, 'W': -1, 'U': xmax * ymax, 'D': -xmax * ymax}
+        self.depth = array('i', [-1]) * size
+        self.parent = array('i', [-1]) * size
+        self.foyer = None
+        self.portal = None
+        self.lock_keys = {} # (cell, direction) -> key number
+        self.keys_in = {}   # cell -> key numbers found there
+        self.locks = 0
+
+    def neighbour(self, index, direction):
+        """The cell through a door; only meaningful where the door exists."""
+        return index + self.strides[direction]
+
+    def coords(self, index):
+        return index % self.xmax, index // self.xmax % self.ymax, index // (self.xmax * self.ymax)
+
+    def add_room(self, room):
+        x, y, z = room["coords"]
+        if not (0 <= x < self.xmax and 0 <= y < self.ymax and 0 <= z < self.zmax):
+            raise ValueError(f"room {room['id']!r}: coords {x},{y},{z} outside the map")
+        index = cell_index(x, y, z, self.xmax, self.ymax)
+        bits = PRESENT
+        for direction, target in room["connections"].items():
+            if target is None:
+                continue
+            dx, dy, dz = OFFSETS[direction]
+            nx, ny, nz = x + dx, y + dy, z + dz
+            if target != f"{nx}-{ny}-{nz}" or not (0 <= nx < self.xmax and 0 <= ny < self.ymax and 0 <= nz < self.zmax):
+                raise ValueError(f"room {room['id']!r}: {direction} passage leads to {target!r}, not a neighbour")
+            bits |= BIT[direction]
+        self.doors[index] = bits
+        if room.get("is_foyer"):
+            self.foyer = index
+        if room.get("is_portal"):
+            self.portal = index
+
+    def check(self):
+        """Every room present, every door two-way, and a Foyer."""
+        if self.foyer is None:
+            raise ValueError("mansion map has no Foyer (is_foyer)")
+        doors = self.doors
+        for index, bits in enumerate(doors):
+            if not bits & PRESENT:
+                raise ValueError("mansion map has no room at {}-{}-{}".format(*self.coords(index)))
+            for direction in DIRECTIONS:
+                if bits & BIT[direction] and not doors[self.neighbour(index, direction)] & BIT[OPPOSITE[direction]]:
+                    raise ValueError(f"one-way passage {direction} from cell {index}")
+
+    def measure_depths(self):
+        """BFS over the doors from the Foyer; unreachable rooms keep depth -1."""
+        doors, depth, parent = self.doors, self.depth, self.parent
+        steps = [(BIT[d], self.strides[d]) for d in DIRECTIONS]
+        depth[self.foyer] = 0
+        frontier = [self.foyer]
+        distance = 0
+        while frontier:
+            distance += 1
+            following = []
+            for index in frontier:
+                bits = doors[index]
+                for bit, stride in steps:
+                    if bits & bit:
+                        neighbour = index + stride
+                        if depth[neighbour] < 0:
+                            depth[neighbour] = distance
+                            parent[neighbour] = index
+                            following.append(neighbour)
+            frontier = following
+        if self.portal is None or depth[self.portal] < 0:
+            # No Portal (or an unreachable one): the farthest room in cell order
+            self.portal = max(range(len(depth)), key=depth.__getitem__)
+
+    def place_locks(self, lock_prob, key_spread):
+        """Lock doors between rooms away from the Foyer, each key on the BFS path before its door."""
+        rng, doors, depth, parent = self.rng, self.doors, self.depth, self.parent
+        for index, bits in enumerate(doors):
+            for draw, direction in enumerate(('E', 'S', 'U')): # Each door once, from its west/north/lower side
+                if not bits & BIT[direction] or rng.random(PURPOSE_LOCK, index, draw) >= lock_prob:
+                    continue
+                other = self.neighbour(index, direction)
+                near = index if depth[index] <= depth[other] else other
+                if depth[near] < 1 or self.portal in (index, other):
+                    continue
+                key_room = near
+                for _ in range(1 + rng.below(min(key_spread, depth[near]), PURPOSE_KEY, index, draw)):
+                    key_room = parent[key_room]
+                key = self.locks
+                self.locks += 1
+                self.locked[index] |= BIT[direction]
+                self.locked[other] |= BIT[OPPOSITE[direction]]
+                self.lock_keys[index, direction] = self.lock_keys[other, OPPOSITE[direction]] = key
+                self.keys_in.setdefault(key_room, []).append(key)
+
+    def choose_templates(self, block=1 << 16):
+        """A kind (name and first sentence) and a detail sentence for every room, drawn once per cell."""
+        rng, size = self.rng, len(self.kinds)
+        if np is not None:
+            for start in range(0, size, block): # In blocks, so the float arrays stay small
+                indices = np.arange(start, min(start + block, size), dtype=np.uint64)
+                end = start + len(indices)
+                self.kinds[start:end] = (rng.random_array(PURPOSE_KIND, indices) * len(KINDS)).astype(np.uint8).tobytes()
+                self.details[start:end] = (rng.random_array(PURPOSE_DETAIL, indices) * len(DETAILS)).astype(np.uint8).tobytes()
+        else:
+            for index in range(size):
+                self.kinds[index] = int(rng.random(PURPOSE_KIND, index) * len(KINDS))
+                self.details[index] = int(rng.random(PURPOSE_DETAIL, index) * len(DETAILS))
+
+    def key_name(self, key):
+        return f"{METALS[self.rng.below(len(METALS), PURPOSE_METAL, key)]} Key No. {key + 1}"
+
+    def room_id(self, index):
+        if index == self.foyer:
+            kind = "Foyer"
+        elif index == self.portal:
+            kind = "Portal Chamber"
+        else:
+            kind = KINDS[self.kinds[index]][0]
+        return "{} {}-{}-{}".format(kind, *self.coords(index))
+
+    def room(self, index):
+        """The rooms.json room for a cell."""
+        bits, locked = self.doors[index], self.locked[index]
+        if index == self.foyer:
+            text = ["The front door has slammed shut behind you. Dust hangs in the grand entrance hall."]
+        elif index == self.portal:
+            text = ["The air crackles. A shimmering **portal** hangs above a ring of scorched boards."]
+        else:
+            text = [KINDS[self.kinds[index]][1]]
+        text.append(DETAILS[self.details[index]])
+
+        ways = [f"**{WORDS[d]}**" for d in ('N', 'E', 'S', 'W') if bits & BIT[d]]
+        if ways:
+            listed = ", ".join(ways[:-1]) + (" and " if len(ways) > 1 else "") + ways[-1]
+            text.append(f"Doorways lead {listed}.")
+        if bits & BIT['U']:
+            text.append("A staircase climbs **up**.")
+        if bits & BIT['D']:
+            text.append("Steps lead **down**.")
+        for direction in DIRECTIONS:
+            if locked & BIT[direction]:
+                text.append(f"The way **{WORDS[direction]}** is barred by a locked door.")
+
+        items = []
+        for n, key in enumerate(self.keys_in.get(index, ())):
+            container = CONTAINERS[(index + n) % len(CONTAINERS)] + (str(n // len(CONTAINERS) + 1) if n >= len(CONTAINERS) else "")
+            text.append(f"An old **{container}** stands against the wall.")
+            items.append({"name": container, "type": "inventory",
+                          "description": f"Inside the **{container}** you find a {self.key_name(key)}.",
+                          "gives_item": self.key_name(key)})
+
+        exits = []
+        for direction in DIRECTIONS:
+            if not bits & BIT[direction]:
+                continue
+            exit = {"name": WORDS[direction], "direction": WORDS[direction],
+                    "to": self.room_id(self.neighbour(index, direction)), "locked": bool(locked & BIT[direction])}
+            if exit["locked"]:
+                exit["key"] = self.key_name(self.lock_keys[index, direction])
+            exits.append(exit)
+        if index == self.portal:
+            exits.append({"name": "portal", "direction": "through", "to": "END", "locked": False})
+        return {"id": self.room_id(index), "entry_text": " ".join(text), "items": items, "exits": exits}
+
+
+def estimate_memory(rooms, lock_prob, chunk_bytes):
+    """
+    Bytes a conversion needs besides the interpreter: the packed map, the
+    locks, the read buffer, and the write buffer three times over (the
+    pieces, the joined chunk and its encoding while it is written).
+    """
+    return (rooms * INDEX_BYTES_PER_ROOM + int(rooms * 3 * lock_prob) * BYTES_PER_LOCK
+            + 4 * READ_BLOCK + 3 * chunk_bytes + ROOMS_PER_DUMP * BYTES_PER_ROOM_DICT)
+
+
+def convert(map_path, out_path, seed=0, lock_prob=0.05, key_spread=6, chunk_bytes=1 << 20, max_memory=None):
+    """Write the rooms.json world for a mansion_map.json; returns a summary dict."""
+    start = time.monotonic()
+    world = None
+    with open(map_path, encoding="utf-8") as f, instrument.span("read_map"):
+        for key, value in _MapReader(f):
+            if key == "dimensions":
+                xmax, ymax, zmax = value["xmax"], value["ymax"], value["zmax"]
+                if xmax <= 0 or ymax <= 0 or zmax <= 0:
+                    raise ValueError("Dimensions must be positive integers")
+                needed = estimate_memory(xmax * ymax * zmax, lock_prob, chunk_bytes)
+                if max_memory is not None and needed > max_memory:
+                    raise ValueError(f"a {xmax}x{ymax}x{zmax} map needs about {needed / 1e6:.0f} MB, "
+                                     f"over the {max_memory / 1e6:.0f} MB limit")
+                world = World(xmax, ymax, zmax, seed)
+            elif key == "room":
+                if world is None:
+                    raise ValueError("mansion map lists rooms before its dimensions")
+                world.add_room(value)
+    if world is None:
+        raise ValueError("mansion map has no dimensions")
+    world.check()
+    with instrument.span("measure_depths"):
+        world.measure_depths()
+    with instrument.span("place_locks"):
+        world.place_locks(lock_prob, key_spread)
+    with instrument.span("choose_templates"):
+        world.choose_templates()
+
+    written = 0
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as out, instrument.span("write_world"):
+        head = {"start_room": world.room_id(world.foyer), "end_room": "END"}
+        chunk = [json.dumps(head, ensure_ascii=False)[:-1] + ', "rooms": [\n']
+        size = len(chunk[0])
+        rooms = len(world.doors)
+        for first in range(0, rooms, ROOMS_PER_DUMP):
+            batch = [world.room(index) for index in range(first, min(first + ROOMS_PER_DUMP, rooms))]
+            text = json.dumps(batch, ensure_ascii=False, separators=(",", ":"))[1:-1]
+            chunk.append(text if first == 0 else ",\n" + text)
+            size += len(text) + 2
+            if size >= chunk_bytes:
+                written += out.write("".join(chunk))
+                chunk, size = [], 0
+        chunk.append("\n]}\n")
+        written += out.write("".join(chunk))
+    os.replace(tmp, out_path)
+    return {
+        "rooms": len(world.doors), "locks": world.locks, "keys_in_rooms": len(world.keys_in),
+        "start_room": world.room_id(world.foyer), "portal_room": world.room_id(world.portal),
+        "portal_depth": world.depth[world.portal], "chars": written,
+        "estimated_bytes": estimate_memory(len(world.doors), lock_prob, chunk_bytes),
+        "seconds": time.monotonic() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an mkmap mansion_map.json into a verne rooms.json world.")
+    parser.add_argument("map", nargs="?", default="mansion_map.json")
+    parser.add_argument("-o", "--out", default=os.path.join("verne", "world.json"), help="rooms.json to write")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for room names, text and locks")
+    parser.add_argument("--lock-prob", type=float, default=0.05, help="Probability of locking each door (0.0 to 1.0)")
+    parser.add_argument("--key-spread", type=int, default=6, help="Most steps back from a door its key can be")
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="Write rooms.json in chunks of about this size")
+    parser.add_argument("--max-memory", type=float, default=None, help="Refuse maps needing more than this many MB")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    if not (0.0 <= args.lock_prob <= 1.0):
+        parser.error("--lock-prob must be between 0.0 and 1.0")
+    if args.key_spread < 1:
+        parser.error("--key-spread must be at least 1")
+    instrument.start(args)
+    try:
+        summary = convert(args.map, args.out, seed=args.seed, lock_prob=args.lock_prob, key_spread=args.key_spread,
+                          chunk_bytes=args.chunk_kb * 1024,
+                          max_memory=args.max_memory * 1e6 if args.max_memory is not None else None)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"{summary['rooms']} rooms, {summary['locks']} locked doors with keys in {summary['keys_in_rooms']} rooms, "
+          f"start {summary['start_room']!r}, portal {summary['portal_room']!r} at depth {summary['portal_depth']}")
+    print(f"Wrote {args.out} ({summary['chars'] / 1e6:.1f} M chars) in {summary['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Per-call metrics for the generation tools.
+
+Every model call (and every cache hit that avoided one) is recorded with its
+stage, model, wall-clock latency, queue wait, token counts and whether it was
+served from cache. Records are kept in memory for the end-of-run summary and
+optionally appended to a JSONL file as they happen.
+
+llm_client records the network calls itself; callers only have to pass a
+stage name and, if they want a file, call configure(sink_path).
+
+Summarise an existing JSONL file with:
+    python metrics.py run.jsonl
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+
+# USD per million tokens (input, output). Calls to models missing here are
+# counted but not priced.
+PRICES = {
+    "gpt-4.5-preview": (75.00, 150.00),
+    "o1": (15.00, 60.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-image-1": (10.00, 40.00),
+}
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    price = PRICES.get(model)
+    if price is None or (prompt_tokens is None and completion_tokens is None):
+        return None
+    return ((prompt_tokens or 0) * price[0] + (completion_tokens or 0) * price[1]) / 1_000_000
+
+
+def usage_tokens(usage):
+    """(prompt, completion) token counts from a chat or image usage object."""
+    if usage is None:
+        return None, None
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt is None and completion is None:
+        # Image endpoints report input/output tokens instead
+        prompt = getattr(usage, "input_tokens", None)
+        completion = getattr(usage, "output_tokens", None)
+    return prompt, completion
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class MetricsRecorder:
+    def __init__(self, sink_path=None):
+        self.records = []
+        self.sink_path = sink_path
+        self._sink = open(sink_path, "a") if sink_path else None
+        self._lock = threading.Lock()
+
+    def record(self, stage, model=None, latency=0.0, queue_wait=0.0, prompt_tokens=None,
+               completion_tokens=None, cache_hit=False, retries=0, error=None):
+        entry = {
+            "time": time.time(),
+            "stage": stage or "unknown",
+            "model": model,
+            "latency": round(latency, 6),
+            "queue_wait": round(queue_wait, 6),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cache_hit": cache_hit,
+            "retries": retries,
+            "cost": None if cache_hit else call_cost(model, prompt_tokens, completion_tokens),
+        }
+        if error is not None:
+            entry["error"] = str(error)
+        with self._lock:
+            self.records.append(entry)
+            if self._sink:
+                self._sink.write(json.dumps(entry) + "\n")
+                self._sink.flush()
+        return entry
+
+    def close(self):
+        with self._lock:
+            if self._sink:
+                self._sink.close()
+                self._sink = None
+
+    def summary(self):
+        """Return a table of per-stage latency percentiles, tokens and cost."""
+        return summarize(self.records)
+
+
+def summarize(records):
+    if not records:
+        return "No model calls recorded."
+    stages = {}
+    for entry in records:
+        stages.setdefault(entry["stage"], []).append(entry)
+
+    header = (f"{'stage':<24} {'calls':>5} {'cached':>6} {'errors':>6} {'p50 s':>7} {'p95 s':>7} "
+              f"{'wait p95':>8} {'in tok':>9} {'out tok':>9} {'cost $':>8}")
+    lines = [header, "-" * len(header)]
+
+    def row(name, entries):
+        live = [e for e in entries if not e["cache_hit"]]
+        latencies = [e["latency"] for e in live] or [0.0]
+        waits = [e["queue_wait"] for e in live] or [0.0]
+        costs = [e["cost"] for e in live if e.get("cost") is not None]
+        return (f"{name:<24} {len(entries):>5} {len(entries) - len(live):>6} "
+                f"{sum(1 for e in entries if e.get('error')):>6} "
+                f"{percentile(latencies, 50):>7.2f} {percentile(latencies, 95):>7.2f} "
+                f"{percentile(waits, 95):>8.2f} "
+                f"{sum(e['prompt_tokens'] or 0 for e in live):>9} "
+                f"{sum(e['completion_tokens'] or 0 for e in live):>9} "
+                f"{sum(costs):>8.2f}")
+
+    # Most expensive stages first
+    for name, entries in sorted(stages.items(), key=lambda kv: -sum(e["latency"] for e in kv[1])):
+        lines.append(row(name, entries))
+    lines.append("-" * len(header))
+    lines.append(row("total", records))
+    return "\n".join(lines)
+
+
+_recorder = MetricsRecorder()
+
+
+def configure(sink_path=None):
+    """Replace the process-wide recorder, optionally writing JSONL to sink_path."""
+    global _recorder
+    _recorder.close()
+    _recorder = MetricsRecorder(sink_path)
+    return _recorder
+
+
+def get_recorder():
+    return _recorder
+
+
+def record(stage, **fields):
+    return _recorder.record(stage, **fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a metrics JSONL file.")
+    parser.add_argument("jsonl", nargs="+", help="Metrics file(s) written with --metrics")
+    args = parser.parse_args()
+    records = []
+    for path in args.jsonl:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    print(summarize(records))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,94 @@ import json
 import random
 import argparse
 import collections # Needed for BFS queue
+import concurrent.futures
+import itertools
 import math # Needed for infinity
+import os
+import struct
+import zlib # PNG compression
+from array import array
+
+import instrument
+
+try:
+    import numpy as np # Optional: whole-grid passes run as array operations
+except ImportError:
+    np = None
+
+MASK64 = (1 << 64) - 1
+
+# Purposes keep the random streams of different decisions apart
+PURPOSE_DFS = 1
+PURPOSE_EXTRA_EAST = 2
+PURPOSE_EXTRA_SOUTH = 3
+PURPOSE_PORTAL = 4
+
+def splitmix64(x):
+    """The SplitMix64 finaliser: a well-mixed 64-bit hash of a 64-bit integer."""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def splitmix64_array(x):
+    """splitmix64 over a numpy uint64 array; the arithmetic wraps modulo 2**64 like the masked version."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class CounterRNG:
+    """
+    Counter-based random numbers: every value is a pure function of
+    (seed, purpose, cell index, draw), so a map does not depend on the order
+    in which decisions are made, and the same seed gives the same map however
+    generation is reordered, vectorised or split across workers.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed = seed
+        self._purpose_keys = {}
+
+    def _purpose_key(self, purpose):
+        key = self._purpose_keys.get(purpose)
+        if key is None:
+            key = self._purpose_keys[purpose] = splitmix64(splitmix64(self.seed & MASK64) ^ purpose)
+        return key
+
+    def bits(self, purpose, index, draw=0):
+        return splitmix64(splitmix64(self._purpose_key(purpose) ^ (index & MASK64)) ^ draw)
+
+    def random(self, purpose, index, draw=0):
+        """Float in [0, 1) with 53 random bits."""
+        return (self.bits(purpose, index, draw) >> 11) * (1.0 / (1 << 53))
+
+    def random_array(self, purpose, indices):
+        """random(purpose, i) for every i in a numpy uint64 array, bit-for-bit the same values."""
+        bits = splitmix64_array(splitmix64_array(indices ^ np.uint64(self._purpose_key(purpose))))
+        return (bits >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+    def below(self, n, purpose, index, draw=0):
+        """Integer in [0, n)."""
+        return (self.bits(purpose, index, draw) * n) >> 64
+
+    def shuffled(self, items, purpose, index):
+        """
+        A copy of items in a random order. The Fisher-Yates swaps all come
+        from one 64-bit draw read as mixed-radix digits, which is plenty for
+        the handful of neighbours a room has.
+        """
+        items = list(items)
+        value = self.bits(purpose, index)
+        for i in range(len(items) - 1, 0, -1):
+            value, j = divmod(value, i + 1)
+            items[i], items[j] = items[j], items[i]
+        return items
+
+def cell_index(x, y, z, xmax, ymax):
+    return x + xmax * (y + ymax * z)
 
 class Room:
     def __init__(self, x, y, z):
@@ -25,6 +112,17 @@ class Room:
         else:
             raise ValueError(f"Invalid direction: {direction}")
 
+    def disconnect(self, other_room, direction):
+        opposite_direction = {
+            'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E', 'U': 'D', 'D': 'U'
+        }
+        if direction not in self.connections:
+            raise ValueError(f"Invalid direction: {direction}")
+        if self.connections[direction] != other_room.id:
+            raise ValueError(f"No passage {direction} from {self.id} to {other_room.id}")
+        self.connections[direction] = None
+        other_room.connections[opposite_direction[direction]] = None
+
     def get_symbol(self):
         if self.is_foyer:
             return 'F'
@@ -66,7 +164,10 @@ def get_room_from_id(room_id, rooms_grid, xmax, ymax, zmax):
         return None # Invalid ID format or coords
 
 def calculate_distances_bfs(start_room, rooms_grid, xmax, ymax, zmax):
-    """Calculates shortest path distance from start_room to all others using BFS."""
+    """
+    Calculates shortest path distance from start_room to all others using BFS.
+    Also returns the distances as an array indexed by cell_index (-1 for unreachable rooms).
+    """
     print("Calculating distances from Foyer...")
     # Reset all difficulties
     for x in range(xmax):
@@ -74,8 +175,10 @@ def calculate_distances_bfs(start_room, rooms_grid, xmax, ymax, zmax):
             for z in range(zmax):
                 rooms_grid[x][y][z].difficulty = math.inf
 
+    distances = array('i', [-1]) * (xmax * ymax * zmax)
     queue = collections.deque([(start_room, 0)]) # (room, distance)
     start_room.difficulty = 0
+    distances[cell_index(start_room.x, start_room.y, start_room.z, xmax, ymax)] = 0
     visited_bfs = {start_room.id} # Keep track of visited rooms in this BFS run
 
     while queue:
@@ -88,17 +191,72 @@ def calculate_distances_bfs(start_room, rooms_grid, xmax, ymax, zmax):
                 if neighbor_room: # Should always find a valid room if ID exists
                     visited_bfs.add(neighbor_id)
                     neighbor_room.difficulty = distance + 1
+                    distances[neighbor_room.x + xmax * (neighbor_room.y + ymax * neighbor_room.z)] = distance + 1
                     queue.append((neighbor_room, distance + 1))
     print("Distance calculation complete.")
-
-def generate_maze(xmax, ymax, zmax, extra_connection_prob=0.05):
+    return distances
+
+def add_extra_connections(rooms, rng, prob, carved_east, carved_south):
+    """
+    Open each east/south wall that the DFS left closed with probability prob.
+    Every decision is rng.random(purpose, cell index), so the order of the
+    passes does not matter; with numpy the draws and masks are computed for
+    the whole grid at once and only the chosen walls are touched in Python.
+    """
+    xmax, ymax, zmax = len(rooms), len(rooms[0]), len(rooms[0][0])
+    added = []
+    if np is not None:
+        shape = (zmax, ymax, xmax)
+        index = np.arange(xmax * ymax * zmax, dtype=np.uint64)
+        east = rng.random_array(PURPOSE_EXTRA_EAST, index).reshape(shape) < prob
+        east &= np.frombuffer(carved_east, dtype=np.uint8).reshape(shape) == 0
+        east[:, :, -1] = False
+        south = rng.random_array(PURPOSE_EXTRA_SOUTH, index).reshape(shape) < prob
+        south &= np.frombuffer(carved_south, dtype=np.uint8).reshape(shape) == 0
+        south[:, -1, :] = False
+        added.extend((x, y, z, 'E') for z, y, x in np.argwhere(east).tolist())
+        added.extend((x, y, z, 'S') for z, y, x in np.argwhere(south).tolist())
+    else:
+        for z in range(zmax):
+            for y in range(ymax):
+                for x in range(xmax):
+                    index = cell_index(x, y, z, xmax, ymax)
+                    if x + 1 < xmax and not carved_east[index] and rng.random(PURPOSE_EXTRA_EAST, index) < prob:
+                        added.append((x, y, z, 'E'))
+                    if y + 1 < ymax and not carved_south[index] and rng.random(PURPOSE_EXTRA_SOUTH, index) < prob:
+                        added.append((x, y, z, 'S'))
+
+    for x, y, z, direction in added:
+        neighbor_room = rooms[x + 1][y][z] if direction == 'E' else rooms[x][y + 1][z]
+        rooms[x][y][z].connect(neighbor_room, direction)
+    return len(added)
+
+def farthest_cells(distances, exclude):
+    """Cell indices at the maximum distance, in index order (exclude is left out)."""
+    if np is not None:
+        d = np.frombuffer(distances, dtype=np.int32).copy()
+        if exclude is not None:
+            d[exclude] = -1
+        max_distance = d.max()
+        return [] if max_distance < 0 else np.flatnonzero(d == max_distance).tolist()
+    max_distance = max((d for i, d in enumerate(distances) if i != exclude), default=-1)
+    if max_distance < 0:
+        return []
+    return [i for i, d in enumerate(distances) if d == max_distance and i != exclude]
+
+def generate_maze(xmax, ymax, zmax, extra_connection_prob=0.05, seed=None):
     if xmax <= 0 or ymax <= 0 or zmax <= 0:
         raise ValueError("Dimensions must be positive integers")
+    rng = CounterRNG(seed)
+    print(f"Seed: {rng.seed}")
 
     rooms = [[[Room(x, y, z) for z in range(zmax)] for y in range(ymax)] for x in range(xmax)]
+    total_rooms = xmax * ymax * zmax
+    # Walls the DFS opened, by cell index, for the extra-connection pass
+    carved_east = bytearray(total_rooms)
+    carved_south = bytearray(total_rooms)
     stack = []
     visited_count = 0
-    total_rooms = xmax * ymax * zmax
     # last_visited_room is no longer used for Portal placement
 
     # Start position (Foyer)
@@ -111,105 +269,89 @@ def generate_maze(xmax, ymax, zmax, extra_connection_prob=0.05):
 
     # --- Primary Maze Generation (DFS) ---
     print("Generating initial maze structure (DFS)...")
-    while visited_count < total_rooms:
-        if not stack:
-             # Find an unvisited room to restart DFS - necessary for potentially disconnected graphs
-             print("Warning: DFS Stack empty, searching for unvisited node to ensure all rooms are processed...")
-             unvisited_found = False
-             # Iterate through all rooms to find an unvisited one
-             for x in range(xmax):
-                 for y in range(ymax):
-                     for z in range(zmax):
-                         room_to_check = rooms[x][y][z]
-                         if not room_to_check.visited:
-                             # Found an unvisited node, start a new DFS tree from here
-                             room_to_check.visited = True # Mark visited immediately
-                             stack.append(room_to_check)
-                             visited_count += 1
-                             unvisited_found = True
-                             print(f"Restarting DFS from unconnected node {room_to_check.id}")
-                             break
+    with instrument.span("dfs", rooms=total_rooms):
+        while visited_count < total_rooms:
+            if not stack:
+                 # Find an unvisited room to restart DFS - necessary for potentially disconnected graphs
+                 print("Warning: DFS Stack empty, searching for unvisited node to ensure all rooms are processed...")
+                 unvisited_found = False
+                 # Iterate through all rooms to find an unvisited one
+                 for x in range(xmax):
+                     for y in range(ymax):
+                         for z in range(zmax):
+                             room_to_check = rooms[x][y][z]
+                             if not room_to_check.visited:
+                                 # Found an unvisited node, start a new DFS tree from here
+                                 room_to_check.visited = True # Mark visited immediately
+                                 stack.append(room_to_check)
+                                 visited_count += 1
+                                 unvisited_found = True
+                                 print(f"Restarting DFS from unconnected node {room_to_check.id}")
+                                 break
+                         if unvisited_found: break
                      if unvisited_found: break
-                 if unvisited_found: break
-             if not unvisited_found:
-                 # This should only happen if all rooms somehow got marked visited
-                 # but visited_count < total_rooms, indicating a potential logic error.
-                 print(f"Error: Could not find any remaining unvisited nodes, but expected {total_rooms - visited_count} more.")
-                 break
-
-        current_room = stack[-1] # Peek
-        x, y, z = current_room.x, current_room.y, current_room.z
-
-        # Potential neighbors (dx, dy, dz, direction)
-        potential = [
-            (x + 1, y, z, 'E'), (x - 1, y, z, 'W'),
-            (x, y + 1, z, 'S'), (x, y - 1, z, 'N'),
-            (x, y, z + 1, 'U'), (x, y, z - 1, 'D')
-        ]
-        random.shuffle(potential) # Randomize neighbor selection
-
-        found_neighbor = False
-        for nx, ny, nz, direction in potential:
-            # Check bounds
-            if 0 <= nx < xmax and 0 <= ny < ymax and 0 <= nz < zmax:
-                neighbor_room = rooms[nx][ny][nz]
-                if not neighbor_room.visited:
-                    # Carve path
-                    current_room.connect(neighbor_room, direction)
-                    neighbor_room.visited = True
-                    stack.append(neighbor_room)
-                    visited_count += 1
-                    found_neighbor = True
-                    break # Move to the new neighbor
-
-        if not found_neighbor:
-            stack.pop() # Backtrack
+                 if not unvisited_found:
+                     # This should only happen if all rooms somehow got marked visited
+                     # but visited_count < total_rooms, indicating a potential logic error.
+                     print(f"Error: Could not find any remaining unvisited nodes, but expected {total_rooms - visited_count} more.")
+                     break
+
+            current_room = stack[-1] # Peek
+            x, y, z = current_room.x, current_room.y, current_room.z
+
+            # Potential neighbors (dx, dy, dz, direction)
+            potential = [
+                (x + 1, y, z, 'E'), (x - 1, y, z, 'W'),
+                (x, y + 1, z, 'S'), (x, y - 1, z, 'N'),
+                (x, y, z + 1, 'U'), (x, y, z - 1, 'D')
+            ]
+            # Randomize neighbor selection: one fixed order per cell, whenever it is visited
+            index = cell_index(x, y, z, xmax, ymax)
+            potential = rng.shuffled(potential, PURPOSE_DFS, index)
+
+            found_neighbor = False
+            for nx, ny, nz, direction in potential:
+                # Check bounds
+                if 0 <= nx < xmax and 0 <= ny < ymax and 0 <= nz < zmax:
+                    neighbor_room = rooms[nx][ny][nz]
+                    if not neighbor_room.visited:
+                        # Carve path
+                        current_room.connect(neighbor_room, direction)
+                        if direction == 'E':
+                            carved_east[index] = 1
+                        elif direction == 'W':
+                            carved_east[index - 1] = 1
+                        elif direction == 'S':
+                            carved_south[index] = 1
+                        elif direction == 'N':
+                            carved_south[index - xmax] = 1
+                        neighbor_room.visited = True
+                        stack.append(neighbor_room)
+                        visited_count += 1
+                        found_neighbor = True
+                        break # Move to the new neighbor
+
+            if not found_neighbor:
+                stack.pop() # Backtrack
     print("Initial maze structure complete.")
 
     # --- Add Extra Connections within Floors ---
     print(f"Adding extra connections with probability {extra_connection_prob}...")
-    added_connections = 0
-    for z in range(zmax):
-        for y in range(ymax):
-            for x in range(xmax):
-                current_room = rooms[x][y][z]
-
-                # Check East connection
-                if x + 1 < xmax:
-                    neighbor_room = rooms[x+1][y][z]
-                    if current_room.connections['E'] is None: # If no connection exists
-                        if random.random() < extra_connection_prob:
-                            current_room.connect(neighbor_room, 'E')
-                            added_connections += 1
-
-                # Check South connection
-                if y + 1 < ymax:
-                    neighbor_room = rooms[x][y+1][z]
-                    if current_room.connections['S'] is None: # If no connection exists
-                        if random.random() < extra_connection_prob:
-                            current_room.connect(neighbor_room, 'S')
-                            added_connections += 1
+    with instrument.span("extra_connections"):
+        added_connections = add_extra_connections(rooms, rng, extra_connection_prob, carved_east, carved_south)
     print(f"Added {added_connections} extra horizontal connections.")
 
     # --- Calculate Distances from Foyer ---
-    calculate_distances_bfs(start_room, rooms, xmax, ymax, zmax)
+    with instrument.span("distances"):
+        distances = calculate_distances_bfs(start_room, rooms, xmax, ymax, zmax)
 
     # --- Set Portal based on Difficulty ---
     print("Assigning Portal based on maximum distance...")
-    max_difficulty = -1
-    farthest_rooms = []
-
-    for x in range(xmax):
-        for y in range(ymax):
-            for z in range(zmax):
-                room = rooms[x][y][z]
-                # Exclude foyer itself unless it's the only reachable room
-                if room.difficulty != math.inf and (not room.is_foyer or total_rooms == 1):
-                    if room.difficulty > max_difficulty:
-                        max_difficulty = room.difficulty
-                        farthest_rooms = [room]
-                    elif room.difficulty == max_difficulty:
-                        farthest_rooms.append(room)
+    # Exclude foyer itself unless it's the only reachable room
+    foyer_index = cell_index(start_x, start_y, start_z, xmax, ymax) if total_rooms > 1 else None
+    with instrument.span("portal"):
+        farthest_rooms = [rooms[i % xmax][(i // xmax) % ymax][i // (xmax * ymax)]
+                          for i in farthest_cells(distances, foyer_index)]
 
     if not farthest_rooms:
          # Fallback: if only the foyer is reachable (e.g., 1x1x1 grid or error)
@@ -220,8 +362,8 @@ def generate_maze(xmax, ymax, zmax, extra_connection_prob=0.05):
          else:
               print("Error: Could not find any suitable room for the Portal. No Portal assigned.")
     else:
-        # Choose one random room from the farthest ones
-        portal_room = random.choice(farthest_rooms)
+        # Choose one random room from the farthest ones (in cell index order, so the choice only depends on the seed)
+        portal_room = farthest_rooms[rng.below(len(farthest_rooms), PURPOSE_PORTAL, 0)]
         portal_room.is_portal = True
         print(f"Portal placed in room {portal_room.id} with difficulty {portal_room.difficulty}")
 
@@ -244,6 +386,19 @@ def output_json(rooms, filename="mansion_map.json"):
             }, f, indent=4)
     print(f"JSON map data saved to {filename}")
 
+def rooms_from_json(room_dicts, xmax, ymax, zmax):
+    """Rebuild the Room grid from the room dicts of a mansion_map.json (the inverse of output_json)."""
+    rooms = [[[Room(x, y, z) for z in range(zmax)] for y in range(ymax)] for x in range(xmax)]
+    for data in room_dicts:
+        x, y, z = data["coords"]
+        room = rooms[x][y][z]
+        room.connections.update(data["connections"])
+        room.is_foyer = data.get("is_foyer", False)
+        room.is_portal = data.get("is_portal", False)
+        difficulty = data.get("difficulty", -1)
+        room.difficulty = math.inf if difficulty < 0 else difficulty
+    return rooms
+
 def output_visual_maps(rooms):
     xmax = len(rooms)
     ymax = len(rooms[0])
@@ -303,30 +458,317 @@ def output_visual_maps(rooms):
         print(f"Visual map for floor {z} saved to {filename}")
 
 
+# --- Image maps ---
+# Palette indices; the colours follow mansion.py's curses pairs
+WALL, ROOM, STAIRS, LANDMARK, UNREACHED = range(5)
+BASE_PALETTE = [
+    (0, 0, 0),        # Walls
+    (229, 229, 229),  # Rooms and passages (white)
+    (0, 205, 205),    # Stairs (cyan)
+    (0, 205, 0),      # Foyer/Portal (green)
+    (0, 0, 238),      # Rooms the Foyer does not reach (blue, as unexplored)
+]
+HEAT_BASE = len(BASE_PALETTE)
+HEAT_LEVELS = 64
+HEAT_STOPS = ((68, 1, 84), (33, 145, 140), (253, 231, 37)) # Near the Foyer to farthest from it
+
+def _heat_colour(t):
+    """Colour at t in [0, 1] along HEAT_STOPS."""
+    position = t * (len(HEAT_STOPS) - 1)
+    i = min(int(position), len(HEAT_STOPS) - 2)
+    f = position - i
+    return tuple(round(a + (b - a) * f) for a, b in zip(HEAT_STOPS[i], HEAT_STOPS[i + 1]))
+
+PALETTE = BASE_PALETTE + [_heat_colour(level / (HEAT_LEVELS - 1)) for level in range(HEAT_LEVELS)]
+DOOR_BITS = {'N': 1, 'S': 2, 'E': 4, 'W': 8, 'U': 16, 'D': 32}
+STAIR_BITS = DOOR_BITS['U'] | DOOR_BITS['D']
+BAND_PIXELS = 1 << 23 # Pixels rendered at a time; bounds the memory of an image of any size
+SVG_CELL_COST = 32 # An SVG cell costs about as much memory as this many PNG pixels
+
+def floor_arrays(rooms, z):
+    """
+    Bits (DOOR_BITS) of the passages east, south, up and down, Foyer
+    distances (-1 where unreachable) and (cell, colour) marks for the Foyer
+    and Portal of floor z, as flat arrays indexed by x + xmax * y.
+    """
+    xmax, ymax = len(rooms), len(rooms[0])
+    east, south, up, down = DOOR_BITS['E'], DOOR_BITS['S'], DOOR_BITS['U'], DOOR_BITS['D']
+    doors = bytearray(xmax * ymax)
+    difficulty = array('i', [-1]) * (xmax * ymax)
+    marks = []
+    for x, column in enumerate(rooms):
+        for cell, line in zip(range(x, xmax * ymax, xmax), column):
+            room = line[z]
+            connections = room.connections
+            doors[cell] = ((east if connections['E'] else 0) | (south if connections['S'] else 0)
+                           | (up if connections['U'] else 0) | (down if connections['D'] else 0))
+            if room.difficulty != math.inf:
+                difficulty[cell] = room.difficulty
+            if room.is_foyer or room.is_portal:
+                marks.append((cell, LANDMARK))
+    return doors, difficulty, marks
+
+def _colours(doors, difficulty, marks, heat_max):
+    """
+    Palette index of each room of a stretch of a floor, and of the passages
+    east and south of it (WALL where there is none); marks are (cell, colour)
+    with cells counted from the start of the stretch.
+    """
+    east_bit, south_bit = DOOR_BITS['E'], DOOR_BITS['S']
+    if np is not None:
+        bits = np.frombuffer(doors, dtype=np.uint8)
+        distances = np.frombuffer(difficulty, dtype=np.int32)
+        if heat_max is None:
+            colours = np.where(bits & STAIR_BITS, STAIRS, ROOM).astype(np.uint8)
+            colours[distances < 0] = UNREACHED
+            passages = ROOM
+        else:
+            levels = np.maximum(distances, 0).astype(np.int64) * (HEAT_LEVELS - 1) // max(heat_max, 1)
+            colours = (HEAT_BASE + levels).astype(np.uint8)
+            colours[distances < 0] = UNREACHED
+            passages = colours.copy()
+        for cell, colour in marks:
+            colours[cell] = colour
+        east = np.where(bits & east_bit, passages, WALL).astype(np.uint8)
+        south = np.where(bits & south_bit, passages, WALL).astype(np.uint8)
+        return colours, east, south
+    if heat_max is None:
+        colours = bytearray(UNREACHED if distance < 0 else STAIRS if bits & STAIR_BITS else ROOM
+                            for bits, distance in zip(doors, difficulty))
+        passages = bytes([ROOM]) * len(doors)
+    else:
+        colours = bytearray(HEAT_BASE + distance * (HEAT_LEVELS - 1) // max(heat_max, 1) if distance >= 0
+                            else UNREACHED for distance in difficulty)
+        passages = bytes(colours)
+    for cell, colour in marks:
+        colours[cell] = colour
+    east = bytes(passage if bits & east_bit else WALL for bits, passage in zip(doors, passages))
+    south = bytes(passage if bits & south_bit else WALL for bits, passage in zip(doors, passages))
+    return colours, east, south
+
+def _band(xmax, doors, difficulty, marks, heat_max, y0, y1):
+    """
+    Image rows 2*y0+1 to 2*y1 of a floor, one pixel per room, passage or
+    wall as in output_visual_maps: each row of rooms, then the row south of
+    it. A (rows, 2*xmax+1) uint8 array, or a list of bytearrays without numpy.
+    Colours are worked out for these rooms only, so memory follows the band.
+    """
+    first, last = xmax * y0, xmax * y1
+    colours, east, south = _colours(memoryview(doors)[first:last], memoryview(difficulty)[first:last],
+                                    [(cell - first, colour) for cell, colour in marks if first <= cell < last],
+                                    heat_max)
+    width = 2 * xmax + 1
+    if np is not None:
+        rows = y1 - y0
+        band = np.zeros((2 * rows, width), dtype=np.uint8)
+        band[0::2, 1::2] = colours.reshape(rows, xmax)
+        band[0::2, 2::2] = east.reshape(rows, xmax)
+        band[1::2, 1::2] = south.reshape(rows, xmax)
+        return band
+    lines = []
+    for row in range(0, last - first, xmax):
+        line, below = bytearray(width), bytearray(width)
+        line[1::2] = colours[row:row + xmax]
+        line[2::2] = east[row:row + xmax]
+        below[1::2] = south[row:row + xmax]
+        lines += (line, below)
+    return lines
+
+def _blank(width):
+    """The wall along the north edge, as a band."""
+    return np.zeros((1, width), dtype=np.uint8) if np is not None else [bytearray(width)]
+
+def _png_chunk(f, kind, data):
+    f.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+def _png_rows(band, scale):
+    """
+    The band scaled up, as filtered PNG rows. The first copy of each row uses
+    the Sub filter, which leaves a byte only where the colour changes, and
+    the other scale - 1 copies the Up filter, which leaves none; both
+    compress faster and smaller than the pixels themselves.
+    """
+    if np is not None:
+        rows, width = band.shape
+        out = np.zeros((rows, scale, width * scale + 1), dtype=np.uint8)
+        out[:, 0, 0] = 1
+        out[:, 0, 1] = band[:, 0]
+        out[:, 0, 1 + scale::scale] = band[:, 1:] - band[:, :-1] # Wraps modulo 256, as Sub expects
+        out[:, 1:, 0] = 2
+        return out.tobytes()
+    out = []
+    repeats = (b"\x02" + bytes(len(band[0]) * scale)) * (scale - 1) if band else b""
+    for line in band:
+        changes = bytearray(len(line) * scale)
+        changes[0::scale] = bytes([line[0]]) + bytes((b - a) & 0xFF for a, b in zip(line, line[1:]))
+        out.append(b"\x01" + changes + repeats)
+    return b"".join(out)
+
+def _write_png(f, width, height, bands, scale):
+    """An 8-bit palette PNG, compressed band by band into IDAT chunks."""
+    f.write(b"\x89PNG\r\n\x1a\n")
+    _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width * scale, height * scale, 8, 3, 0, 0, 0))
+    _png_chunk(f, b"PLTE", bytes(component for colour in PALETTE for component in colour))
+    compressor = zlib.compressobj(6)
+    for band in bands:
+        data = compressor.compress(_png_rows(band, scale))
+        if data:
+            _png_chunk(f, b"IDAT", data)
+    _png_chunk(f, b"IDAT", compressor.flush())
+    _png_chunk(f, b"IEND", b"")
+
+def _svg_records(xs, ys, lengths, digits):
+    """'Mx yhnv1Hxz' for each run as rows of an uint8 array, every number right-aligned in digits columns."""
+    fields = (b"M", xs, b" ", ys, b"h", lengths, b"v1H", xs, b"z")
+    out = np.empty((len(xs), sum(len(field) if isinstance(field, bytes) else digits for field in fields)),
+                   dtype=np.uint8)
+    powers = 10 ** np.arange(digits - 1, -1, -1, dtype=np.int64)
+    column = 0
+    for field in fields:
+        if isinstance(field, bytes):
+            out[:, column:column + len(field)] = np.frombuffer(field, dtype=np.uint8)
+            column += len(field)
+            continue
+        places = field[:, None] // powers
+        chars = (places % 10 + ord("0")).astype(np.uint8)
+        chars[:, :-1][places[:, :-1] == 0] = ord(" ") # Leading zeros
+        out[:, column:column + digits] = chars
+        column += digits
+    return out
+
+def _svg_paths(band, top, digits):
+    """
+    [(colour, path data)] for a band whose first row is row top of the image:
+    a unit-high rectangle per run of one colour along a row, walls left out.
+    Numbers are padded to digits characters so that numpy can lay the path
+    data out as fixed-size records; the fallback pads the same way.
+    """
+    if np is not None:
+        starts = np.ones(band.shape, dtype=bool)
+        starts[:, 1:] = band[:, 1:] != band[:, :-1]
+        flat = np.flatnonzero(starts) # Every row starts a run, so no run crosses rows
+        lengths = np.diff(np.append(flat, band.size))
+        values = band.reshape(-1)[flat]
+        keep = np.flatnonzero(values != WALL)
+        keep = keep[np.argsort(values[keep], kind="stable")] # By colour, in image order within one
+        values = values[keep]
+        ys, xs = np.divmod(flat[keep], band.shape[1])
+        records = _svg_records(xs, ys + top, lengths[keep], digits)
+        bounds = [0, *(np.flatnonzero(np.diff(values)) + 1).tolist(), len(values)]
+        return [(int(values[first]), records[first:last].tobytes().decode("ascii"))
+                for first, last in zip(bounds, bounds[1:]) if last > first]
+    runs = {}
+    for row, line in enumerate(band, top):
+        x = 0
+        for colour, group in itertools.groupby(line):
+            length = len(list(group))
+            if colour != WALL:
+                runs.setdefault(colour, []).append(f"M{x:>{digits}} {row:>{digits}}h{length:>{digits}}"
+                                                   f"v1H{x:>{digits}}z")
+            x += length
+    return [(colour, "".join(runs[colour])) for colour in sorted(runs)]
+
+def _write_svg(f, width, height, bands, scale):
+    """An SVG of one unit per image pixel: a black ground and, per band, one path per colour."""
+    f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * scale}" height="{height * scale}" '
+            f'viewBox="0 0 {width} {height}" shape-rendering="crispEdges">\n')
+    f.write(f'<rect width="{width}" height="{height}" fill="#{bytes(PALETTE[WALL]).hex()}"/>\n')
+    digits = len(str(max(width, height)))
+    top = 0
+    for band in bands:
+        for colour, d in _svg_paths(band, top, digits):
+            f.write(f'<path fill="#{bytes(PALETTE[colour]).hex()}" d="{d}"/>\n')
+        top += len(band)
+    f.write("</svg>\n")
+
+def render_floor(task):
+    """
+    Write one floor as a PNG or SVG image, band_pixels at a time, and return
+    its path. task is a tuple so that ProcessPoolExecutor can send it:
+    (path, fmt, xmax, ymax, doors, difficulty, marks, scale, heat_max, band_pixels),
+    the arrays as from floor_arrays; heat_max None draws no heatmap.
+    """
+    path, fmt, xmax, ymax, doors, difficulty, marks, scale, heat_max, band_pixels = task
+    width, height = 2 * xmax + 1, 2 * ymax + 1
+    cost = scale * scale if fmt == "png" else SVG_CELL_COST
+    band_rows = max(1, band_pixels // (2 * width * cost))
+    bands = itertools.chain([_blank(width)], (_band(xmax, doors, difficulty, marks, heat_max, y0,
+                                                    min(y0 + band_rows, ymax)) for y0 in range(0, ymax, band_rows)))
+    tmp = f"{path}.tmp"
+    if fmt == "png":
+        with open(tmp, "wb") as f:
+            _write_png(f, width, height, bands, scale)
+    elif fmt == "svg":
+        with open(tmp, "w", encoding="utf-8") as f:
+            _write_svg(f, width, height, bands, scale)
+    else:
+        raise ValueError(f"Unknown image format: {fmt}")
+    os.replace(tmp, path)
+    return path
+
+def output_image_maps(rooms, formats=("png",), scale=4, heatmap=False, workers=None, band_pixels=BAND_PIXELS,
+                      prefix="mansion_floor"):
+    """
+    Draw every floor to {prefix}_{z}.png and/or .svg, with the layout of the
+    ASCII maps: rooms and passages white, stairs cyan, Foyer and Portal green,
+    scale pixels per cell. With heatmap, rooms and the passages leaving them
+    are shaded by distance from the Foyer on one scale for all floors. Floors
+    are rendered in parallel by up to workers processes (all CPUs if None).
+    """
+    xmax = len(rooms)
+    ymax = len(rooms[0])
+    zmax = len(rooms[0][0])
+    if scale < 1:
+        raise ValueError("Image scale must be at least 1")
+    floors = [floor_arrays(rooms, z) for z in range(zmax)]
+    heat_max = max(max(difficulty) for _, difficulty, _ in floors) if heatmap else None
+    tasks = [(f"{prefix}_{z}.{fmt}", fmt, xmax, ymax, doors, difficulty, marks, scale, heat_max, band_pixels)
+             for z, (doors, difficulty, marks) in enumerate(floors) for fmt in formats]
+    if workers == 1 or len(tasks) == 1:
+        paths = [render_floor(task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = list(pool.map(render_floor, tasks))
+    for path in paths:
+        print(f"Image map saved to {path}")
+    return paths
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate a 3D mansion map for an adventure game.")
     parser.add_argument("xmax", type=int, help="Width of the mansion (number of rooms)")
     parser.add_argument("ymax", type=int, help="Depth of the mansion (number of rooms)")
     parser.add_argument("zmax", type=int, help="Number of floors")
-    parser.add_argument("--seed", type=int, default=None, help="Random seed for generation")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for generation (printed when not given, so the map can be reproduced)")
     parser.add_argument("--extra_prob", type=float, default=0.05, help="Probability of adding extra horizontal connections (0.0 to 1.0)")
-
+    parser.add_argument("--image", action="append", choices=("png", "svg"), default=[], help="Also draw each floor as mansion_floor_{z}.png or .svg (repeat for both)")
+    parser.add_argument("--scale", type=int, default=4, help="Pixels per room, passage or wall in --image maps")
+    parser.add_argument("--heatmap", action="store_true", help="Shade --image maps by distance from the Foyer")
+    parser.add_argument("--workers", type=int, default=None, help="Processes rendering floors for --image (default: all CPUs)")
+    instrument.add_arguments(parser)
 
     args = parser.parse_args()
 
-    if args.seed is not None:
-        random.seed(args.seed)
-
     if not (0.0 <= args.extra_prob <= 1.0):
         print("Error: --extra_prob must be between 0.0 and 1.0")
         return
+    if args.scale < 1:
+        print("Error: --scale must be at least 1")
+        return
+    instrument.start(args)
 
     print(f"Generating a {args.xmax}x{args.ymax}x{args.zmax} mansion map...")
     try:
         # Pass the extra connection probability to the generator
-        mansion_rooms = generate_maze(args.xmax, args.ymax, args.zmax, args.extra_prob)
-        output_json(mansion_rooms)
-        output_visual_maps(mansion_rooms)
+        with instrument.span("generate_maze"):
+            mansion_rooms = generate_maze(args.xmax, args.ymax, args.zmax, args.extra_prob, seed=args.seed)
+        with instrument.span("output_json"):
+            output_json(mansion_rooms)
+        with instrument.span("output_visual_maps"):
+            output_visual_maps(mansion_rooms)
+        if args.image:
+            with instrument.span("output_image_maps"):
+                output_image_maps(mansion_rooms, args.image, args.scale, args.heatmap, args.workers)
         print("Map generation complete.")
     except ValueError as e:
         print(f"Error: {e}")
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Shortest-path index for hints and routes on large mansion maps.
+
+A BFS per query is proportional to the whole map, and a table of every
+pair is quadratic. The index is built once from a map and works on two
+levels:
+
+  - clusters: tiles of cluster_size x cluster_size rooms, cluster_floors
+    floors deep. A room with a passage leaving its cluster is an entrance.
+  - the skeleton: per cluster, the rooms that matter for getting from one
+    entrance to another. Dead ends that hold no entrance are pruned, and
+    the corridors left between entrances and junctions become single links
+    with their length; entrances are also linked across their passages out
+    of the cluster (length 1). Distances between entrances over the
+    skeleton are exactly those in the mansion. Linking each entrance to
+    every other entrance of its cluster would also be exact, but in a maze
+    an entrance reaches dozens of others without passing one, so the
+    skeleton is an order of magnitude smaller.
+
+mkmap's DFS carves stairs as readily as doors (about a third of the rooms
+have one), so clusters one floor deep have most of their rooms on a stair
+and most rooms become entrances. By default a cluster spans every floor,
+which keeps the stairs inside it; cluster_floors=1 gives the per-floor
+tiles, with stairs as links between them.
+
+Queries are answered toward a goal. Each goal keeps a Dijkstra over the
+skeleton, started from the goal's distances to the skeleton rooms of its
+own cluster and run only until the entrances of the clusters queried so
+far are settled, so a goal near the player costs little and a far one no
+more than one pass over the skeleton. A cluster is filled in, when a query
+first lands in it, by a BFS from its entrances started at their distances.
+After that, distance() and next_step() are dictionary lookups, and route()
+is a walk of next steps. The last max_goals goals and max_clusters
+clusters per goal are kept.
+
+    index = PathIndex.from_room_dicts(room_dicts, xmax, ymax, zmax)
+    index.next_step("3-4-0", portal_id)   # ('E', '4-4-0')
+
+    python pathindex.py mansion_map.json --from 3-4-0 [--to 12-9-2]
+"""
+
+import argparse
+import collections
+import heapq
+import json
+import time
+
+DIRECTIONS = ('N', 'S', 'E', 'W', 'U', 'D')
+BIT = {direction: 1 << i for i, direction in enumerate(DIRECTIONS)}
+WORDS = {'N': "north", 'S': "south", 'E': "east", 'W': "west", 'U': "up", 'D': "down"}
+
+
+class _Goal:
+    """Distances to one room: over the skeleton, and per cluster once filled in."""
+
+    __slots__ = ("target", "entrances", "heap", "clusters")
+
+    def __init__(self, target, heap):
+        self.target = target
+        self.entrances = {}                          # settled skeleton cell (entrances included) -> distance
+        self.heap = heap                             # the Dijkstra frontier, [(distance, skeleton cell)]
+        self.clusters = collections.OrderedDict()   # cluster -> {cell: distance}, least recently used first
+
+
+class PathIndex:
+    def __init__(self, xmax, ymax, zmax, doors, cluster_size=8, cluster_floors=None, max_goals=8, max_clusters=256):
+        """doors: a bytearray with BIT[direction] set for each passage of cell x + xmax * (y + ymax * z)."""
+        if cluster_size < 1:
+            raise ValueError("cluster_size must be a positive integer")
+        self.xmax, self.ymax, self.zmax = xmax, ymax, zmax
+        self.doors = doors
+        self.cluster_size = cluster_size
+        self.cluster_floors = min(cluster_floors or zmax, zmax)
+        self.clusters_x = -(-xmax // cluster_size)
+        self.clusters_y = -(-ymax // cluster_size)
+        self.clusters_z = -(-zmax // self.cluster_floors)
+        self.steps = [(direction, BIT[direction], stride) for direction, stride in zip(
+            DIRECTIONS, (-xmax, xmax, 1, -1, xmax * ymax, -xmax * ymax))]
+        self.max_goals = max_goals
+        self.max_clusters = max_clusters
+        clusters = self.clusters_x * self.clusters_y * self.clusters_z
+        self.entrances = [None] * clusters # cluster -> entrance cells
+        self.skeleton = [None] * clusters  # cluster -> skeleton cells, entrances first
+        self.links = {}  # skeleton cell -> [(skeleton cell, distance)]
+        self._goals = collections.OrderedDict()
+        for cluster in range(len(self.entrances)):
+            self._build_cluster(cluster)
+
+    @classmethod
+    def from_rooms(cls, rooms, **options):
+        """From the Room grid of mkmap.generate_maze."""
+        xmax, ymax, zmax = len(rooms), len(rooms[0]), len(rooms[0][0])
+        doors = bytearray(xmax * ymax * zmax)
+        for column in rooms:
+            for line in column:
+                for room in line:
+                    doors[room.x + xmax * (room.y + ymax * room.z)] = sum(
+                        BIT[direction] for direction, target in room.connections.items() if target)
+        return cls(xmax, ymax, zmax, doors, **options)
+
+    @classmethod
+    def from_room_dicts(cls, room_dicts, xmax, ymax, zmax, **options):
+        """From the rooms of a mansion_map.json (or mansion.py's rooms_dict.values())."""
+        doors = bytearray(xmax * ymax * zmax)
+        for room in room_dicts:
+            x, y, z = room["coords"]
+            doors[x + xmax * (y + ymax * z)] = sum(
+                BIT[direction] for direction, target in room["connections"].items() if target)
+        return cls(xmax, ymax, zmax, doors, **options)
+
+    # -----------------------------------------------------------------------
+    #  Cells, ids and clusters
+    # -----------------------------------------------------------------------
+    def cell(self, room_id):
+        x, y, z = (int(part) for part in room_id.split('-'))
+        if not (0 <= x < self.xmax and 0 <= y < self.ymax and 0 <= z < self.zmax):
+            raise ValueError(f"room {room_id!r} is outside the {self.xmax}x{self.ymax}x{self.zmax} map")
+        return x + self.xmax * (y + self.ymax * z)
+
+    def room_id(self, cell):
+        return f"{cell % self.xmax}-{cell // self.xmax % self.ymax}-{cell // (self.xmax * self.ymax)}"
+
+    def cluster_of(self, cell):
+        x, rest = cell % self.xmax, cell // self.xmax
+        y, z = rest % self.ymax, rest // self.ymax
+        return (x // self.cluster_size
+                + self.clusters_x * (y // self.cluster_size + self.clusters_y * (z // self.cluster_floors)))
+
+    def cluster_cells(self, cluster):
+        cx = cluster % self.clusters_x
+        cy = cluster // self.clusters_x % self.clusters_y
+        cz = cluster // (self.clusters_x * self.clusters_y)
+        size, floors = self.cluster_size, self.cluster_floors
+        xs = range(cx * size, min((cx + 1) * size, self.xmax))
+        for z in range(cz * floors, min((cz + 1) * floors, self.zmax)):
+            for y in range(cy * size, min((cy + 1) * size, self.ymax)):
+                row = self.xmax * (y + self.ymax * z)
+                for x in xs:
+                    yield x + row
+
+    def _build_cluster(self, cluster):
+        """Find the cluster's entrances, prune it to its skeleton and link the skeleton rooms."""
+        doors, cluster_of, steps = self.doors, self.cluster_of, self.steps
+        inside = {}   # cell -> neighbours in the cluster
+        entrances = []
+        links = self.links
+        for cell in self.cluster_cells(cluster):
+            bits = doors[cell]
+            neighbours = []
+            outside = []
+            for _, bit, stride in steps:
+                if bits & bit:
+                    neighbour = cell + stride
+                    (neighbours if cluster_of(neighbour) == cluster else outside).append(neighbour)
+            inside[cell] = neighbours
+            if outside:
+                entrances.append(cell)
+                links[cell] = [(neighbour, 1) for neighbour in outside]
+
+        # Prune dead ends back to the first entrance or junction
+        is_entrance = set(entrances)
+        degree = {cell: len(neighbours) for cell, neighbours in inside.items()}
+        pruned = set()
+        stack = [cell for cell, count in degree.items() if count <= 1 and cell not in is_entrance]
+        while stack:
+            cell = stack.pop()
+            pruned.add(cell)
+            for neighbour in inside[cell]:
+                if neighbour not in pruned:
+                    degree[neighbour] -= 1
+                    if degree[neighbour] == 1 and neighbour not in is_entrance:
+                        stack.append(neighbour)
+
+        # Entrances and junctions are kept; the corridors between them become links
+        junctions = [cell for cell, count in degree.items()
+                     if count != 2 and cell not in pruned and cell not in is_entrance]
+        skeleton = entrances + junctions
+        kept = is_entrance.union(junctions)
+        for cell in junctions:
+            links[cell] = []
+        for cell in skeleton:
+            for first in inside[cell]:
+                if first in pruned:
+                    continue
+                previous, current, length = cell, first, 1
+                while current not in kept:
+                    previous, current = current, next(n for n in inside[current] if n != previous and n not in pruned)
+                    length += 1
+                if current != cell:
+                    links[cell].append((current, length))
+        self.entrances[cluster] = entrances
+        self.skeleton[cluster] = skeleton
+
+    def update(self, room_dicts):
+        """
+        Take the passages of rooms that may have changed (such as those in
+        shiftmap.DynamicMansion.changed, as dicts; both rooms of a changed
+        passage must be given). Clusters where a passage did change are
+        rebuilt and the goals forgotten.
+        """
+        clusters = set()
+        for room in room_dicts:
+            x, y, z = room["coords"]
+            cell = x + self.xmax * (y + self.ymax * z)
+            bits = sum(BIT[direction] for direction, target in room["connections"].items() if target)
+            if bits != self.doors[cell]:
+                self.doors[cell] = bits
+                clusters.add(self.cluster_of(cell))
+        for cluster in clusters:
+            for cell in self.skeleton[cluster]:
+                del self.links[cell]
+            self._build_cluster(cluster)
+        if clusters:
+            self._goals.clear()
+
+    # -----------------------------------------------------------------------
+    #  Goals
+    # -----------------------------------------------------------------------
+    def _goal(self, target):
+        goal = self._goals.get(target)
+        if goal is not None:
+            self._goals.move_to_end(target)
+            return goal
+        # Distances from the target to its own cluster's skeleton without leaving it seed the search
+        home = self.cluster_of(target)
+        local = self._fill(home, [(0, target)])
+        heap = [(local[cell], cell) for cell in self.skeleton[home] if cell in local]
+        heapq.heapify(heap)
+        goal = self._goals[target] = _Goal(target, heap)
+        if len(self._goals) > self.max_goals:
+            self._goals.popitem(last=False)
+        return goal
+
+    def _settle(self, goal, cells):
+        """Continue the goal's Dijkstra until the skeleton cells given are settled or out of reach."""
+        distances, heap, links = goal.entrances, goal.heap, self.links
+        wanted = {cell for cell in cells if cell not in distances}
+        while wanted and heap:
+            distance, cell = heapq.heappop(heap)
+            if cell in distances:
+                continue
+            distances[cell] = distance
+            wanted.discard(cell)
+            for neighbour, length in links[cell]:
+                if neighbour not in distances:
+                    heapq.heappush(heap, (distance + length, neighbour))
+
+    def _fill(self, cluster, seeds):
+        """BFS inside a cluster from seed cells, each starting at its own distance: {cell: distance}."""
+        doors, cluster_of, steps = self.doors, self.cluster_of, self.steps
+        seeds = sorted(seeds)
+        distances = {}
+        frontier = []
+        distance = seeds[0][0] if seeds else 0
+        i = 0
+        while frontier or i < len(seeds):
+            if not frontier:
+                distance = max(distance, seeds[i][0])
+            while i < len(seeds) and seeds[i][0] <= distance:
+                cell = seeds[i][1]
+                if cell not in distances:
+                    distances[cell] = distance
+                    frontier.append(cell)
+                i += 1
+            following = []
+            for cell in frontier:
+                bits = doors[cell]
+                for _, bit, stride in steps:
+                    if bits & bit:
+                        neighbour = cell + stride
+                        if neighbour not in distances and cluster_of(neighbour) == cluster:
+                            distances[neighbour] = distance + 1
+                            following.append(neighbour)
+            frontier = following
+            distance += 1
+        return distances
+
+    def _cluster_distances(self, goal, cluster):
+        distances = goal.clusters.get(cluster)
+        if distances is not None:
+            goal.clusters.move_to_end(cluster)
+            return distances
+        self._settle(goal, self.entrances[cluster])
+        seeds = [(goal.entrances[entrance], entrance) for entrance in self.entrances[cluster]
+                 if entrance in goal.entrances]
+        if self.cluster_of(goal.target) == cluster:
+            seeds.append((0, goal.target))
+        distances = goal.clusters[cluster] = self._fill(cluster, seeds)
+        if len(goal.clusters) > self.max_clusters:
+            goal.clusters.popitem(last=False)
+        return distances
+
+    def _distance(self, goal, cell):
+        return self._cluster_distances(goal, self.cluster_of(cell)).get(cell)
+
+    # -----------------------------------------------------------------------
+    #  Queries, by room id
+    # -----------------------------------------------------------------------
+    def distance(self, start_id, target_id):
+        """Passages on a shortest path from start to target, or None if there is no path."""
+        return self._distance(self._goal(self.cell(target_id)), self.cell(start_id))
+
+    def next_step(self, start_id, target_id):
+        """(direction, room id) of the first move on a shortest path, or None if at the target or cut off."""
+        goal = self._goal(self.cell(target_id))
+        cell = self.cell(start_id)
+        step = self._next_cell(goal, cell)
+        return None if step is None else (step[0], self.room_id(step[1]))
+
+    def _next_cell(self, goal, cell):
+        distance = self._distance(goal, cell)
+        if not distance: # At the target, or unreachable
+            return None
+        here = self.cluster_of(cell)
+        bits = self.doors[cell]
+        for direction, bit, stride in self.steps:
+            if bits & bit:
+                neighbour = cell + stride
+                if self.cluster_of(neighbour) == here:
+                    through = self._cluster_distances(goal, here).get(neighbour)
+                else: # Across a cluster border it is an entrance
+                    self._settle(goal, (neighbour,))
+                    through = goal.entrances.get(neighbour)
+                if through == distance - 1:
+                    return direction, neighbour
+        raise RuntimeError(f"no step closer to the goal from {self.room_id(cell)}; passages changed without update()?")
+
+    def route(self, start_id, target_id):
+        """Room ids to step through from start to target (excluding start), or None if there is no path."""
+        goal = self._goal(self.cell(target_id))
+        cell = self.cell(start_id)
+        if self._distance(goal, cell) is None:
+            return None
+        path = []
+        while cell != goal.target:
+            cell = self._next_cell(goal, cell)[1]
+            path.append(self.room_id(cell))
+        return path
+
+    def stats(self):
+        entrances = sum(len(cells) for cells in self.entrances)
+        return {"rooms": len(self.doors), "clusters": len(self.entrances), "entrances": entrances,
+                "skeleton": len(self.links), "links": sum(len(links) for links in self.links.values()),
+                "entrance_ratio": entrances / len(self.doors) if self.doors else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shortest paths on a mansion_map.json through the hierarchical index.")
+    parser.add_argument("map", nargs="?", default="mansion_map.json")
+    parser.add_argument("--from", dest="start", help="Room id to start from (default: the Foyer)")
+    parser.add_argument("--to", dest="target", help="Room id to reach (default: the Portal)")
+    parser.add_argument("--cluster-size", type=int, default=8, help="Rooms per cluster side")
+    parser.add_argument("--cluster-floors", type=int, default=None, help="Floors per cluster (default: all)")
+    args = parser.parse_args()
+
+    with open(args.map) as f:
+        data = json.load(f)
+    dimensions = data["dimensions"]
+    start = time.perf_counter()
+    index = PathIndex.from_room_dicts(data["rooms"], dimensions["xmax"], dimensions["ymax"], dimensions["zmax"],
+                                      cluster_size=args.cluster_size, cluster_floors=args.cluster_floors)
+    built = time.perf_counter() - start
+    stats = index.stats()
+    print(f"Index of {stats['rooms']} rooms in {built:.2f}s: {stats['clusters']} clusters, "
+          f"{stats['entrances']} entrances ({stats['entrance_ratio']:.0%}), "
+          f"skeleton of {stats['skeleton']} rooms and {stats['links']} links")
+
+    start_id = args.start or next(room["id"] for room in data["rooms"] if room.get("is_foyer"))
+    target_id = args.target or next((room["id"] for room in data["rooms"] if room.get("is_portal")), None)
+    if target_id is None:
+        parser.error("the map has no Portal; give --to")
+    for attempt in ("first", "again"):
+        start = time.perf_counter()
+        step = index.next_step(start_id, target_id)
+        distance = index.distance(start_id, target_id)
+        elapsed = time.perf_counter() - start
+        print(f"{start_id} -> {target_id}: {distance} steps, next "
+              f"{WORDS[step[0]] + ' to ' + step[1] if step else '-'} ({attempt}: {elapsed * 1000:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware task executor used by the content pipeline in scaffold.py.
+
+Tasks form a DAG: each task names the tasks it depends on and receives their
+results as arguments. Independent tasks run concurrently on a thread pool
+(the model calls are I/O bound), failed tasks are retried per task, and every
+task records its start/finish time so the critical path can be reported once
+the run is over. A task can also publish part of its result early (see
+add_early), so the tasks that need only that part start before it finishes.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import instrument
+
+
+class PipelineError(Exception):
+    """Raised when a task fails after exhausting its retries."""
+
+    def __init__(self, task_name, error):
+        super().__init__(f"Task '{task_name}' failed: {error}")
+        self.task_name = task_name
+        self.error = error
+
+
+class Task:
+    def __init__(self, name, fn, deps=(), stage=None, retries=0, retry_delay=1.0, early=False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.stage = stage or name
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.early = early # Result published by its producer (deps[0]) while it runs
+        # Filled in while running
+        self.attempts = 0
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class Pipeline:
+    """
+    Collects tasks and runs them respecting dependencies.
+
+    fn is called as fn(*dep_results) in the order deps were given, so a task
+    reads like a plain function of its inputs.
+    """
+
+    def __init__(self, max_workers=4, retries=0, retry_delay=1.0, log=print):
+        self.max_workers = max(1, max_workers)
+        self.default_retries = retries
+        self.retry_delay = retry_delay
+        self.log = log
+        self.tasks = {}
+        self.results = {}
+        self.run_start = None
+        self.run_end = None
+        self._lock = threading.Lock()
+        self._early = {} # Early task name -> Future resolved by publish() or its producer finishing
+
+    def add(self, name, fn, deps=(), stage=None, retries=None):
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task name: {name}")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        task = Task(
+            name, fn, deps, stage=stage,
+            retries=self.default_retries if retries is None else retries,
+            retry_delay=self.retry_delay,
+        )
+        self.tasks[name] = task
+        return task
+
+    def add_early(self, name, producer, fn, stage=None):
+        """
+        A result the running producer can hand over with publish(name,
+        value), so the tasks depending on it start before the producer
+        finishes. If the producer finishes without publishing (its answer
+        came from a cache, say), the result is fn(producer result), computed
+        on the scheduler thread, so fn should be cheap. A producer retried
+        after publishing may finish with a different value: the result is then
+        replaced and every task that used the published one, directly or not,
+        is cancelled (or its result dropped if it is already running) and run
+        again on the new value.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task name: {name}")
+        if producer not in self.tasks:
+            raise ValueError(f"Task '{name}' depends on unknown task '{producer}'")
+        task = Task(name, fn, [producer], stage=stage, early=True)
+        self.tasks[name] = task
+        return task
+
+    def publish(self, name, value):
+        """Complete the early task name with value; returns False if it already has a result."""
+        with self._lock:
+            future = self._early.get(name)
+            if future is None or future.done():
+                return False
+            task = self.tasks[name]
+            task.attempts = 1
+            task.start = task.end = time.monotonic()
+            future.set_result(value)
+            return True
+
+    def _complete_early(self, name, producer_result):
+        """
+        Fallback for an early task whose producer finished without publishing
+        it, and the check that a published value is the one the producer
+        finished with. Returns the superseded Future when it is not: the
+        early task then has a new one holding the value the producer
+        finished with.
+        """
+        with self._lock:
+            future = self._early[name]
+            task = self.tasks[name]
+            start = time.monotonic()
+            try:
+                value = task.fn(producer_result)
+            except Exception as e:
+                raise PipelineError(name, e) from e
+            stale = None
+            if future.done():
+                if value == future.result():
+                    return None
+                stale, self._early[name] = future, Future()
+            task.attempts = 1
+            task.start, task.end = start, time.monotonic()
+            self._early[name].set_result(value)
+            return stale
+
+    def _run_task(self, task):
+        args = [self.results[dep] for dep in task.deps]
+        task.start = time.monotonic()
+        while True:
+            task.attempts += 1
+            try:
+                with instrument.span(task.stage, task=task.name, attempt=task.attempts):
+                    result = task.fn(*args)
+                task.end = time.monotonic()
+                return result
+            except Exception as e:
+                if task.attempts > task.retries:
+                    task.end = time.monotonic()
+                    raise PipelineError(task.name, e) from e
+                delay = task.retry_delay * (2 ** (task.attempts - 1))
+                self.log(f"Task '{task.name}' failed ({e}); retry {task.attempts}/{task.retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self):
+        """Run all tasks and return a dict of task name -> result."""
+        waiting = {name: set(task.deps) for name, task in self.tasks.items() if not task.early}
+        dependents = {name: [] for name in self.tasks}
+        early_of = {name: [] for name in self.tasks}
+        for name, task in self.tasks.items():
+            for dep in task.deps:
+                (early_of if task.early else dependents)[dep].append(name)
+        self._early = {name: Future() for name, task in self.tasks.items() if task.early}
+
+        self.run_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Early tasks wait here from the start; publish() may resolve them at any time
+            running = {future: name for name, future in self._early.items()}
+
+            def submit_ready():
+                ready = [name for name, deps in waiting.items() if not deps]
+                for name in ready:
+                    del waiting[name]
+                    running[executor.submit(self._run_task, self.tasks[name])] = name
+
+            def restart(early, stale_future):
+                """Rerun everything downstream of an early task whose published value was replaced."""
+                stale, stack = set(), list(dependents[early])
+                while stack:
+                    name = stack.pop()
+                    if name not in stale:
+                        stale.add(name)
+                        stack.extend(dependents[name] + early_of[name])
+                self.log(f"Task '{early}' changed after it was published; rerunning {', '.join(sorted(stale))}")
+                for future, name in list(running.items()):
+                    if name in stale or future is stale_future:
+                        future.cancel() # A task already running finishes, but its result is dropped
+                        del running[future]
+                self.results.pop(early, None)
+                running[self._early[early]] = early
+                for name in stale:
+                    self.results.pop(name, None)
+                    task = self.tasks[name]
+                    task.attempts, task.start, task.end = 0, None, None
+                    if task.early:
+                        self._early[name] = Future()
+                        running[self._early[name]] = name
+                    else:
+                        waiting[name] = {dep for dep in task.deps if dep not in self.results}
+
+            submit_ready()
+            try:
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future not in running:
+                            continue # Dropped by restart() while this batch was handled
+                        name = running.pop(future)
+                        self.results[name] = future.result()
+                        for child in dependents[name]:
+                            waiting[child].discard(name)
+                        for early in early_of[name]:
+                            stale_future = self._complete_early(early, self.results[name])
+                            if stale_future is not None:
+                                restart(early, stale_future)
+                    submit_ready()
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+        self.run_end = time.monotonic()
+
+        if waiting:
+            raise PipelineError(", ".join(sorted(waiting)), "dependency cycle")
+        return self.results
+
+    # -------------------------------------------------------------------
+    #  Timing report
+    # -------------------------------------------------------------------
+    def critical_path(self):
+        """
+        Return the chain of tasks that determined total wall time: starting
+        from the task that finished last, repeatedly step to the dependency
+        that finished last.
+        """
+        finished = [t for t in self.tasks.values() if t.end is not None]
+        if not finished:
+            return []
+        task = max(finished, key=lambda t: t.end)
+        path = [task]
+        while task.deps:
+            task = max((self.tasks[d] for d in task.deps), key=lambda t: t.end or 0)
+            path.append(task)
+        return list(reversed(path))
+
+    def report(self):
+        """Return a printable summary of per-stage and critical-path timings."""
+        lines = []
+        wall = (self.run_end or time.monotonic()) - (self.run_start or time.monotonic())
+        busy = sum(t.duration for t in self.tasks.values())
+        lines.append(f"Pipeline: {len(self.tasks)} tasks, {self.max_workers} workers, "
+                     f"wall {wall:.2f}s, task time {busy:.2f}s "
+                     f"(speedup x{busy / wall if wall > 0 else 0:.1f})")
+
+        stages = {}
+        for task in self.tasks.values():
+            count, total = stages.get(task.stage, (0, 0.0))
+            stages[task.stage] = (count + 1, total + task.duration)
+        lines.append("Per stage:")
+        for stage, (count, total) in sorted(stages.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"  {stage:<24} {count:>4} tasks  {total:8.2f}s total  {total / count:6.2f}s avg")
+
+        path = self.critical_path()
+        if path:
+            lines.append(f"Critical path ({sum(t.duration for t in path):.2f}s):")
+            for task in path:
+                retries = f" ({task.attempts - 1} retries)" if task.attempts > 1 else ""
+                lines.append(f"  {task.duration:8.2f}s  {task.name}{retries}")
+        return "\n".join(lines)
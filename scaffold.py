@@ -1,26 +1,36 @@
 #!/usr/bin/env python3
 
-from openai import OpenAI
 import os
 import json
 import re # Add import for sanitizing filenames
 import sys
+import argparse
+import atexit
+import threading
+import time
 
-# Check if API key is set in environment 
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    print("Error: OPENAI_API_KEY environment variable not set.")
-    print("Please set your OpenAI API key with:")
-    print("    export OPENAI_API_KEY='your-api-key'")
-    sys.exit(1)
+import instrument
+import metrics
 
-client = OpenAI(api_key=api_key)
+from build_manifest import BuildManifest, DEFAULT_MANIFEST_PATH, fingerprint
+from chat_cache import ChatCache, make_key
+from json_stream import IncrementalJSONParser, JSONStreamError, extract_json
+from llm_client import get_client, require_api_key
+from pipeline import Pipeline, PipelineError
 
 CREATIVE_MODEL = "gpt-4.5-preview"
 LOGICAL_MODEL = "o1"
 #CREATIVE_MODEL = "gpt-4o"
 #LOGICAL_MODEL = "gpt-4o"
 
+CHAT_CACHE_PATH = os.path.join("artifacts", "chat_cache.sqlite3")
+BUILD_MANIFEST_PATH = DEFAULT_MANIFEST_PATH
+
+# Offline replay: answer only from the response cache (and .chat logs), never the API
+OFFLINE = False
+OFFLINE_WORKERS = 16 # Cache lookups are cheap, so offline replays run more of them at once
+STREAM = False # Stream replies, parsing them as they arrive so finished fields can be used early
+
 # -------------------------------------------------------------------
 #  PROMPT TEMPLATES
 # -------------------------------------------------------------------
@@ -155,151 +165,202 @@ def get_room_verification_user_prompt(room_name, room_details):
 # -------------------------------------------------------------------
 #  Helper function to send messages to the OpenAI ChatCompletion API.
 # -------------------------------------------------------------------
+class CompletionError(Exception):
+    """A model call failed or returned something that isn't JSON."""
+
+class CacheMiss(CompletionError):
+    """Offline mode only: the response for this step is not cached."""
+
+    def __init__(self, step_name, stage, log_file_path, reason=None):
+        super().__init__(f"No cached response for {step_name}")
+        self.step_name = step_name
+        self.stage = stage
+        self.log_file_path = log_file_path
+        self.reason = reason # From the build manifest: why the step's inputs differ from its last build
+
+# Result of an offline task that could not be replayed (its own response or an input was missing)
+MISSING = object()
+
 def sanitize_filename(name):
     """Removes potentially problematic characters for filenames."""
     name = re.sub(r'[^\w\s-]', '', name).strip() # Remove non-alphanumeric (allow whitespace and hyphens)
     name = re.sub(r'[-\s]+', '_', name) # Replace spaces/hyphens with underscores
     return name
 
-def load_chat_from_file(log_file_path):
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Open the shared response cache on first use; OFFLINE, an in-memory copy of it."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ChatCache(CHAT_CACHE_PATH, read_only=OFFLINE)
+        return _response_cache
+
+_build_manifest = None
+
+def get_build_manifest():
     """
-    Load a cached chat response from a file.
-    Returns the extracted JSON response if the file exists, None otherwise.
+    Load the build manifest on first use; it is saved when the process exits,
+    except OFFLINE (--offline and --dry-run change nothing on disk).
     """
-    if not os.path.exists(log_file_path):
-        return None
-    
-    try:
-        with open(log_file_path, "r") as f:
-            content = f.read()
-        
-        # Extract the response content between the assistant message and usage sections
-        response_section = re.search(r"## Assistant Message ##\n([\s\S]*?)\n\n---------- USAGE ----------", content)
-        if response_section:
-            response_content = response_section.group(1).strip()
-            # Verify it's valid JSON
-            try:
-                json.loads(response_content)
-                print(f"Using cached response from {log_file_path}")
-                return response_content
-            except json.JSONDecodeError:
-                print(f"Warning: Cached response in {log_file_path} is not valid JSON.")
-                return None
-        return None
-    except Exception as e:
-        print(f"Error reading cached chat file {log_file_path}: {e}")
-        return None
-
-def create_chat_completion(messages, model=CREATIVE_MODEL, temperature=0.7, log_file_base=None, step_name=""):
+    global _build_manifest
+    with _response_cache_lock:
+        if _build_manifest is None:
+            _build_manifest = BuildManifest(BUILD_MANIFEST_PATH)
+            if not OFFLINE:
+                atexit.register(_build_manifest.save)
+        return _build_manifest
+
+def create_chat_completion(messages, model=CREATIVE_MODEL, temperature=0.7, log_file_base=None, step_name="", stage=None,
+                           on_field=None):
     """
     messages: a list of dicts, e.g. [{"role": "system", "content": "..."}]
     model: the model name ("gpt-4o")
     temperature: you may adjust for more/less creativity
-    log_file_base: Base path for the log file (e.g., "artifacts/room_def/Study"). Extension ".chat" will be added.
+    log_file_base: Base path for the human-readable log (e.g., "artifacts/room_def/Study"). Extension ".chat" will be added.
+                   Responses are cached by content in CHAT_CACHE_PATH, not by this name.
     step_name: A descriptive name for the step being logged.
+    stage: Pipeline stage the call is accounted to in metrics (e.g. "define_room").
+    on_field: With STREAM, called as on_field(name, value) for each top-level field of the
+              reply as soon as it is complete. Not called for cached responses.
     Returns the message content string from the assistant.
     """
-    log_file_path = None
-    if log_file_base:
-        log_file_path = f"{log_file_base}.chat"
+    stage = stage or step_name.split(" (")[0]
+    lookup_start = time.monotonic()
+    cache = get_response_cache()
+    cache_key = make_key(model, temperature, messages)
+    manifest = get_build_manifest()
+    inputs = fingerprint(model, temperature, messages)
+    log_file_path = f"{log_file_base}.chat" if log_file_base else None
+
+    # The cache is keyed by model, temperature and the exact messages, so an
+    # edited prompt is a miss. A .chat log from before the cache existed is
+    # imported once if it was produced by this very request (OFFLINE, only
+    # into the in-memory copy).
+    with instrument.span("cache_lookup", stage=stage):
+        cached = cache.get(cache_key)
+        if cached is None and log_file_path and os.path.exists(log_file_path):
+            if cache.import_chat_log(log_file_path) == cache_key:
+                cached = cache.get(cache_key)
+    if cached:
+        print(f"Using cached response for {step_name}")
+        metrics.record(stage, model=model, latency=time.monotonic() - lookup_start, cache_hit=True,
+                       prompt_tokens=cached["prompt_tokens"], completion_tokens=cached["completion_tokens"])
+        if log_file_base and not OFFLINE:
+            manifest.record(log_file_base, inputs, cached["response"])
+        return cached["response"]
+
+    if OFFLINE:
+        reason = manifest.why_stale(log_file_base, inputs) if log_file_base else None
+        raise CacheMiss(step_name, stage, log_file_path, reason or "not in the response cache")
+
+    if log_file_path:
+        print(f"Querying {step_name} for {log_file_path}...")
         log_dir = os.path.dirname(log_file_path)
         if log_dir: # Avoid error if log_file_base has no directory part
              os.makedirs(log_dir, exist_ok=True)
-        
-        # Check if there's a cached response
-        cached_response = load_chat_from_file(log_file_path)
-        if cached_response:
-            return cached_response
-        
-        print(f"Querying {step_name} for {log_file_path}...")
+    else:
+        print(f"Querying {step_name}...")
 
+    # Shared async client: connection reuse, rate limiting and backoff for all
+    # stages. Only a cache miss needs it, so the key is checked here.
+    client = get_client(api_key=require_api_key())
+    parser = None
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            response_format={"type": "json_object"}
-        )
-        response_content = response.choices[0].message.content
-        usage = response.usage
-
-        if log_file_path:
-            try:
-                with open(log_file_path, "w") as f:
-                    f.write(f"# Step: {step_name}\n")
-                    f.write(f"# Model: {model}\n")
-                    f.write(f"# Temperature: {temperature}\n\n")
-
-                    system_message = next((m['content'] for m in messages if m['role'] == 'system'), "N/A")
-                    user_message = next((m['content'] for m in messages if m['role'] == 'user'), "N/A")
-
-                    f.write("## System Message ##\n")
-                    f.write(f"{system_message}\n\n")
-
-                    f.write("## User Message ##\n")
-                    f.write(f"{user_message}\n\n")
-
-                    f.write("---------- RESPONSE ----------\n\n")
-                    f.write("## Assistant Message ##\n")
-                    f.write(f"{response_content}\n\n")
-
-                    f.write("---------- USAGE ----------\n")
-                    f.write(f"Prompt Tokens: {usage.prompt_tokens}\n")
-                    f.write(f"Completion Tokens: {usage.completion_tokens}\n")
-                    f.write(f"Total Tokens: {usage.total_tokens}\n")
-
-                print(f"Received response for {step_name}, saved to {log_file_path}. Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}")
-            except IOError as e:
-                print(f"Error writing log file {log_file_path}: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred during logging for {step_name}: {e}")
-
-        # Verify that the response is valid JSON before returning
+        with instrument.span("model_call", stage=stage, model=model):
+            if STREAM:
+                parser = IncrementalJSONParser(on_field)
+                response = client.chat_stream_sync(
+                    on_delta=lambda text: feed_stream(parser, text, step_name),
+                    stage=stage,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format={"type": "json_object"}
+                )
+            else:
+                response = client.chat_sync(
+                    stage=stage,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format={"type": "json_object"}
+                )
+    except Exception as e:
+        # Raised rather than exiting so the pipeline can retry the stage
+        raise CompletionError(f"Error calling OpenAI API for {step_name}: {str(e)}") from e
+    response_content = response.choices[0].message.content
+    usage = response.usage
+
+    if log_file_path:
         try:
+            with open(log_file_path, "w") as f:
+                f.write(f"# Step: {step_name}\n")
+                f.write(f"# Model: {model}\n")
+                f.write(f"# Temperature: {temperature}\n\n")
+
+                system_message = next((m['content'] for m in messages if m['role'] == 'system'), "N/A")
+                user_message = next((m['content'] for m in messages if m['role'] == 'user'), "N/A")
+
+                f.write("## System Message ##\n")
+                f.write(f"{system_message}\n\n")
+
+                f.write("## User Message ##\n")
+                f.write(f"{user_message}\n\n")
+
+                f.write("---------- RESPONSE ----------\n\n")
+                f.write("## Assistant Message ##\n")
+                f.write(f"{response_content}\n\n")
+
+                f.write("---------- USAGE ----------\n")
+                f.write(f"Prompt Tokens: {usage.prompt_tokens}\n")
+                f.write(f"Completion Tokens: {usage.completion_tokens}\n")
+                f.write(f"Total Tokens: {usage.total_tokens}\n")
+
+            print(f"Received response for {step_name}, saved to {log_file_path}. Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}")
+        except IOError as e:
+            print(f"Error writing log file {log_file_path}: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred during logging for {step_name}: {e}")
+
+    # Verify that the response is valid JSON before returning
+    try:
+        if parser is not None and parser.done:
+            response_content = parser.text # Already checked while streaming
+        else:
             json.loads(response_content)
-        except json.JSONDecodeError:
-            print(f"Warning: Response for {step_name} is not valid JSON. Attempting to fix...")
-            # Attempt to extract JSON from the response if it's wrapped in markdown or has extra text
-            potential_json = extract_json_from_response(response_content)
-            if potential_json:
-                return potential_json
-            print(f"Error: Could not extract valid JSON from response for {step_name}")
-            print(f"Raw response: {response_content[:100]}...")
-            sys.exit(1)
-            
-        return response_content
-    
-    except Exception as e:
-        print(f"Error calling OpenAI API for {step_name}: {str(e)}")
-        print("Make sure your API key is valid and the model name is correct.")
-        sys.exit(1)
+    except json.JSONDecodeError:
+        print(f"Warning: Response for {step_name} is not valid JSON. Attempting to fix...")
+        # Attempt to extract JSON from the response if it's wrapped in markdown or has extra text
+        potential_json = extract_json_from_response(response_content)
+        if not potential_json:
+            raise CompletionError(f"Could not extract valid JSON from response for {step_name}. "
+                                  f"Raw response: {response_content[:100]}...")
+        response_content = potential_json
+
+    cache.put(cache_key, model, temperature, response_content, usage.prompt_tokens, usage.completion_tokens)
+    if log_file_base:
+        manifest.record(log_file_base, inputs, response_content)
+    return response_content
+
+
+def feed_stream(parser, text, step_name):
+    """Pass a streamed piece to the parser; a malformed reply is left to the fallback extractor."""
+    if parser.error is not None:
+        return
+    try:
+        parser.feed(text)
+    except JSONStreamError as e:
+        print(f"Warning: streamed response for {step_name} is not plain JSON ({e}); will extract it when complete")
 
 def extract_json_from_response(text):
     """
     Attempts to extract JSON from a text response that might contain additional text
-    or markdown formatting.
+    or markdown formatting. See json_stream.extract_json.
     """
-    # Try to find content between JSON code blocks
-    json_block_pattern = r"```(?:json)?\s*([\s\S]*?)\s*```"
-    match = re.search(json_block_pattern, text)
-    if match:
-        potential_json = match.group(1)
-        try:
-            return json.dumps(json.loads(potential_json))
-        except json.JSONDecodeError:
-            pass
-    
-    # Look for text that starts with { and ends with }
-    json_pattern = r"(\{[\s\S]*\})"
-    match = re.search(json_pattern, text)
-    if match:
-        potential_json = match.group(1)
-        try:
-            return json.dumps(json.loads(potential_json))
-        except json.JSONDecodeError:
-            pass
-    
-    return None
+    return extract_json(text)
 
 # -------------------------------------------------------------------
 # 1. Game Structure Planner LLM
@@ -319,18 +380,20 @@ def game_structure_planner(user_prompt):
         messages,
         model=CREATIVE_MODEL,
         log_file_base=log_base,
-        step_name="Game Structure Planning"
+        step_name="Game Structure Planning",
+        stage="plan_structure"
     )
     return json.loads(response)
 
 # -------------------------------------------------------------------
-# 2. Room Definition LLM (run in parallel for each room)
+# 2. Room Definition LLM (run in parallel for each room, see add_room_tasks)
 #    Model: gpt-4o (creative detailing)
 # -------------------------------------------------------------------
-def define_room(room_name, theme_description, exits):
+def define_room(room_name, theme_description, exits, on_field=None):
     """
     Expands on a single room by listing interactable objects, 
     entry/exit points, secrets, etc., returning JSON.
+    on_field: see create_chat_completion.
     """
     messages = [
         {"role": "system", "content": ROOM_DEFINITION_SYSTEM},
@@ -342,7 +405,9 @@ def define_room(room_name, theme_description, exits):
         messages,
         model=CREATIVE_MODEL,
         log_file_base=log_base,
-        step_name=f"Room Definition ({room_name})"
+        step_name=f"Room Definition ({room_name})",
+        stage="define_room",
+        on_field=on_field
     )
     return json.loads(response)
 
@@ -366,7 +431,8 @@ def generate_puzzle(object_name, room_name):
         messages,
         model=CREATIVE_MODEL,
         log_file_base=log_base,
-        step_name=f"Puzzle Generation ({room_name} - {object_name})"
+        step_name=f"Puzzle Generation ({room_name} - {object_name})",
+        stage="generate_puzzle"
     )
     return json.loads(response)
 
@@ -390,7 +456,8 @@ def generate_clues(object_name, room_name, puzzle_details):
         messages,
         model=CREATIVE_MODEL,
         log_file_base=log_base,
-        step_name=f"Clue Generation ({room_name} - {object_name})"
+        step_name=f"Clue Generation ({room_name} - {object_name})",
+        stage="generate_clues"
     )
     return json.loads(response)
 
@@ -414,7 +481,8 @@ def describe_room(room_name, room_data):
         messages,
         model=CREATIVE_MODEL,
         log_file_base=log_base,
-        step_name=f"Room Description ({room_name})"
+        step_name=f"Room Description ({room_name})",
+        stage="describe_room"
     )
     return json.loads(response)
 
@@ -439,16 +507,120 @@ def verify_room(room_name, room_details):
         model=LOGICAL_MODEL,
         temperature=0.0,
         log_file_base=log_base,
-        step_name=f"Room Verification ({room_name})"
+        step_name=f"Room Verification ({room_name})",
+        stage="verify_room"
     )
     return json.loads(response)
 
 # -------------------------------------------------------------------
 # Example Orchestrator (High-Level Usage)
 # -------------------------------------------------------------------
-def main_example():
-    # Ensure the top-level artifacts directory exists
-    os.makedirs("artifacts", exist_ok=True)
+def add_room_tasks(pipeline, room):
+    """
+    Adds the per-room stage chain to the pipeline:
+    define -> puzzle -> clues -> describe -> verify.
+    Task results are the stage outputs; the verify task yields the final room.
+    The puzzle needs only the room's objects, which a streamed room
+    definition publishes as soon as that field is complete.
+    """
+    room_name = room["name"]
+    theme = room["theme"]
+    exits = room["exits"]
+    prefix = f"{room_name}/"
+
+    def first_object(objects):
+        # Suppose we pick one object to design a puzzle for demonstration
+        if not objects:
+            return None
+        # The model lists objects either by name or as {"name": ..., "description": ...}
+        return objects[0].get("name") if isinstance(objects[0], dict) else objects[0]
+
+    def define():
+        def publish_objects(field, value):
+            if field == "interactable_objects":
+                pipeline.publish(prefix + "objects", value)
+        return define_room(room_name, theme, exits, on_field=publish_objects)
+
+    def puzzle(objects):
+        obj = first_object(objects)
+        return generate_puzzle(obj, room_name) if obj else None
+
+    def clues(objects, puzzle_info):
+        obj = first_object(objects)
+        return generate_clues(obj, room_name, puzzle_info) if obj else None
+
+    def describe(room_def, puzzle_info, clues_info):
+        room_data = dict(room_def)
+        if puzzle_info is not None:
+            # Attach puzzle + clues to room data
+            room_data["puzzle"] = puzzle_info
+            room_data["clues"] = clues_info
+        desc_json = describe_room(room_name, room_data)
+        room_data["description"] = desc_json.get("description", "")
+        return room_data
+
+    pipeline.add(prefix + "define", define, stage="define_room")
+    pipeline.add_early(prefix + "objects", prefix + "define", lambda room_def: room_def["interactable_objects"],
+                       stage="room_objects")
+    pipeline.add(prefix + "puzzle", puzzle, deps=[prefix + "objects"], stage="generate_puzzle")
+    pipeline.add(prefix + "clues", clues, deps=[prefix + "objects", prefix + "puzzle"], stage="generate_clues")
+    pipeline.add(prefix + "describe", describe,
+                 deps=[prefix + "define", prefix + "puzzle", prefix + "clues"], stage="describe_room")
+    pipeline.add(prefix + "verify", lambda room_data: verify_room(room_name, room_data),
+                 deps=[prefix + "describe"], stage="verify_room")
+
+def replayable(name, fn, misses, blocked):
+    """
+    Wrap a task for offline replay: a cache miss is recorded in misses and
+    yields MISSING, and so does any task with a MISSING input (its name is
+    recorded in blocked), so the whole pipeline is walked instead of
+    stopping at the first miss.
+    """
+    def run(*inputs):
+        if any(value is MISSING for value in inputs):
+            blocked.append(name)
+            return MISSING
+        try:
+            return fn(*inputs)
+        except CacheMiss as e:
+            misses.append(e)
+            return MISSING
+    return run
+
+def report_misses(misses, blocked, total, dry_run=False):
+    """
+    Print what an online run would rebuild: the stale steps, with the reason
+    from the build manifest, and the stages downstream of them, whose
+    prompts cannot be known until their inputs are rebuilt.
+    """
+    replayed = total - len(misses) - len(blocked)
+    if dry_run:
+        print(f"\nDry run: {len(misses)} calls would be requested, {len(blocked)} downstream stages would rerun "
+              f"({replayed} of {total} up to date).")
+    else:
+        print(f"\nOffline replay incomplete: {len(misses)} cache misses, {len(blocked)} more stages waiting on them "
+              f"({replayed} of {total} replayed).")
+    if misses:
+        print("An online run would request:")
+    for miss in sorted(misses, key=lambda m: (m.stage, m.step_name)):
+        where = f"  ({miss.log_file_path})" if miss.log_file_path else ""
+        print(f"  {miss.stage:<16} {miss.step_name}{where}")
+        if miss.reason:
+            print(f"  {'':<16}   {miss.reason}")
+    if blocked:
+        print("and then, if their inputs changed:")
+        for name in sorted(blocked):
+            print(f"  {name}")
+
+def main_example(jobs=4, retries=2, metrics_path=None, offline=False, dry_run=False, stream=False):
+    global OFFLINE, STREAM
+    STREAM = stream
+    offline = offline or dry_run # A dry run is an offline replay that only reports the plan
+    OFFLINE = offline
+    # Ensure the top-level artifacts directory exists (offline runs change nothing on disk)
+    if not offline:
+        os.makedirs("artifacts", exist_ok=True)
+    metrics.configure(metrics_path)
     # 1) Get mansion structure from user prompt
     # (In a real app, user_prompt might come from external input)
     user_prompt = (
@@ -474,39 +646,75 @@ Yet the mansion is no passive vault; its enigmatic machinery, influenced by Luci
 Ultimately, your exploration will determine whether Lucien Ravenshade’s work was madness or genius, and if the secret he left behind holds the potential to illuminate humanity’s future—or doom it.
 """
     )
-    mansion_structure = game_structure_planner(user_prompt)
+    try:
+        with instrument.span("game_structure"):
+            mansion_structure = game_structure_planner(user_prompt)
+    except CacheMiss as e:
+        report_misses([e], [], 1, dry_run) # Every room depends on the structure
+        sys.exit(0 if dry_run else 1)
+    except CompletionError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-    # 2) For each room, define it
-    final_rooms_data = {}
+    # 2) Each room is an independent chain of stages, so the rooms run
+    #    concurrently while stages within a room follow their dependencies.
+    # Offline, failures other than cache misses would just fail again, so there are no retries
+    pipeline = Pipeline(max_workers=max(jobs, OFFLINE_WORKERS) if offline else jobs,
+                        retries=0 if offline else retries)
+    rooms, names = [], set()
     for room in mansion_structure.get("rooms", []):
-        room_name = room["name"]
-        theme = room["theme"]
-        exits = room["exits"]
-        
-        # Get basic breakdown
-        room_def = define_room(room_name, theme, exits)
-
-        # Suppose we pick one object to design a puzzle for demonstration
-        if room_def["interactable_objects"]:
-            first_object = room_def["interactable_objects"][0]
-            puzzle_info = generate_puzzle(first_object, room_name)
-            clues_info = generate_clues(first_object, room_name, puzzle_info)
+        # Tasks, artifacts and the final rooms are all keyed by name, so a repeated name is dropped
+        if room["name"] in names:
+            print(f"Warning: the structure lists room '{room['name']}' more than once; keeping the first")
+            continue
+        names.add(room["name"])
+        rooms.append(room)
+        add_room_tasks(pipeline, room)
+    misses, blocked = [], []
+    if offline:
+        for name, task in pipeline.tasks.items():
+            # Early tasks only pass on part of a result, so they are not stages to rebuild
+            task.fn = replayable(name, task.fn, misses, [] if task.early else blocked)
 
-            # Attach puzzle + clues to room data
-            room_def["puzzle"] = puzzle_info
-            room_def["clues"] = clues_info
+    try:
+        with instrument.span("pipeline", rooms=len(rooms)):
+            results = pipeline.run()
+    except PipelineError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-        # 5) Generate a short, atmospheric description
-        desc_json = describe_room(room_name, room_def)
-        room_def["description"] = desc_json.get("description", "")
+    if dry_run or misses:
+        calls = sum(1 for task in pipeline.tasks.values() if not task.early)
+        report_misses(misses, blocked, calls + 1, dry_run) # + the structure planner
+        sys.exit(0 if dry_run else 1)
 
-        # 6) Verify final room data
-        verification_result = verify_room(room_name, room_def)
-        final_rooms_data[room_name] = verification_result
+    final_rooms_data = {room["name"]: results[f"{room['name']}/verify"] for room in rooms}
 
     # For demonstration, just print the final structure
     # In a real application, you might store or serve this to your engine.
     print(json.dumps(final_rooms_data, indent=2))
+    print(pipeline.report(), file=sys.stderr) # stdout ends with the rooms' JSON
+    print(metrics.get_recorder().summary(), file=sys.stderr)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate mansion content with the LLM pipeline.")
+    parser.add_argument("-j", "--jobs", type=int, default=4,
+                        help="Maximum number of concurrent model calls (default: 4)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries per stage before giving up (default: 2)")
+    parser.add_argument("--metrics", metavar="PATH", default=None,
+                        help="Append per-call metrics (stage, latency, tokens, cache hits) to this JSONL file")
+    parser.add_argument("--offline", action="store_true",
+                        help="Replay from cached responses only; list every cache miss instead of calling the API")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream replies and start each room's puzzle as soon as its objects are listed")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Show which steps would be rebuilt, and why, without calling the API")
+    instrument.add_arguments(parser)
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main_example()
\ No newline at end of file
+    args = parse_args()
+    instrument.start(args)
+    main_example(jobs=args.jobs, retries=args.retries, metrics_path=args.metrics, offline=args.offline,
+                 dry_run=args.dry_run, stream=args.stream)
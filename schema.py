@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Load-time validation of the two data formats the games read:
+
+  - rooms.json (verne/mansion_game.py, verne/build-bundle.py): start_room,
+    end_room and the rooms with their items and exits;
+  - mansion_map.json (mkmap.py -> mansion.py, mapstats.py): dimensions and
+    the grid rooms with their connections.
+
+Each format is one declarative schema (GAME_SCHEMA, MAP_SCHEMA), a small
+dialect of JSON Schema:
+
+    type        "object", "array", "string", "integer", "number", "boolean",
+                "null", or a tuple of them
+    properties  {name: schema}; required: names; additional: False rejects
+                names not listed
+    switch      (field, {value: {"properties": ..., "required": ...}}): more
+                properties for objects whose field has that value
+    items       schema of every element; length / min_items: element count
+    enum        allowed values; minimum: smallest allowed number
+    defines     the value names something in a namespace (room ids, ...);
+                refers: the value must name something defined there
+
+compile_schema() turns a schema into the Python source of a single
+function, with every check inlined and loops for the arrays, and execs it
+once at import time (python schema.py --source prints it). A validation is
+then a single walk over the document that collects every error with its
+JSON path ($.rooms[3].exits[0].to), followed by the cross-reference checks:
+
+  - rooms.json: every exit leads to a room (or end_room); every key can be
+    obtained in a room that is reachable without it, and end_room can be
+    reached from start_room;
+  - mansion_map.json: room ids match their coordinates, passages lead to the
+    neighbouring room in their direction and are symmetric, and there is
+    one Foyer; passages are checked in one pass that also finds the ones
+    to unknown rooms.
+
+The walk only builds a JSON path when it reports an error: ids and
+references are recorded as their value, a constant for where they sit in
+the schema, and the array indices on the way there.
+
+The checks that walk the rooms only run once the structure is sound, so a
+malformed file reports its structural errors rather than crashing them.
+
+    python schema.py verne/rooms.json mansion_map.json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+ROOT = None # The path of the document itself; a child's path is (parent path, key or index)
+
+
+def site_path(where):
+    """The path of a recorded id or reference: (site, *indices), site holding None for each index."""
+    path, indices = ROOT, iter(where[1:])
+    for key in where[0]:
+        path = (path, next(indices) if key is None else key)
+    return path
+
+
+def format_path(path):
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "$" + "".join(reversed(parts))
+
+
+class ValidationError(ValueError):
+    """A document failed validation; errors holds every "path: message" line."""
+
+    def __init__(self, source, errors):
+        self.source = source
+        self.errors = errors
+        shown = "\n".join(f"  {error}" for error in errors[:20])
+        more = f"\n  ... and {len(errors) - 20} more" if len(errors) > 20 else ""
+        super().__init__(f"{source}: {len(errors)} validation error(s)\n{shown}{more}")
+
+
+class Context:
+    """Errors and cross-references collected during one validation."""
+
+    def __init__(self):
+        self.errors = []     # (path, message)
+        self.defined = {}    # namespace -> {value: (site, *indices)}
+        self.references = {} # namespace -> [(value, site, *indices)]
+
+    def namespace(self, name):
+        return self.defined.setdefault(name, {}), self.references.setdefault(name, [])
+
+    def messages(self):
+        return [f"{format_path(path)}: {message}" for path, message in self.errors]
+
+
+# ---------------------------------------------------------------------------
+#  Compiler
+# ---------------------------------------------------------------------------
+_TYPES = {"object": "dict", "array": "list", "string": "str", "integer": "int", "number": "(int, float)",
+          "boolean": "bool", "null": "NoneType"}
+_MISSING = object()
+
+
+class _Compiler:
+    """Emits one function for a whole schema; nested nodes are inlined with depth-numbered variables."""
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.namespaces = set()
+
+    def constant(self, value):
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def type_test(self, types, var):
+        """Expression true when var is NOT of the schema type(s)."""
+        if isinstance(types, str):
+            types = (types,)
+        names = []
+        for t in types:
+            names.extend(_TYPES[t].strip("()").split(", "))
+        if len(names) == 1:
+            return f"type({var}) is not {names[0]}"
+        return f"type({var}) not in ({', '.join(names)})"
+
+    def path(self, path):
+        """The expression for a path given as (key, is_variable) parts, only evaluated for errors."""
+        expression = "ROOT"
+        for part, variable in path:
+            expression = f"({expression}, {part if variable else repr(part)})"
+        return expression
+
+    def where(self, path):
+        """Expressions "site, *indices" locating a value without building its path."""
+        site = self.constant(tuple(None if variable else part for part, variable in path))
+        return ", ".join([site] + [part for part, variable in path if variable])
+
+    def error(self, pad, path, message, dynamic=None):
+        """An errors.append line; dynamic is an expression whose value replaces {} in message."""
+        if dynamic is None:
+            text = repr(message)
+        else:
+            before, _, after = message.partition("{}")
+            text = " + ".join(part for part in (repr(before) if before else "", dynamic,
+                                               repr(after) if after else "") if part)
+        self.lines.append(f"{pad}errors.append(({self.path(path)}, {text}))")
+
+    def emit(self, schema, var, path, depth, pad):
+        """Lines validating the value in var, whose JSON path is a tuple of (key, is_variable) parts."""
+        kind = schema.get("type")
+        rest = schema.keys() & {"enum", "minimum", "defines", "refers", "properties", "required",
+                                "additional", "switch", "items", "length", "min_items"}
+        if kind is not None:
+            expected = kind if isinstance(kind, str) else " or ".join(kind)
+            self.lines.append(f"{pad}if {self.type_test(kind, var)}:")
+            self.error(pad + "    ", path, f"expected {expected}, got {{}}", f"type({var}).__name__")
+            if not rest:
+                return
+            self.lines.append(f"{pad}else:") # The remaining checks assume the right type
+            pad += "    "
+        if "enum" in schema:
+            allowed = self.constant(frozenset(schema["enum"]))
+            listed = ", ".join(sorted(map(str, schema["enum"])))
+            self.lines.append(f"{pad}if {var} not in {allowed}:")
+            self.error(pad + "    ", path, f"{{}} is not one of {listed}", f"repr({var})")
+        if "minimum" in schema:
+            minimum = schema["minimum"]
+            self.lines.append(f"{pad}if {var} < {minimum!r}:")
+            self.error(pad + "    ", path, f"{{}} is less than {minimum!r}", f"repr({var})")
+        if "defines" in schema:
+            namespace = schema["defines"]
+            self.namespaces.add(namespace)
+            self.lines.append(f"{pad}if {var} in defined_{namespace}:")
+            self.error(pad + "    ", path, f"duplicate {namespace} {{}}",
+                       f"repr({var}) + ', first at ' + format_path(site_path(defined_{namespace}[{var}]))")
+            self.lines.append(f"{pad}else:")
+            where = self.where(path)
+            self.lines.append(f"{pad}    defined_{namespace}[{var}] = ({where}{'' if ', ' in where else ','})")
+        if "refers" in schema:
+            namespace = schema["refers"]
+            self.namespaces.add(namespace)
+            if kind is not None and "null" in ((kind,) if isinstance(kind, str) else kind):
+                self.lines.append(f"{pad}if {var} is not None:")
+                pad += "    "
+            self.lines.append(f"{pad}references_{namespace}.append(({var}, {self.where(path)}))")
+        if kind == "object":
+            self.emit_properties(schema.get("properties", {}), schema.get("required", ()), var, path, depth, pad)
+            if schema.get("additional", True) is False:
+                allowed = self.constant(frozenset(schema.get("properties", {})))
+                self.lines.append(f"{pad}if not {var}.keys() <= {allowed}:") # A subset test allocates nothing
+                self.lines.append(f"{pad}    for k in {var}.keys() - {allowed}:")
+                self.error(pad + "        ", path + (("k", True),), "unexpected property")
+            if "switch" in schema:
+                field, cases = schema["switch"]
+                self.lines.append(f"{pad}s{depth} = {var}.get({field!r})")
+                for i, (case, extra) in enumerate(cases.items()):
+                    self.lines.append(f"{pad}{'if' if i == 0 else 'elif'} s{depth} == {case!r}:")
+                    self.emit_properties(extra.get("properties", {}), extra.get("required", ()),
+                                         var, path, depth, pad + "    ")
+        elif kind == "array":
+            if "length" in schema:
+                self.lines.append(f"{pad}if len({var}) != {schema['length']}:")
+                self.error(pad + "    ", path, f"expected {schema['length']} items, got {{}}", f"str(len({var}))")
+                self.lines.append(f"{pad}else:")
+                pad += "    "
+            if "min_items" in schema:
+                self.lines.append(f"{pad}if len({var}) < {schema['min_items']}:")
+                self.error(pad + "    ", path, f"expected at least {schema['min_items']} item(s)")
+            if "items" in schema:
+                index, item = f"i{depth}", f"e{depth}"
+                self.lines.append(f"{pad}for {index}, {item} in enumerate({var}):")
+                self.emit(schema["items"], item, path + ((index, True),), depth + 1, pad + "    ")
+        self.lines.append(f"{pad}pass")
+
+    def emit_properties(self, properties, required, var, path, depth, pad):
+        child = f"c{depth}"
+        for name, subschema in properties.items():
+            self.lines.append(f"{pad}{child} = {var}.get({name!r}, _MISSING)")
+            if name in required:
+                self.lines.append(f"{pad}if {child} is _MISSING:")
+                self.error(pad + "    ", path, f"missing required {name!r}")
+                self.lines.append(f"{pad}else:")
+            else:
+                self.lines.append(f"{pad}if {child} is not _MISSING:")
+            self.emit(subschema, child, path + ((name, False),), depth + 1, pad + "    ")
+        for name in required:
+            if name not in properties:
+                self.lines.append(f"{pad}if {name!r} not in {var}:")
+                self.error(pad + "    ", path, f"missing required {name!r}")
+        self.lines.append(f"{pad}pass")
+
+    def source(self, schema):
+        self.emit(schema, "value", (), 0, "    ")
+        header = ["def validate(value, ctx):", "    errors = ctx.errors"]
+        for namespace in sorted(self.namespaces):
+            header.append(f"    defined_{namespace}, references_{namespace} = ctx.namespace({namespace!r})")
+        # Drop the placeholder 'pass' lines that ended up after real statements
+        lines = []
+        for line in self.lines:
+            if line.strip() == "pass" and lines and not lines[-1].rstrip().endswith(":") \
+                    and len(line) - len(line.lstrip()) <= len(lines[-1]) - len(lines[-1].lstrip()):
+                continue
+            lines.append(line)
+        return "\n".join(header + lines) + "\n"
+
+
+def compile_schema(schema, name="schema"):
+    """A function validate(value, ctx) for schema; see the module docstring."""
+    compiler = _Compiler()
+    source = compiler.source(schema)
+    namespace = {"_MISSING": _MISSING, "NoneType": type(None), "ROOT": ROOT, "format_path": format_path,
+                 "site_path": site_path, **compiler.constants}
+    exec(compile(source, f"<{name}>", "exec"), namespace)
+    validate = namespace["validate"]
+    validate.source = source
+    return validate
+
+
+# ---------------------------------------------------------------------------
+#  rooms.json
+# ---------------------------------------------------------------------------
+ITEM_TYPES = ("hint", "inventory", "riddle")
+
+GAME_SCHEMA = {
+    "type": "object",
+    "required": ["start_room", "rooms"],
+    "properties": {
+        "start_room": {"type": "string", "refers": "room"},
+        "end_room": {"type": "string"},
+        "rooms": {"type": "array", "min_items": 1, "items": {
+            "type": "object",
+            "required": ["id", "entry_text"],
+            "properties": {
+                "id": {"type": "string", "defines": "room"},
+                "entry_text": {"type": "string"},
+                "entry_text_after": {"type": "string"},
+                "transform_text": {"type": "string"},
+                "items": {"type": "array", "items": {
+                    "type": "object",
+                    "required": ["name", "type"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "type": {"type": "string", "enum": ITEM_TYPES},
+                        "gives_item": {"type": "string"},
+                    },
+                    "switch": ("type", {
+                        "hint": {"required": ["text"], "properties": {"text": {"type": "string"}}},
+                        "inventory": {"required": ["description"], "properties": {"description": {"type": "string"}}},
+                        "riddle": {"required": ["prompt", "answer", "success_text"], "properties": {
+                            "prompt": {"type": "string"},
+                            "answer": {"type": "string"},
+                            "success_text": {"type": "string"},
+                        }},
+                    }),
+                }},
+                "exits": {"type": "array", "items": {
+                    "type": "object",
+                    "required": ["name", "to"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "direction": {"type": "string"},
+                        "to": {"type": "string", "refers": "exit"},
+                        "locked": {"type": "boolean"},
+                        "key": {"type": ("string", "null")},
+                    },
+                }},
+            },
+        }},
+    },
+}
+
+_validate_game = compile_schema(GAME_SCHEMA, "GAME_SCHEMA")
+
+
+def item_token(item):
+    """What mansion_game puts in the inventory for an item, or None."""
+    if item["type"] == "riddle":
+        return item.get("gives_item") or f"{item['name']}_solved"
+    if item["type"] == "inventory":
+        return item.get("gives_item")
+    return None
+
+
+def _check_game_progress(data, rooms, ctx):
+    """Keys and end_room against what can actually be reached from start_room."""
+    index = {room["id"]: i for i, room in enumerate(rooms)}
+    end_room = data.get("end_room", "END")
+    given = {item_token(item) for room in rooms for item in room.get("items", ())} - {None}
+    have = set()
+    waiting = {} # key -> rooms behind doors it opens
+    seen = {data["start_room"]}
+    queue = [data["start_room"]]
+    reached_end = False
+    while queue:
+        i = index[queue.pop()]
+        room = rooms[i]
+        unlocked = []
+        for item in room.get("items", ()):
+            token = item_token(item)
+            if token is not None and token not in have:
+                have.add(token)
+                unlocked.extend(waiting.pop(token, ()))
+        for j, door in enumerate(room.get("exits", ())):
+            path = (((((ROOT, "rooms"), i), "exits"), j), "to")
+            key = door.get("key")
+            if door.get("locked", False):
+                if key is None:
+                    ctx.errors.append(((path[0], "locked"), "locked with no key, so it can never open"))
+                    continue
+                if key not in given:
+                    ctx.errors.append(((path[0], "key"), f"no item gives {key!r}"))
+                    continue
+                if key not in have:
+                    waiting.setdefault(key, []).append((door["to"], path))
+                    continue
+            unlocked.append((door["to"], path))
+        for destination, _ in unlocked:
+            if destination == end_room:
+                reached_end = True
+            elif destination in index and destination not in seen:
+                seen.add(destination)
+                queue.append(destination)
+    for key, doors in waiting.items():
+        for _, path in doors:
+            ctx.errors.append(((path[0], "key"), f"{key!r} is only given in rooms behind doors it opens"))
+    if not reached_end:
+        ctx.errors.append(((ROOT, "end_room"), f"{end_room!r} cannot be reached from start_room"))
+
+
+def validate_game(data):
+    """Every problem with a rooms.json document, as "path: message" lines (empty if valid)."""
+    ctx = Context()
+    _validate_game(data, ctx)
+    rooms, _ = ctx.namespace("room")
+    end_room = data.get("end_room", "END") if isinstance(data, dict) else "END"
+    for name, *where in ctx.references.get("exit", ()):
+        if name not in rooms and name != end_room:
+            ctx.errors.append((site_path(where), f"exit to unknown room {name!r}"))
+    for name, *where in ctx.references.get("room", ()):
+        if name not in rooms:
+            ctx.errors.append((site_path(where), f"unknown room {name!r}"))
+    if not ctx.errors:
+        _check_game_progress(data, data["rooms"], ctx)
+    return ctx.messages()
+
+
+# ---------------------------------------------------------------------------
+#  mansion_map.json
+# ---------------------------------------------------------------------------
+DIRECTIONS = {'N': (0, -1, 0), 'S': (0, 1, 0), 'E': (1, 0, 0), 'W': (-1, 0, 0), 'U': (0, 0, 1), 'D': (0, 0, -1)}
+OPPOSITE = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E', 'U': 'D', 'D': 'U'}
+
+MAP_SCHEMA = {
+    "type": "object",
+    "required": ["dimensions", "rooms"],
+    "properties": {
+        "dimensions": {
+            "type": "object",
+            "required": ["xmax", "ymax", "zmax"],
+            "properties": {axis: {"type": "integer", "minimum": 1} for axis in ("xmax", "ymax", "zmax")},
+        },
+        "rooms": {"type": "array", "min_items": 1, "items": {
+            "type": "object",
+            "required": ["id", "coords", "connections"],
+            "properties": {
+                "id": {"type": "string", "defines": "room"},
+                "coords": {"type": "array", "length": 3, "items": {"type": "integer", "minimum": 0}},
+                "connections": {
+                    "type": "object",
+                    "required": list(DIRECTIONS),
+                    "additional": False,
+                    "properties": {d: {"type": ("string", "null")} for d in DIRECTIONS}, # Checked with the geometry
+                },
+                "is_foyer": {"type": "boolean"},
+                "is_portal": {"type": "boolean"},
+                "difficulty": {"type": "integer", "minimum": -1},
+                "symbol": {"type": "string"},
+            },
+        }},
+    },
+}
+
+_validate_map = compile_schema(MAP_SCHEMA, "MAP_SCHEMA")
+
+
+def _check_map_geometry(data, ctx):
+    """
+    Ids against coordinates and the Foyer, then every passage in one pass:
+    it must lead to a known room, the one next door in its direction, which
+    has the passage back.
+    """
+    dimensions = data["dimensions"]
+    bounds = (dimensions["xmax"], dimensions["ymax"], dimensions["zmax"])
+    rooms = data["rooms"]
+    by_id = {}
+    foyers = portals = 0
+    for i, room in enumerate(rooms):
+        x, y, z = coords = room["coords"]
+        if not (x < bounds[0] and y < bounds[1] and z < bounds[2]):
+            ctx.errors.append(((((ROOT, "rooms"), i), "coords"),
+                               f"{coords} is outside the {bounds[0]}x{bounds[1]}x{bounds[2]} grid"))
+        room_id = room["id"]
+        if room_id != f"{x}-{y}-{z}":
+            ctx.errors.append(((((ROOT, "rooms"), i), "id"), f"{room_id!r} does not match coords {coords}"))
+        by_id[room_id] = room
+        foyers += bool(room.get("is_foyer"))
+        portals += bool(room.get("is_portal"))
+    for i, room in enumerate(rooms):
+        x, y, z = room["coords"]
+        room_id = room["id"]
+        for direction, target in room["connections"].items():
+            if target is None:
+                continue
+            other = by_id.get(target)
+            dx, dy, dz = DIRECTIONS[direction]
+            if other is None:
+                message = f"passage to unknown room {target!r}"
+            else:
+                ox, oy, oz = other["coords"]
+                if ox != x + dx or oy != y + dy or oz != z + dz:
+                    message = (f"leads to {target!r}, but the room {direction} of {room_id!r} "
+                               f"is {x + dx}-{y + dy}-{z + dz}")
+                elif other["connections"][OPPOSITE[direction]] != room_id:
+                    message = f"one-way passage: {target!r} has no {OPPOSITE[direction]} passage back"
+                else:
+                    continue
+            ctx.errors.append((((((ROOT, "rooms"), i), "connections"), direction), message))
+    if foyers != 1:
+        ctx.errors.append(((ROOT, "rooms"), f"expected one Foyer (is_foyer), found {foyers}"))
+    if portals > 1:
+        ctx.errors.append(((ROOT, "rooms"), f"expected at most one Portal (is_portal), found {portals}"))
+
+
+def validate_map(data):
+    """Every problem with a mansion_map.json document, as "path: message" lines (empty if valid)."""
+    ctx = Context()
+    _validate_map(data, ctx)
+    if not ctx.errors:
+        _check_map_geometry(data, ctx)
+    return ctx.messages()
+
+
+def check(data, validate, source="document"):
+    """Raise ValidationError with every error validate(data) finds."""
+    errors = validate(data)
+    if errors:
+        raise ValidationError(source, errors)
+    return data
+
+
+def detect(data):
+    """The validator for a parsed document, by its top-level keys."""
+    if isinstance(data, dict) and "dimensions" in data:
+        return validate_map
+    return validate_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate rooms.json and mansion_map.json files.")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--source", action="store_true", help="Print the generated validator source and exit")
+    args = parser.parse_args()
+
+    if args.source:
+        print(_validate_game.source, end="\n\n")
+        print(_validate_map.source)
+        return 0
+    failed = 0
+    for path in args.files:
+        with open(path) as f:
+            data = json.load(f)
+        validate = detect(data)
+        start = time.perf_counter()
+        errors = validate(data)
+        elapsed = time.perf_counter() - start
+        kind = "mansion_map" if validate is validate_map else "rooms"
+        print(f"{path}: {kind} format, {len(errors)} error(s) in {elapsed * 1000:.1f} ms")
+        for error in errors:
+            print(f"  {error}")
+        failed += bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Shifting passages for a live mansion map ("the mansion constantly
+rearranges its pathways").
+
+DynamicMansion wraps the Room grid from mkmap.generate_maze (or
+mkmap.rooms_from_json) and opens or closes passages with Room.connect and
+Room.disconnect. The distance from the Foyer (Room.difficulty) is repaired
+incrementally instead of rerunning calculate_distances_bfs:
+
+  - opening a passage can only shorten paths, so a BFS starts from the far
+    end and stops as soon as distances stop improving;
+  - closing a passage only affects the rooms whose every shortest path ran
+    through it. They are found level by level from the far end, and their
+    distances are rebuilt from the unaffected rooms around them. If one of
+    them can no longer be reached at all, the passage was a bridge: the
+    close is undone and refused, so the mansion always stays connected.
+
+Rooms are also bucketed by difficulty. This keeps the maximum difficulty,
+and so the set of rooms eligible for the Portal, current without a scan.
+When the Portal stops being among the farthest rooms it moves to one that
+is. After each operation, `changed` holds the ids of the rooms whose
+passages, difficulty or Portal flag changed.
+"""
+
+import collections
+import heapq
+import math
+import random
+
+OFFSETS = {'N': (0, -1, 0), 'S': (0, 1, 0), 'E': (1, 0, 0), 'W': (-1, 0, 0), 'U': (0, 0, 1), 'D': (0, 0, -1)}
+HORIZONTAL = ('N', 'S', 'E', 'W')
+
+
+class DynamicMansion:
+    def __init__(self, rooms, rng=None, relocate_portal=True):
+        self.rooms = rooms
+        self.xmax, self.ymax, self.zmax = len(rooms), len(rooms[0]), len(rooms[0][0])
+        self.by_id = {room.id: room for plane in rooms for column in plane for room in column}
+        self.room_list = list(self.by_id.values())
+        self.foyer = next((room for room in self.room_list if room.is_foyer), None)
+        if self.foyer is None:
+            raise ValueError("Map has no Foyer")
+        self.portal = next((room for room in self.room_list if room.is_portal), None)
+        self.rng = rng or random.Random()
+        self.relocate_portal = relocate_portal
+        self.changed = set()
+        self.recompute()
+
+    def neighbours(self, room):
+        for neighbour_id in room.connections.values():
+            if neighbour_id:
+                yield self.by_id[neighbour_id]
+
+    def adjacent(self, room, direction):
+        """The room next to room in direction (passage or not), or None at the edge."""
+        dx, dy, dz = OFFSETS[direction]
+        x, y, z = room.x + dx, room.y + dy, room.z + dz
+        if 0 <= x < self.xmax and 0 <= y < self.ymax and 0 <= z < self.zmax:
+            return self.rooms[x][y][z]
+        return None
+
+    # -------------------------------------------------------------------
+    #  Difficulty bookkeeping
+    # -------------------------------------------------------------------
+    def recompute(self):
+        """Full BFS from the Foyer, as generate_maze does; the baseline the incremental updates replace."""
+        for room in self.room_list:
+            room.difficulty = math.inf
+        self.foyer.difficulty = 0
+        queue = collections.deque([self.foyer])
+        while queue:
+            current = queue.popleft()
+            for neighbour in self.neighbours(current):
+                if neighbour.difficulty == math.inf:
+                    neighbour.difficulty = current.difficulty + 1
+                    queue.append(neighbour)
+        self.by_difficulty = collections.defaultdict(set)
+        for room in self.room_list:
+            self.by_difficulty[room.difficulty].add(room.id)
+        self.max_difficulty = max(d for d in self.by_difficulty if d != math.inf)
+
+    def _set_difficulty(self, room, difficulty):
+        bucket = self.by_difficulty[room.difficulty]
+        bucket.discard(room.id)
+        if not bucket:
+            del self.by_difficulty[room.difficulty]
+        room.difficulty = difficulty
+        self.by_difficulty[difficulty].add(room.id)
+        self.max_difficulty = max(self.max_difficulty, difficulty)
+        self.changed.add(room.id)
+
+    def eligible_portals(self):
+        """Ids of the rooms farthest from the Foyer."""
+        return self.by_difficulty[self.max_difficulty]
+
+    def _after_change(self):
+        while self.max_difficulty > 0 and self.max_difficulty not in self.by_difficulty:
+            self.max_difficulty -= 1
+        if not self.relocate_portal or self.portal is None or self.portal.id in self.eligible_portals():
+            return
+        self.portal.is_portal = False
+        self.changed.add(self.portal.id)
+        self.portal = self.by_id[self.rng.choice(sorted(self.eligible_portals()))]
+        self.portal.is_portal = True
+        self.changed.add(self.portal.id)
+
+    # -------------------------------------------------------------------
+    #  Passages
+    # -------------------------------------------------------------------
+    def open(self, room, direction):
+        """Open a passage from room towards direction; False if there is no room there or it is already open."""
+        self.changed = set()
+        other = self.adjacent(room, direction)
+        if other is None or room.connections[direction] is not None:
+            return False
+        self.changed = {room.id, other.id}
+        room.connect(other, direction)
+        near, far = sorted((room, other), key=lambda r: r.difficulty)
+        if far.difficulty > near.difficulty + 1:
+            self._set_difficulty(far, near.difficulty + 1)
+            queue = collections.deque([far])
+            while queue:
+                current = queue.popleft()
+                for neighbour in self.neighbours(current):
+                    if neighbour.difficulty > current.difficulty + 1:
+                        self._set_difficulty(neighbour, current.difficulty + 1)
+                        queue.append(neighbour)
+        self._after_change()
+        return True
+
+    def close(self, room, direction):
+        """Close the passage from room towards direction; False if there is none or closing it would cut the mansion."""
+        self.changed = set()
+        other_id = room.connections[direction]
+        if other_id is None:
+            return False
+        other = self.by_id[other_id]
+        room.disconnect(other, direction)
+        repaired = self._repair_removal(room, other)
+        if repaired is None:
+            room.connect(other, direction)
+            return False
+        self.changed = {room.id, other.id}
+        for affected, difficulty in repaired.items():
+            if affected.difficulty != difficulty:
+                self._set_difficulty(affected, difficulty)
+        self._after_change()
+        return True
+
+    def _repair_removal(self, a, b):
+        """New difficulties of the rooms that depended on the removed passage a-b, or None if one became unreachable."""
+        if a.difficulty == b.difficulty:
+            return {} # Not on any shortest path
+        child = a if a.difficulty > b.difficulty else b
+
+        # Rooms left without a neighbour one step closer to the Foyer, in BFS level order
+        affected = {}
+        queue = collections.deque([child])
+        while queue:
+            current = queue.popleft()
+            if current.id in affected:
+                continue
+            if any(n.difficulty == current.difficulty - 1 and n.id not in affected
+                   for n in self.neighbours(current)):
+                continue
+            affected[current.id] = current
+            queue.extend(n for n in self.neighbours(current) if n.difficulty == current.difficulty + 1)
+
+        # Rebuild their distances from the unaffected rooms at their border
+        distances = {}
+        heap = []
+        for room in affected.values():
+            best = min((n.difficulty + 1 for n in self.neighbours(room) if n.id not in affected),
+                       default=math.inf)
+            distances[room] = best
+            if best != math.inf:
+                heapq.heappush(heap, (best, room.id))
+        while heap:
+            distance, room_id = heapq.heappop(heap)
+            room = affected[room_id]
+            if distance > distances[room]:
+                continue
+            for neighbour in self.neighbours(room):
+                if neighbour.id in affected and distance + 1 < distances[neighbour]:
+                    distances[neighbour] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbour.id))
+
+        if any(distance == math.inf for distance in distances.values()):
+            return None
+        return distances
+
+    def shift(self, changes=2, directions=HORIZONTAL, max_attempts=100):
+        """
+        Alternately close and open random passages (keeping the number of
+        passages steady). Returns the (room id, direction, "close"/"open")
+        operations performed; `changed` covers all of them.
+        """
+        done = []
+        changed = set()
+        for _ in range(max_attempts * changes):
+            if len(done) == changes:
+                break
+            room = self.rng.choice(self.room_list)
+            direction = self.rng.choice(directions)
+            if len(done) % 2 == 0:
+                action, ok = "close", room.connections[direction] is not None and self.close(room, direction)
+            else:
+                action, ok = "open", self.open(room, direction)
+            if ok:
+                done.append((room.id, direction, action))
+                changed |= self.changed
+        self.changed = changed
+        return done
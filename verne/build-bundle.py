@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Build a static, cache-friendly bundle of the verne web client.
+
+Reads verne/rooms.json, the room images (rooms/<Room>/before.png, after.png)
+and, when img-optimize.py has been run, the WebP/AVIF/JPEG variants listed in
+rooms/manifest.json. Writes to dist/ (by default verne/dist):
+
+    index.html                    entry point, references the hashed script/style
+    bundle.json                   start/end room, per-room data and image URLs,
+                                  and the prefetch graph
+    verne2.<hash>.js / .css       client code
+    rooms/<Room>.<hash>.json      one minified JSON file per room
+    assets/<Room>-<state>[-<width>].<hash>.<ext>
+                                  images
+
+Every file except index.html and bundle.json is named after a hash of its
+content, so it can be served with "Cache-Control: immutable" and cached
+forever; a rebuild only changes the names of files whose content changed.
+
+For each room, bundle.json lists what the client should fetch in the
+background once the player arrives: the data and "before" image of every
+room reachable within --prefetch-depth exits, nearest first, with the
+room's own "after" image (a transformation may be next) after the adjacent
+rooms. verne2.js falls back to rooms.json and the raw PNGs when no
+bundle.json is present.
+
+Usage: python build-bundle.py [--out DIR] [--prefetch-depth 2] [--png-only] [--prune]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from collections import deque
+
+# Shared modules (schema.py, ...) live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
+
+STATES = ("before", "after")
+HASH_LENGTH = 10
+CLIENT_FILES = ("verne2.js", "verne2.css")
+BUNDLE_NAME = "bundle.json"
+
+
+def sanitize_filename(name):
+    """Same rule as img-prompt-writer.py uses for room directories."""
+    name = re.sub(r'[^\w\s-]', '', name).strip()
+    name = re.sub(r'[-\s]+', '_', name)
+    return name
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def minify(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class BundleWriter:
+    """Writes content-hashed files into out_dir and remembers every name it produced."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.written = set() # Paths relative to out_dir
+        self.bytes_written = 0
+        self.bytes_reused = 0
+
+    def _place(self, rel_path, size, write):
+        path = os.path.join(self.out_dir, rel_path)
+        self.written.add(rel_path)
+        # Same name means same content, so an existing file never needs rewriting
+        if os.path.exists(path):
+            self.bytes_reused += size
+            return rel_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        self.bytes_written += size
+        return rel_path
+
+    def add_bytes(self, directory, stem, ext, data):
+        rel_path = os.path.join(directory, f"{stem}.{content_hash(data)}{ext}")
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        return self._place(rel_path, len(data), write)
+
+    def add_file(self, directory, stem, source):
+        """Hard link (or copy) source under a hashed name; images are never read into memory twice."""
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        ext = os.path.splitext(source)[1]
+        rel_path = os.path.join(directory, f"{stem}.{digest.hexdigest()[:HASH_LENGTH]}{ext}")
+
+        def write(tmp_path):
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+        return self._place(rel_path, os.path.getsize(source), write)
+
+    def add_text(self, rel_path, text):
+        """Unhashed entry points (index.html, bundle.json) are always rewritten."""
+        data = text.encode("utf-8")
+        path = os.path.join(self.out_dir, rel_path)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.written.add(rel_path)
+        self.bytes_written += len(data)
+        return rel_path
+
+    def prune(self):
+        """Delete files from earlier builds that this build no longer references."""
+        removed = 0
+        for directory, _, files in os.walk(self.out_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.path.relpath(path, self.out_dir) not in self.written:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+def exit_graph(rooms):
+    """Room id -> ids of the rooms its exits lead to (the end room is not a room)."""
+    ids = {room["id"] for room in rooms}
+    return {room["id"]: [exit["to"] for exit in room.get("exits", []) if exit.get("to") in ids]
+            for room in rooms}
+
+
+def rooms_within(graph, start, depth):
+    """(room id, distance) of the rooms reachable from start in 1..depth exits, nearest first."""
+    seen = {start}
+    order = []
+    queue = deque([(start, 0)])
+    while queue:
+        room_id, distance = queue.popleft()
+        if distance == depth:
+            continue
+        for neighbour in graph.get(room_id, []):
+            if neighbour not in seen:
+                seen.add(neighbour)
+                order.append((neighbour, distance + 1))
+                queue.append((neighbour, distance + 1))
+    return order
+
+
+def bundle_images(writer, base_dir, room_id, manifest, png_only):
+    """Bundle one room's images; returns {state: {"src", "variants", "placeholder"}}."""
+    room_dir = os.path.join(base_dir, "rooms", sanitize_filename(room_id))
+    stem = sanitize_filename(room_id)
+    images = {}
+    for state in STATES:
+        source = os.path.join(room_dir, f"{state}.png")
+        if not os.path.exists(source):
+            continue
+        image = {"src": writer.add_file("assets", f"{stem}-{state}", source)}
+        entry = manifest.get(room_id, {}).get(state)
+        if entry and not png_only:
+            variants = []
+            for variant in entry.get("variants", []):
+                path = os.path.join(base_dir, variant["path"])
+                if os.path.exists(path):
+                    variants.append({
+                        "src": writer.add_file("assets", f"{stem}-{state}-{variant['width']}", path),
+                        "format": variant["format"],
+                        "width": variant["width"],
+                        "bytes": variant["bytes"],
+                    })
+            if variants:
+                image["variants"] = variants
+            if entry.get("placeholder"):
+                image["placeholder"] = entry["placeholder"]
+        images[state] = image
+    return images
+
+
+def build(base_dir, out_dir, depth=2, png_only=False, prune=False):
+    start = time.monotonic()
+    with open(os.path.join(base_dir, "rooms.json")) as f:
+        game = json.load(f)
+    # The client trusts the bundle; a broken exit or key is cheaper to catch here than in the browser
+    schema.check(game, schema.validate_game, "rooms.json")
+    manifest = {}
+    manifest_path = os.path.join(base_dir, "rooms", "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    os.makedirs(out_dir, exist_ok=True)
+    writer = BundleWriter(out_dir)
+
+    rooms = {}
+    for room in game["rooms"]:
+        rooms[room["id"]] = {
+            "data": writer.add_bytes("rooms", sanitize_filename(room["id"]), ".json", minify(room)),
+            "images": bundle_images(writer, base_dir, room["id"], manifest, png_only),
+        }
+
+    graph = exit_graph(game["rooms"])
+    for room_id, entry in rooms.items():
+        nearby = rooms_within(graph, room_id, depth)
+        # (room, state) pairs, most likely needed first; the client picks the
+        # variant that suits its screen
+        images = [[other, "before"] for other, distance in nearby
+                  if distance == 1 and "before" in rooms[other]["images"]]
+        if "after" in entry["images"]:
+            images.append([room_id, "after"])
+        images.extend([other, "before"] for other, distance in nearby
+                      if distance > 1 and "before" in rooms[other]["images"])
+        entry["prefetch"] = {"rooms": [other for other, _ in nearby], "images": images}
+
+    client = {}
+    for name in CLIENT_FILES:
+        stem, ext = os.path.splitext(name)
+        with open(os.path.join(base_dir, name), "rb") as f:
+            client[name] = writer.add_bytes("", stem, ext, f.read())
+
+    bundle = {
+        "start_room": game["start_room"],
+        "end_room": game.get("end_room"),
+        "prefetch_depth": depth,
+        "rooms": rooms,
+    }
+    writer.add_text(BUNDLE_NAME, json.dumps(bundle, separators=(",", ":"), ensure_ascii=False))
+
+    with open(os.path.join(base_dir, "verne2.html")) as f:
+        html = f.read()
+    for name, hashed in client.items():
+        html = html.replace(f'"{name}"', f'"{hashed}"')
+    writer.add_text("index.html", html)
+
+    removed = writer.prune() if prune else 0
+    return {
+        "rooms": len(rooms),
+        "files": len(writer.written),
+        "bytes_written": writer.bytes_written,
+        "bytes_reused": writer.bytes_reused,
+        "removed": removed,
+        "seconds": time.monotonic() - start,
+    }
+
+
+def parse_args():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build a content-hashed static bundle of the web client")
+    parser.add_argument("--source", default=base_dir,
+                        help="Directory with rooms.json, rooms/ and the client files (default: verne/)")
+    parser.add_argument("--out", default=None, help="Output directory (default: <source>/dist)")
+    parser.add_argument("--prefetch-depth", type=int, default=2,
+                        help="Prefetch rooms up to this many exits away (default: 2)")
+    parser.add_argument("--png-only", action="store_true",
+                        help="Ignore img-optimize.py variants and bundle only the PNGs")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete files left over from earlier builds")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    out_dir = args.out or os.path.join(args.source, "dist")
+    if not os.path.exists(os.path.join(args.source, "rooms.json")):
+        print(f"Error: {os.path.join(args.source, 'rooms.json')} not found.")
+        sys.exit(1)
+    try:
+        result = build(args.source, out_dir, depth=args.prefetch_depth,
+                       png_only=args.png_only, prune=args.prune)
+    except schema.ValidationError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Bundled {result['rooms']} rooms into {out_dir}: {result['files']} files, "
+          f"{result['bytes_written'] / 1e6:.1f} MB written, {result['bytes_reused'] / 1e6:.1f} MB unchanged"
+          + (f", {result['removed']} stale files removed" if result["removed"] else "")
+          + f" in {result['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
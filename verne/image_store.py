@@ -0,0 +1,108 @@
+"""
+Content-addressed store for generated room images.
+
+Objects are keyed by a hash of everything that determines the image:
+(model, size, prompt) for generations and (model, base image hash, transform
+prompt) for edits. Room directories only hold hard links into the store
+(falling back to copies across filesystems) plus an images.json pointer
+file, so identical prompts are generated once, even across mansions sharing
+a store, and a rerun regenerates exactly the images whose inputs changed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image-store")
+POINTER_NAME = "images.json"
+
+
+def _hash(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def generation_key(model, size, prompt):
+    return _hash("generate", model, size, prompt)
+
+
+def edit_key(model, base_sha256, prompt):
+    return _hash("edit", model, base_sha256, prompt)
+
+
+def write_atomic(path, data):
+    """Write via a temp file and rename so a crash never leaves a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ImageStore:
+    def __init__(self, root=DEFAULT_STORE):
+        self.root = root # Directories are created by put(), so only looking changes nothing
+
+    def path(self, key):
+        return os.path.join(self.root, "objects", key[:2], f"{key}.png")
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, "objects", key[:2], f"{key}.json")
+
+    def has(self, key):
+        return os.path.exists(self.path(key)) and os.path.exists(self._meta_path(key))
+
+    def meta(self, key):
+        with open(self._meta_path(key)) as f:
+            return json.load(f)
+
+    def sha256(self, key):
+        return self.meta(key)["sha256"]
+
+    def put(self, key, data, **info):
+        """Store image bytes under key. The metadata file is written last and marks the object complete."""
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        write_atomic(self.path(key), data)
+        meta = {"key": key, "sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data),
+                "created": time.time(), **info}
+        write_atomic(self._meta_path(key), json.dumps(meta, indent=2).encode("utf-8"))
+        return meta
+
+    def link(self, key, dest):
+        """Point dest at the stored object (hard link, or a copy if linking is not possible)."""
+        source = self.path(key)
+        if os.path.exists(dest) and os.path.samefile(source, dest):
+            return
+        tmp_path = f"{dest}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+
+
+def read_pointers(room_dir):
+    try:
+        with open(os.path.join(room_dir, POINTER_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_pointer(room_dir, state, key, sha256):
+    pointers = read_pointers(room_dir)
+    pointers[state] = {"key": key, "sha256": sha256}
+    write_atomic(os.path.join(room_dir, POINTER_NAME),
+                 json.dumps(pointers, indent=2, sort_keys=True).encode("utf-8"))
@@ -3,162 +3,286 @@
 import os
 import sys
 import json
+import time
 import base64
+import asyncio
 import argparse
-import threading
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from openai import OpenAI
 
-# Check if API key is set in environment
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    # try ~/.openai.secret
-    try:
-        api_key = open(os.path.expanduser("~/.openai.secret")).read().strip()
-    except:
-        pass
-        
-    if not api_key:
-        print("Error: OPENAI_API_KEY environment variable not set.")
-        print("Please set your OpenAI API key with:")
-        print("    export OPENAI_API_KEY='your-api-key'")
-        sys.exit(1)
+# Shared modules (llm_client.py, ...) live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm_client import get_client, require_api_key
+import instrument
+import metrics
+from image_store import (DEFAULT_STORE, ImageStore, edit_key, file_sha256, generation_key, read_pointers,
+                         write_pointer)
 
-client = OpenAI(api_key=api_key)
+client = None # Created in main() only when there are images to make
 MODEL = "gpt-image-1"
 IMAGE_SIZE = "1536x1024"
 
-# Thread-safe print function
-print_lock = threading.Lock()
-def safe_print(message):
-    with print_lock:
-        print(message)
+def is_complete_png(path):
+    """True if path ends with a PNG IEND chunk (i.e. was written completely)."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != b"\x89PNG\r\n\x1a\n":
+                return False
+            f.seek(-12, os.SEEK_END)
+            return f.read(12)[4:8] == b"IEND"
+    except OSError:
+        return False
 
-def generate_image(prompt, output_path):
-    """Generate an image using OpenAI API and save it to the specified path."""
+# -------------------------------------------------------------------
+#  Image calls
+# -------------------------------------------------------------------
+async def generate_image(prompt, description):
+    """Generate an image using OpenAI API and return its PNG bytes (None on failure)."""
     try:
-        safe_print(f"Generating image: {output_path}")
-        
-        response = client.images.generate(
+        print(f"Generating image: {description}")
+
+        response = await client.generate_image(
             model=MODEL,
             prompt=prompt,
             n=1,
             size=IMAGE_SIZE,
         )
-        
-        # Decode and save the image
-        image_bytes = base64.b64decode(response.data[0].b64_json)
-        with open(output_path, "wb") as f:
-            f.write(image_bytes)
-            
-        safe_print(f"Image saved to {output_path}")
-        return True
-        
+        return base64.b64decode(response.data[0].b64_json)
+
     except Exception as e:
-        safe_print(f"Error generating image: {str(e)}")
-        return False
+        print(f"Error generating image: {str(e)}")
+        return None
 
-def generate_edited_image(prompt, base_image_path, output_path):
-    """Generate an edited image using an existing image as base."""
+async def generate_edited_image(prompt, base_image_path, description):
+    """Generate an edited image using an existing image as base; returns PNG bytes or None."""
     try:
-        safe_print(f"Generating edited image: {output_path} based on {base_image_path}")
-        
-        response = client.images.edit(
+        print(f"Generating edited image: {description}")
+
+        response = await client.edit_image(
+            base_image_path,
             model=MODEL,
-            image=open(base_image_path, "rb"),
             prompt=prompt,
         )
-        
-        # Decode and save the image
-        image_bytes = base64.b64decode(response.data[0].b64_json)
-        with open(output_path, "wb") as f:
-            f.write(image_bytes)
-            
-        safe_print(f"Edited image saved to {output_path}")
-        return True
-        
-    except Exception as e:
-        safe_print(f"Error generating edited image: {str(e)}")
-        return False
+        return base64.b64decode(response.data[0].b64_json)
 
-def process_room(room_dir):
-    """Process a single room directory to generate before and after images."""
-    prompt_file = os.path.join(room_dir, "img-prompt.json")
-    
-    # Skip if prompt file doesn't exist
-    if not os.path.exists(prompt_file):
-        safe_print(f"Skipping {room_dir} - no img-prompt.json found")
-        return
-    
-    # Load the prompt data
-    try:
-        with open(prompt_file, "r") as f:
-            prompt_data = json.load(f)
     except Exception as e:
-        safe_print(f"Error reading {prompt_file}: {str(e)}")
-        return
-    
-    # Define output paths
-    before_path = os.path.join(room_dir, "before.png")
-    after_path = os.path.join(room_dir, "after.png")
-    
-    # Track whether we generated before image in this run
-    before_generated = False
-    
-    # Generate before image if it doesn't exist
-    if not os.path.exists(before_path) and "prompt" in prompt_data:
-        before_generated = generate_image(prompt_data["prompt"], before_path)
-    else:
-        safe_print(f"Skipping {before_path} - file already exists or no prompt")
-        before_generated = os.path.exists(before_path)
-    
-    # Generate after image if it doesn't exist and before image exists
-    if not os.path.exists(after_path) and "transform" in prompt_data and before_generated:
-        generate_edited_image(prompt_data["transform"], before_path, after_path)
-    elif not before_generated and not os.path.exists(after_path) and "transform" in prompt_data:
-        safe_print(f"Cannot generate {after_path} - before.png does not exist")
-    else:
-        safe_print(f"Skipping {after_path} - file already exists or no transform prompt")
+        print(f"Error generating edited image: {str(e)}")
+        return None
+
+# -------------------------------------------------------------------
+#  Job graph: every generate/edit call for all rooms, keyed by its inputs
+# -------------------------------------------------------------------
+class Job:
+    def __init__(self, job_id, kind, prompt, key=None, base_key=None, dep=None):
+        self.id = job_id
+        self.kind = kind # "generate" or "edit"
+        self.prompt = prompt
+        self.key = key # Store key; for an edit of a job in this run it is known only once dep is done
+        self.base_key = base_key # Store key of the image an edit starts from
+        self.dep = dep # Generate job that must succeed first, if it is part of this run
+        self.targets = [] # (room_dir, state) pairs that should point at the result
+
+    def describe(self):
+        return ", ".join(os.path.join(room_dir, f"{state}.png") for room_dir, state in self.targets)
+
+def link_target(store, key, room_dir, state):
+    store.link(key, os.path.join(room_dir, f"{state}.png"))
+    write_pointer(room_dir, state, key, store.sha256(key))
+
+class Planner:
+    """
+    Resolves each room's before/after image against the store. Images whose
+    inputs are already stored are just linked; the rest become jobs. Rooms
+    with identical inputs share one job. With dry_run nothing is written:
+    images are only checked against the store and for adoption.
+    """
+
+    def __init__(self, store, adopt=True, dry_run=False):
+        self.store = store
+        self.adopt = adopt
+        self.dry_run = dry_run
+        self.jobs = {}
+        self.linked = 0
+        self._adoptable = {} # Dry run: key -> sha256 of an existing image that would be adopted
+
+    def _job(self, job_id, **kwargs):
+        if job_id not in self.jobs:
+            self.jobs[job_id] = Job(job_id, **kwargs)
+        return self.jobs[job_id]
+
+    def _resolve(self, room_dir, state, key, pointers, **info):
+        """Link a stored (or adopted) image into the room; False if it must be made."""
+        path = os.path.join(room_dir, f"{state}.png")
+        if not self.store.has(key):
+            # A finished image with no pointer predates the store: adopt it once
+            if not (self.adopt and state not in pointers and is_complete_png(path)):
+                return False
+            if self.dry_run:
+                self._adoptable[key] = file_sha256(path)
+                print(f"Would adopt existing {path} into the image store")
+            else:
+                with open(path, "rb") as f:
+                    self.store.put(key, f.read(), adopted=True, **info)
+                print(f"Adopted existing {path} into the image store")
+        if not self.dry_run:
+            link_target(self.store, key, room_dir, state)
+        self.linked += 1
+        return True
+
+    def _sha256(self, key):
+        return self._adoptable[key] if key in self._adoptable else self.store.sha256(key)
+
+    def plan_room(self, room_dir):
+        prompt_file = os.path.join(room_dir, "img-prompt.json")
+
+        # Skip if prompt file doesn't exist
+        if not os.path.exists(prompt_file):
+            print(f"Skipping {room_dir} - no img-prompt.json found")
+            return
+
+        # Load the prompt data
+        try:
+            with open(prompt_file, "r") as f:
+                prompt_data = json.load(f)
+        except Exception as e:
+            print(f"Error reading {prompt_file}: {str(e)}")
+            return
+
+        pointers = read_pointers(room_dir)
+        before_key = before_job = None
+        if "prompt" in prompt_data:
+            key = generation_key(MODEL, IMAGE_SIZE, prompt_data["prompt"])
+            if self._resolve(room_dir, "before", key, pointers, kind="generate", prompt=prompt_data["prompt"]):
+                before_key = key
+            else:
+                before_job = self._job(key, kind="generate", prompt=prompt_data["prompt"], key=key)
+                before_job.targets.append((room_dir, "before"))
+        else:
+            print(f"Skipping {room_dir}/before.png - no prompt")
+
+        if "transform" not in prompt_data:
+            print(f"Skipping {room_dir}/after.png - no transform prompt")
+        elif before_key is not None:
+            key = edit_key(MODEL, self._sha256(before_key), prompt_data["transform"])
+            if not self._resolve(room_dir, "after", key, pointers, kind="edit",
+                                 prompt=prompt_data["transform"], base=before_key):
+                job = self._job(key, kind="edit", prompt=prompt_data["transform"], key=key, base_key=before_key)
+                job.targets.append((room_dir, "after"))
+        elif before_job is not None:
+            job_id = f"{before_job.id}/edit/{generation_key(MODEL, '', prompt_data['transform'])}"
+            job = self._job(job_id, kind="edit", prompt=prompt_data["transform"], dep=before_job)
+            job.targets.append((room_dir, "after"))
+        else:
+            print(f"Cannot generate {room_dir}/after.png - before.png does not exist")
+
+async def run_jobs(jobs, store, generate_limit, edit_limit):
+    """
+    Run all jobs concurrently with separate limits per endpoint; an edit
+    starts as soon as the generate it is based on has finished.
+    """
+    limits = {"generate": asyncio.Semaphore(generate_limit), "edit": asyncio.Semaphore(edit_limit)}
+    tasks = {}
+
+    async def run(job):
+        if job.dep is not None:
+            if not await tasks[job.dep.id]:
+                print(f"Cannot generate {job.describe()} - base image failed")
+                return False
+            job.base_key = job.dep.key
+            job.key = edit_key(MODEL, store.sha256(job.base_key), job.prompt)
+
+        if not store.has(job.key):
+            async with limits[job.kind]:
+                with instrument.span(job.kind, job=job.describe()):
+                    if job.kind == "generate":
+                        data = await generate_image(job.prompt, job.describe())
+                    else:
+                        data = await generate_edited_image(job.prompt, store.path(job.base_key), job.describe())
+            if data is None:
+                return False
+            info = {"kind": job.kind, "prompt": job.prompt, "model": MODEL}
+            if job.base_key:
+                info["base"] = job.base_key
+            store.put(job.key, data, **info)
+
+        for room_dir, state in job.targets:
+            link_target(store, job.key, room_dir, state)
+        print(f"Image saved to {job.describe()}")
+        return True
+
+    for job in jobs:
+        tasks[job.id] = asyncio.ensure_future(run(job))
+    results = await asyncio.gather(*tasks.values())
+    return sum(results), len(results) - sum(results)
 
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Generate images for rooms based on img-prompt.json files")
-    parser.add_argument("-j", "--jobs", type=int, default=1, 
-                        help="Number of parallel jobs to run (default: 1)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Concurrent requests per endpoint, so up to 2N calls at once (default: 1)")
+    parser.add_argument("--generate-jobs", type=int, default=None,
+                        help="Concurrent image generations (default: --jobs)")
+    parser.add_argument("--edit-jobs", type=int, default=None,
+                        help="Concurrent image edits (default: --jobs)")
+    parser.add_argument("--metrics", metavar="PATH", default=None,
+                        help="Append per-call metrics (latency, tokens) to this JSONL file")
+    parser.add_argument("--store", default=os.getenv("IMG_STORE", DEFAULT_STORE),
+                        help="Content-addressed image store, may be shared between mansions "
+                             "(default: $IMG_STORE or verne/image-store)")
+    parser.add_argument("--no-adopt", action="store_true",
+                        help="Regenerate existing images that are not yet recorded in the store")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the jobs that would run, without writing any file or calling the API")
+    instrument.add_arguments(parser)
     return parser.parse_args()
 
 def main():
+    global client
     args = parse_args()
+    instrument.start(args)
     num_jobs = max(1, args.jobs)  # Ensure at least 1 job
-    
+    generate_limit = max(1, args.generate_jobs or num_jobs)
+    edit_limit = max(1, args.edit_jobs or num_jobs)
+    metrics.configure(args.metrics)
+
     # Rooms directory should be in the same directory as this script
     base_dir = os.path.dirname(os.path.abspath(__file__))
     rooms_dir = os.path.join(base_dir, "rooms")
-    
+
     if not os.path.exists(rooms_dir):
         print(f"Error: Rooms directory '{rooms_dir}' not found.")
         sys.exit(1)
-    
+
     # Walk through all room directories
-    room_dirs = [os.path.join(rooms_dir, d) for d in os.listdir(rooms_dir) 
-                if os.path.isdir(os.path.join(rooms_dir, d))]
-    
+    room_dirs = sorted(os.path.join(rooms_dir, d) for d in os.listdir(rooms_dir)
+                       if os.path.isdir(os.path.join(rooms_dir, d)))
+
     if not room_dirs:
         print("No room directories found.")
         sys.exit(1)
-    
+
     print(f"Found {len(room_dirs)} room directories.")
-    print(f"Using {num_jobs} parallel jobs for processing.")
-    
-    # Process rooms in parallel
-    with ThreadPoolExecutor(max_workers=num_jobs) as executor:
-        # Submit all room processing tasks to the executor
-        futures = [executor.submit(process_room, room_dir) for room_dir in room_dirs]
-        
-        # Wait for all tasks to complete (this happens automatically when exiting the context)
-    
-    print("Done! Generated images for all rooms.")
+    store = ImageStore(args.store)
+    planner = Planner(store, adopt=not args.no_adopt, dry_run=args.dry_run)
+    with instrument.span("plan", rooms=len(room_dirs)):
+        for room_dir in room_dirs:
+            planner.plan_room(room_dir)
+    jobs = list(planner.jobs.values())
+    print(f"{planner.linked} images {'would be ' if args.dry_run else ''}up to date in {args.store}.")
+    if args.dry_run or not jobs:
+        for job in jobs:
+            print(f"Would {job.kind}: {job.describe()}")
+        print(f"{len(jobs)} jobs to run.")
+        return
+    print(f"Scheduling {len(jobs)} jobs ({generate_limit} concurrent generations, {edit_limit} concurrent edits).")
+
+    # Shared async client: all jobs share its connections and limits
+    client = get_client(api_key=require_api_key())
+    start = time.monotonic()
+    with instrument.span("run_jobs", jobs=len(jobs)):
+        done, failed = client.run(run_jobs(jobs, store, generate_limit, edit_limit))
+
+    print(f"Done! {done} images generated, {failed} failed in {time.monotonic() - start:.1f}s.")
+    print(metrics.get_recorder().summary())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
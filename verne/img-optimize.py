@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Post-process the generated room images for the web client.
+
+For every rooms/<Room>/before.png and after.png this writes WebP, AVIF (when
+Pillow supports it) and progressive JPEG variants at several widths into
+rooms/<Room>/variants/, plus a tiny blurred placeholder, and records them in
+rooms/manifest.json keyed by room id. Encoding runs on a process pool; inputs
+whose content hash matches the manifest are skipped on reruns.
+
+Requires Pillow (pip install pillow).
+
+Usage: python img-optimize.py [-j JOBS] [--widths 1536 1024 768 480] [--force]
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageFilter, features
+
+DEFAULT_WIDTHS = (1536, 1024, 768, 480)
+STATES = ("before", "after")
+PLACEHOLDER_WIDTH = 24
+QUALITY = {"webp": 80, "avif": 60, "jpeg": 82}
+MANIFEST_NAME = "manifest.json"
+
+def available_formats():
+    formats = ["webp", "jpeg"]
+    if features.check("avif"):
+        formats.insert(1, "avif")
+    return formats
+
+def sanitize_filename(name):
+    """Same rule as img-prompt-writer.py uses for room directories."""
+    name = re.sub(r'[^\w\s-]', '', name).strip()
+    name = re.sub(r'[-\s]+', '_', name)
+    return name
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=QUALITY["webp"], method=4)
+    elif fmt == "avif":
+        image.save(buffer, "AVIF", quality=QUALITY["avif"])
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return buffer.getvalue()
+
+def make_placeholder(image):
+    """A ~24px wide blurred JPEG as a data URI, small enough to inline in the manifest."""
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    small = image.convert("RGB").resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, "JPEG", quality=40)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def process_image(source_path, out_dir, stem, widths, formats):
+    """
+    Worker: encode every (width, format) variant of one source image.
+    Returns the manifest entry for it.
+    """
+    start = time.monotonic()
+    source_hash = file_sha256(source_path)
+    image = Image.open(source_path)
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    os.makedirs(out_dir, exist_ok=True)
+
+    variants = []
+    # Never upscale; the source width is always included
+    for width in sorted({min(w, image.width) for w in widths}, reverse=True):
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            encode_start = time.monotonic()
+            data = encode(resized, fmt)
+            encode_seconds = time.monotonic() - encode_start
+            extension = "jpg" if fmt == "jpeg" else fmt
+            path = os.path.join(out_dir, f"{stem}-{width}.{extension}")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            variants.append({
+                "path": path,
+                "format": fmt,
+                "width": width,
+                "height": height,
+                "bytes": len(data),
+                "encode_seconds": round(encode_seconds, 4),
+            })
+
+    return {
+        "source": source_path,
+        "sha256": source_hash,
+        "bytes": os.path.getsize(source_path),
+        "width": image.width,
+        "height": image.height,
+        "variants": variants,
+        "placeholder": make_placeholder(image),
+        "seconds": round(time.monotonic() - start, 3),
+    }
+
+def is_up_to_date(entry, source_path, widths, formats):
+    """True if entry lists exactly the wanted variants (build-bundle ships all it lists) and all exist."""
+    if not entry or entry.get("sha256") != file_sha256(source_path):
+        return False
+    have = {(v["width"], v["format"]) for v in entry.get("variants", []) if os.path.exists(v["path"])}
+    want = {(min(w, entry["width"]), fmt) for w in widths for fmt in formats}
+    return want == have and len(have) == len(entry["variants"])
+
+def remove_stale_variants(previous, entry):
+    """Delete the files of variants the previous entry listed and the new one no longer does."""
+    keep = {v["path"] for v in entry["variants"]}
+    for v in (previous or {}).get("variants", []):
+        if v["path"] not in keep and os.path.exists(v["path"]):
+            os.remove(v["path"])
+
+def load_room_ids(rooms_json):
+    """Map sanitized directory names back to room ids from rooms.json."""
+    try:
+        with open(rooms_json) as f:
+            return {sanitize_filename(room["id"]): room["id"] for room in json.load(f)["rooms"]}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Encode web-friendly variants of the room images")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS),
+                        help=f"Output widths in pixels (default: {' '.join(map(str, DEFAULT_WIDTHS))})")
+    parser.add_argument("--force", action="store_true", help="Re-encode even if inputs are unchanged")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    rooms_dir = os.path.join(base_dir, "rooms")
+    manifest_path = os.path.join(rooms_dir, MANIFEST_NAME)
+    if not os.path.exists(rooms_dir):
+        print(f"Error: Rooms directory '{rooms_dir}' not found.")
+        sys.exit(1)
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    room_ids = load_room_ids(os.path.join(base_dir, "rooms.json"))
+    formats = available_formats()
+
+    # Manifest paths are relative to verne/ so they can be used as URLs by the client
+    os.chdir(base_dir)
+    jobs = []
+    skipped = 0
+    for dir_name in sorted(os.listdir("rooms")):
+        room_dir = os.path.join("rooms", dir_name)
+        if not os.path.isdir(room_dir):
+            continue
+        room_id = room_ids.get(dir_name, dir_name)
+        for state in STATES:
+            source = os.path.join(room_dir, f"{state}.png")
+            if not os.path.exists(source):
+                continue
+            entry = manifest.get(room_id, {}).get(state)
+            if not args.force and is_up_to_date(entry, source, args.widths, formats):
+                skipped += 1
+                continue
+            jobs.append((room_id, state, source, os.path.join(room_dir, "variants")))
+
+    print(f"{len(jobs)} images to encode ({skipped} unchanged), formats: {', '.join(formats)}, "
+          f"widths: {', '.join(map(str, args.widths))}, {args.jobs} workers")
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(process_image, source, out_dir, state, args.widths, formats): (room_id, state)
+                   for room_id, state, source, out_dir in jobs}
+        for future in as_completed(futures):
+            room_id, state = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Error encoding {room_id} {state}: {e}")
+                continue
+            remove_stale_variants(manifest.get(room_id, {}).get(state), entry)
+            manifest.setdefault(room_id, {})[state] = entry
+            print(f"Encoded {room_id} {state} in {entry['seconds']:.1f}s")
+    elapsed = time.monotonic() - start
+
+    # Drop rooms whose directories have gone away
+    manifest = {room_id: states for room_id, states in manifest.items()
+                if any(os.path.exists(entry["source"]) for entry in states.values())}
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    # Size report over the whole manifest
+    source_bytes = sum(e["bytes"] for states in manifest.values() for e in states.values())
+    by_format = {}
+    for states in manifest.values():
+        for entry in states.values():
+            for v in entry["variants"]:
+                stats = by_format.setdefault((v["format"], v["width"]), [0, 0, 0.0])
+                stats[0] += 1
+                stats[1] += v["bytes"]
+                stats[2] += v["encode_seconds"]
+    print(f"\nSources: {source_bytes / 1e6:.1f} MB in {sum(len(s) for s in manifest.values())} images")
+    print(f"{'format':<6} {'width':>6} {'images':>6} {'total MB':>9} {'avg KB':>7} {'vs PNG':>7} {'encode s':>9}")
+    for (fmt, width), (count, size, seconds) in sorted(by_format.items()):
+        print(f"{fmt:<6} {width:>6} {count:>6} {size / 1e6:>9.2f} {size / count / 1e3:>7.0f} "
+              f"{100 * size / source_bytes if source_bytes else 0:>6.1f}% {seconds:>9.2f}")
+    print(f"Encoded {len(jobs)} images in {elapsed:.1f}s; manifest written to {manifest_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,18 @@
 #!/usr/bin/env python3
 
-from openai import OpenAI
+import argparse
 import json
 import os
 import sys
 import re
+from pathlib import Path
 
-# Check if API key is set in environment
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    # try ~/.openai.secret
-    api_key = open(os.path.expanduser("~/.openai.secret")).read().strip()
-    if not api_key:
-        print("Error: OPENAI_API_KEY environment variable not set.")
-        print("Please set your OpenAI API key with:")
-        print("    export OPENAI_API_KEY='your-api-key'")
-        sys.exit(1)
+# Shared modules (llm_client.py, ...) live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm_client import estimate_tokens, get_client, require_api_key
+import instrument
 
-client = OpenAI(api_key=api_key)
+client = None # Created in main() once arguments are parsed
 MODEL = "gpt-4.5-preview"
 
 def sanitize_filename(name):
@@ -32,48 +27,176 @@ def create_directory(path):
         os.makedirs(path)
         print(f"Created directory: {path}")
 
-def get_image_prompt(room_name, rooms_data):
-    """Generate image prompts using OpenAI's API."""
-    system_message = (
-        "You are a meticulous image prompt creator for a Jules Verne-themed Victorian mansion adventure game. "
-        "Your task is to create detailed, descriptive prompts for generating photorealistic images. "
-        "Output strictly valid JSON only."
-    )
-    
+SYSTEM_MESSAGE = (
+    "You are a meticulous image prompt creator for a Jules Verne-themed Victorian mansion adventure game. "
+    "Your task is to create detailed, descriptive prompts for generating photorealistic images. "
+    "Output strictly valid JSON only."
+)
+
+PROMPT_INSTRUCTIONS = (
+    "please give a detailed image generation prompt and a followup prompt to transform the image of the room as required. "
+    "Be sure to include every element from the entry_text (and then for the transformation, the entry_text_after). "
+    "Carefully describe the lighting and ambiance for the artist. "
+    "Start with \"Please generate a landscape photorealistic image of a room in a Jules Verne-themed Victorian mansion. "
+    "Make the lighting dramatic and bright enough for the scene to be clearly visible.\"."
+)
+
+EMPTY_PROMPT = {"prompt": "", "transform": ""}
+
+def get_full_context_messages(room_name, rooms_data):
+    """The original request: the whole mansion is sent along with every room."""
     user_message = f"""
     Here's the full data for the rooms in our Victorian Jules Verne-themed mansion:
     
     {json.dumps(rooms_data, indent=2)}
     
-    Now, for the room "{room_name}", please give a detailed image generation prompt and a followup prompt to transform the image of the room as required. Be sure to include every element from the entry_text (and then for the transformation, the entry_text_after). Carefully describe the lighting and ambiance for the artist. Start with "Please generate a landscape photorealistic image of a room in a Jules Verne-themed Victorian mansion. Make the lighting dramatic and bright enough for the scene to be clearly visible.". Answer in JSON object {{"prompt": "...", "transform":"..."\}}
+    Now, for the room "{room_name}", {PROMPT_INSTRUCTIONS} Answer in JSON object {{"prompt": "...", "transform":"..."\}}
     """
-    
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+
+# -------------------------------------------------------------------
+#  Compact context: each room with one-line summaries of its neighbours
+# -------------------------------------------------------------------
+def first_sentence(text):
+    text = text.replace("**", "")
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    return match.group(1) if match else text
+
+def build_neighbour_summaries(rooms_data):
+    """One short line per room, computed once and shared by every request."""
+    return {room["id"]: first_sentence(room.get("entry_text", "")) for room in rooms_data["rooms"]}
+
+def get_neighbours(room, rooms_data):
+    """Rooms reachable through an exit of this room or leading into it."""
+    neighbours = [ex["to"] for ex in room.get("exits", [])]
+    neighbours += [other["id"] for other in rooms_data["rooms"]
+                   if any(ex["to"] == room["id"] for ex in other.get("exits", []))]
+    return list(dict.fromkeys(n for n in neighbours if n != room["id"]))
+
+def get_compact_messages(rooms, rooms_data, summaries):
+    """One request for a batch of rooms: their own data plus neighbour summaries."""
+    neighbour_ids = []
+    for room in rooms:
+        neighbour_ids += get_neighbours(room, rooms_data)
+    batch_ids = {room["id"] for room in rooms}
+    neighbours = {n: summaries[n] for n in dict.fromkeys(neighbour_ids)
+                  if n in summaries and n not in batch_ids}
+
+    room_names = ", ".join(f'"{room["id"]}"' for room in rooms)
+    user_message = f"""
+    Here are rooms from our Victorian Jules Verne-themed mansion:
+
+    {json.dumps(rooms, separators=(",", ":"))}
+
+    Neighbouring rooms, for what can be glimpsed through exits:
+
+    {json.dumps(neighbours, separators=(",", ":"))}
+
+    For each of the rooms {room_names}, {PROMPT_INSTRUCTIONS} Answer in JSON object {{"rooms": [{{"id": "...", "prompt": "...", "transform": "..."}}]}} with one entry per room.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+
+def make_batches(rooms, batch_size):
+    return [rooms[i:i + batch_size] for i in range(0, len(rooms), batch_size)]
+
+# -------------------------------------------------------------------
+#  Requests
+# -------------------------------------------------------------------
+async def request_json(messages, description):
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
-        
-        response_content = response.choices[0].message.content
-        
-        # Verify it's valid JSON
-        try:
-            return json.loads(response_content)
-        except json.JSONDecodeError:
-            print(f"Error: Response for room '{room_name}' is not valid JSON.")
-            print(f"Raw response: {response_content[:100]}...")
-            return {"prompt": "", "transform": ""}
-            
+        with instrument.span("model_call", request=description):
+            response = await client.chat(
+                stage="image_prompt",
+                model=MODEL,
+                messages=messages,
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
     except Exception as e:
-        print(f"Error calling OpenAI API for room '{room_name}': {str(e)}")
-        return {"prompt": "", "transform": ""}
+        print(f"Error calling OpenAI API for {description}: {str(e)}")
+        return None
+
+    response_content = response.choices[0].message.content
+    try:
+        return json.loads(response_content)
+    except json.JSONDecodeError:
+        print(f"Error: Response for {description} is not valid JSON.")
+        print(f"Raw response: {response_content[:100]}...")
+        return None
+
+def get_image_prompt(room_name, rooms_data):
+    """Generate image prompts using OpenAI's API."""
+    result = client.run(request_json(get_full_context_messages(room_name, rooms_data), f"room '{room_name}'"))
+    return result if result is not None else dict(EMPTY_PROMPT)
+
+async def get_batch_prompts(batch, rooms_data, summaries):
+    """
+    Returns room id -> prompt data for one batch. Rooms the model left out of
+    a batched answer are retried on their own.
+    """
+    names = [room["id"] for room in batch]
+    result = await request_json(get_compact_messages(batch, rooms_data, summaries), f"rooms {names}")
+    prompts = {}
+    if result is not None:
+        entries = result.get("rooms", []) if len(batch) > 1 or "rooms" in result else [dict(result, id=names[0])]
+        for entry in entries:
+            if isinstance(entry, dict) and entry.get("id") in names:
+                prompts[entry["id"]] = {"prompt": entry.get("prompt", ""), "transform": entry.get("transform", "")}
+
+    missing = [room for room in batch if room["id"] not in prompts]
+    if len(batch) > 1 and missing:
+        print(f"Batch answer missed {[room['id'] for room in missing]}; requesting them individually.")
+        for prompts_for_room in await client.gather(get_batch_prompts([room], rooms_data, summaries) for room in missing):
+            prompts.update(prompts_for_room)
+    for room in batch:
+        prompts.setdefault(room["id"], dict(EMPTY_PROMPT))
+    return prompts
+
+def get_compact_prompts(rooms_data, batch_size):
+    """All rooms' prompts, batched and run concurrently."""
+    summaries = build_neighbour_summaries(rooms_data)
+    batches = make_batches(rooms_data["rooms"], batch_size)
+    results = client.run_all([get_batch_prompts(batch, rooms_data, summaries) for batch in batches])
+    prompts = {}
+    for result in results:
+        prompts.update(result)
+    return prompts
+
+def report_token_savings(rooms_data, batch_sizes=(1, 2, 4)):
+    """Estimated input tokens of the full-context mode against compact batches."""
+    summaries = build_neighbour_summaries(rooms_data)
+    rooms = rooms_data["rooms"]
+    full = sum(estimate_tokens(get_full_context_messages(room["id"], rooms_data)) for room in rooms)
+    print(f"Estimated input tokens for {len(rooms)} rooms (~4 chars/token):")
+    print(f"  {'full context':<22} {len(rooms):>3} requests  {full:>8} tokens")
+    for batch_size in batch_sizes:
+        batches = make_batches(rooms, batch_size)
+        compact = sum(estimate_tokens(get_compact_messages(batch, rooms_data, summaries)) for batch in batches)
+        print(f"  {f'compact, batch={batch_size}':<22} {len(batches):>3} requests  {compact:>8} tokens"
+              f"  ({100 * (1 - compact / full):.0f}% fewer)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write img-prompt.json for every room in rooms.json")
+    parser.add_argument("--compact", action="store_true",
+                        help="Send each room with neighbour summaries instead of the whole mansion")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Rooms per request in --compact mode (default: 1)")
+    parser.add_argument("--report-savings", action="store_true",
+                        help="Print estimated input tokens for full vs compact context and exit")
+    instrument.add_arguments(parser)
+    return parser.parse_args()
 
 def main():
+    global client
+    args = parse_args()
+    instrument.start(args)
+
     # Check if rooms.json exists
     if not os.path.exists("rooms.json"):
         print("Error: rooms.json file not found.")
@@ -90,8 +213,21 @@ def main():
         print(f"Error reading rooms.json: {str(e)}")
         sys.exit(1)
     
+    if args.report_savings:
+        with instrument.span("report_savings"):
+            report_token_savings(rooms_data)
+        return
+
+    client = get_client(api_key=require_api_key())
+
     # Create base directory if it doesn't exist
     create_directory("rooms")
+
+    compact_prompts = None
+    if args.compact:
+        print(f"Requesting compact prompts in batches of {max(1, args.batch_size)}...")
+        with instrument.span("compact_prompts"):
+            compact_prompts = get_compact_prompts(rooms_data, max(1, args.batch_size))
     
     # Process each room in the "rooms" array
     for room in rooms_data["rooms"]:
@@ -104,7 +240,11 @@ def main():
         create_directory(room_dir)
         
         # Generate image prompts
-        img_prompt_data = get_image_prompt(room_name, rooms_data)
+        if compact_prompts is not None:
+            img_prompt_data = compact_prompts[room_name]
+        else:
+            with instrument.span("room_prompt", room=room_name):
+                img_prompt_data = get_image_prompt(room_name, rooms_data)
         
         # Save to file
         output_path = f"{room_dir}/img-prompt.json"
@@ -14,6 +14,11 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, List, Set
 
+# Shared modules (instrument.py, ...) live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import instrument
+import schema
+
 
 def load_game(path: Path) -> Dict[str, Any]:
     """Load and validate the mansion JSON definition."""
@@ -25,14 +30,13 @@ def load_game(path: Path) -> Dict[str, Any]:
     except json.JSONDecodeError as exc:
         sys.exit(f"❌ JSON syntax error: {exc}")
 
-    for required in ("start_room", "rooms"):
-        if required not in data:
-            sys.exit(f"❌ Missing '{required}' field in JSON definition.")
+    errors = schema.validate_game(data)
+    if errors:
+        listed = "\n".join(f"   {error}" for error in errors)
+        sys.exit(f"❌ {path} is not a valid game definition ({len(errors)} problems):\n{listed}")
 
     # Index rooms by id for O(1) lookup
     data["room_index"] = {room["id"]: room for room in data["rooms"]}
-    if data["start_room"] not in data["room_index"]:
-        sys.exit("❌ start_room id not found in rooms list.")
     return data
 
 
@@ -82,19 +86,24 @@ class MansionGame:
             if cmd in {"quit", "exit"}:
                 print("Goodbye!")
                 break
-            if cmd == "help":
-                self.help()
-                continue
-            if cmd == "inventory":
-                self.show_inventory()
-                continue
-
-            if self.try_item(room, cmd):
-                continue
-            if self.try_exit(room, cmd):
-                # moved room; loop back to describe new room
-                continue
-            print("I don't see how to do that.")
+            with instrument.span("command"):
+                self.dispatch(room, cmd)
+
+    def dispatch(self, room: Dict[str, Any], cmd: str) -> None:
+        """Carry out one command typed in room."""
+        if cmd == "help":
+            self.help()
+            return
+        if cmd == "inventory":
+            self.show_inventory()
+            return
+
+        if self.try_item(room, cmd):
+            return
+        if self.try_exit(room, cmd):
+            # moved room; the play loop describes the new room
+            return
+        print("I don't see how to do that.")
 
     # ───────────────────────────── helper routines ─────────────────────────
     def help(self) -> None:
@@ -185,9 +194,12 @@ class MansionGame:
 def main() -> None:
     parser = argparse.ArgumentParser(description="Play a text‑based mansion maze game.")
     parser.add_argument("json", nargs="?", default="sample_mansion.json", help="Path to the mansion definition JSON file")
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    instrument.start(args)
 
-    data = load_game(Path(args.json))
+    with instrument.span("load_game"):
+        data = load_game(Path(args.json))
     MansionGame(data).play()
 
 
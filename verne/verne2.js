@@ -19,6 +19,12 @@ let activeTypewriterFullText = '';
 const TYPEWRITER_DELAY = 35; // ms per character
 const SAVE_KEY = 'verne_savegame'; // Key for localStorage
 
+// Set when served from a build-bundle.py bundle: room data and images are then
+// loaded per room from content-hashed files, and neighbours are prefetched
+let bundle = null;
+const pendingRooms = {}; // Room id -> Promise of its room data
+const prefetchedImages = new Set();
+
 // --- Utility Functions ---
 
 function sanitizeForFilename(name) {
@@ -41,15 +47,79 @@ function getAvailableActions(room, includeGlobal = false) {
     return actions.sort();
 }
 
+function roomExists(roomId) {
+    return Boolean(roomIndex[roomId] || (bundle && bundle.rooms[roomId]));
+}
+
+// Pick the image for this screen: the smallest WebP (or JPEG) variant at least
+// as wide as the window, the widest one otherwise, or the PNG if there are none
+function pickImage(image) {
+    const wanted = window.innerWidth * (window.devicePixelRatio || 1);
+    for (const format of ['webp', 'jpeg']) {
+        const candidates = (image.variants || []).filter(v => v.format === format).sort((a, b) => a.width - b.width);
+        if (candidates.length) {
+            return (candidates.find(v => v.width >= wanted) || candidates[candidates.length - 1]).src;
+        }
+    }
+    return image.src;
+}
+
+function roomBackground(room, imageState) {
+    const bundled = bundle && bundle.rooms[room.id] && bundle.rooms[room.id].images[imageState];
+    if (!bundled) {
+        return `url('rooms/${sanitizeForFilename(room.id)}/${imageState}.png')`;
+    }
+    // The inlined placeholder shows underneath until the full image arrives
+    const layers = [`url('${pickImage(bundled)}')`];
+    if (bundled.placeholder) layers.push(`url('${bundled.placeholder}')`);
+    return layers.join(', ');
+}
+
+// Fetch a room's data from the bundle (once); resolves immediately for loaded rooms
+function ensureRoom(roomId) {
+    if (roomIndex[roomId]) return Promise.resolve(roomIndex[roomId]);
+    if (!bundle || !bundle.rooms[roomId]) return Promise.reject(new Error(`Unknown room: ${roomId}`));
+    if (!pendingRooms[roomId]) {
+        pendingRooms[roomId] = fetch(bundle.rooms[roomId].data)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+                return response.json();
+            })
+            .then(room => {
+                roomIndex[roomId] = roomIndex[roomId] || room;
+                return roomIndex[roomId];
+            })
+            .catch(error => {
+                delete pendingRooms[roomId]; // Allow a retry on the next attempt
+                throw error;
+            });
+    }
+    return pendingRooms[roomId];
+}
+
+// Warm the cache with everything the bundle lists as close to this room
+function prefetchAround(roomId) {
+    if (!bundle || !bundle.rooms[roomId]) return;
+    const prefetch = bundle.rooms[roomId].prefetch;
+    for (const nearby of prefetch.rooms) {
+        ensureRoom(nearby).catch(() => {}); // Fetched again on arrival if this fails
+    }
+    for (const [imageRoomId, imageState] of prefetch.images) {
+        const url = pickImage(bundle.rooms[imageRoomId].images[imageState]);
+        if (!prefetchedImages.has(url)) {
+            prefetchedImages.add(url);
+            new Image().src = url;
+        }
+    }
+}
+
 // Function to immediately update background image without redrawing room
 function updateBackgroundImage() {
     const room = roomIndex[currentRoomId];
     if (!room) return;
     
-    const roomImageName = sanitizeForFilename(room.id);
     const imageState = transformedRooms.has(currentRoomId) ? 'after' : 'before';
-    const imageUrl = `rooms/${roomImageName}/${imageState}.png`;
-    gameContainer.style.backgroundImage = `url('${imageUrl}')`;
+    gameContainer.style.backgroundImage = roomBackground(room, imageState);
 }
 
 // --- Typewriter Effect ---
@@ -195,6 +265,14 @@ function displayOutput(text, isImmediate = false) {
 
 
 function updateRoomDisplay() {
+    if (currentRoomId && !roomIndex[currentRoomId] && roomExists(currentRoomId)) {
+        // Bundled room not fetched yet (normally it was prefetched from a neighbour)
+        ensureRoom(currentRoomId).then(updateRoomDisplay, error => {
+            console.error("Error loading room:", error);
+            displayOutput(`Error loading room: ${error.message}`, true);
+        });
+        return;
+    }
     if (!currentRoomId || !roomIndex[currentRoomId]) {
         console.error("Error: Invalid currentRoomId", currentRoomId);
         displayOutput("Error: Cannot find the current room.", true);
@@ -208,12 +286,10 @@ function updateRoomDisplay() {
     displayOutput(`[${room.id}]`, true);
 
     // 2. Set background image
-    const roomImageName = sanitizeForFilename(room.id);
     // Use 'after' image if the room has been transformed (is in transformedRooms set).
     // Otherwise, use 'before' image.
     const imageState = transformedRooms.has(currentRoomId) ? 'after' : 'before';
-    const imageUrl = `rooms/${roomImageName}/${imageState}.png`;
-    gameContainer.style.backgroundImage = `url('${imageUrl}')`;
+    gameContainer.style.backgroundImage = roomBackground(room, imageState);
     // Optional: Add a fallback background color or image
     gameContainer.style.backgroundColor = '#000'; // Fallback if image fails
 
@@ -228,6 +304,8 @@ function updateRoomDisplay() {
         // Callback after room description is typed
         // Optionally add a slight pause or divider before the next prompt
     });
+
+    prefetchAround(currentRoomId);
 }
 
 function showHelp() {
@@ -347,7 +425,7 @@ function loadGameState() {
             const state = JSON.parse(savedState);
 
             // Validate loaded state (basic check)
-            if (!state.currentRoomId || !roomIndex[state.currentRoomId] || !Array.isArray(state.inventory) || !Array.isArray(state.transformedRooms)) {
+            if (!state.currentRoomId || !roomExists(state.currentRoomId) || !Array.isArray(state.inventory) || !Array.isArray(state.transformedRooms)) {
                  throw new Error("Invalid or corrupted save data.");
             }
 
@@ -542,10 +620,10 @@ function processCommand(cmd) {
                                      commandInput.disabled = true;
                                      return; // End game
                                  }
-                                 if (roomIndex[dest]) {
+                                 if (roomExists(dest)) {
                                      // Prepare to move, but wait for Enter
                                      currentRoomId = dest; // Set the new room ID immediately
-                                     const nextRoomName = roomIndex[dest].id; // Get the name for the message
+                                     const nextRoomName = dest; // Room ids are their names
                                      displayOutput(`You approach the ${exit.name} leading to the ${nextRoomName}...<br>Press ENTER to continue.`, true);
                                      isWaitingForEnter = true;
                                      commandInput.placeholder = "Press ENTER";
@@ -580,10 +658,10 @@ function processCommand(cmd) {
                      commandInput.disabled = true;
                      return; // End game
                  }
-                 if (roomIndex[dest]) {
+                 if (roomExists(dest)) {
                     // Prepare to move, but wait for Enter
                     currentRoomId = dest; // Set the new room ID immediately
-                    const nextRoomName = roomIndex[dest].id; // Get the name for the message
+                    const nextRoomName = dest; // Room ids are their names
                     displayOutput(`You approach the ${exit.name} leading to the ${nextRoomName}...<br>Press ENTER to continue.`, true);
                     isWaitingForEnter = true;
                     commandInput.placeholder = "Press ENTER";
@@ -604,24 +682,42 @@ function processCommand(cmd) {
 
 // --- Initialization ---
 
+// bundle.json is only present when serving the output of build-bundle.py
+async function loadBundle() {
+    try {
+        const response = await fetch('bundle.json', { cache: 'no-cache' });
+        return response.ok ? await response.json() : null;
+    } catch (error) {
+        return null;
+    }
+}
+
 async function loadGame() {
     try {
-        const response = await fetch('rooms.json');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        gameData = await response.json();
+        bundle = await loadBundle();
+        if (bundle) {
+            gameData = { start_room: bundle.start_room, end_room: bundle.end_room };
+            if (bundle.rooms[gameData.start_room]) {
+                await ensureRoom(gameData.start_room);
+            }
+        } else {
+            const response = await fetch('rooms.json');
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            gameData = await response.json();
 
-        // Validate basic structure
-        if (!gameData.start_room || !gameData.rooms) {
-             throw new Error("Invalid game data: Missing 'start_room' or 'rooms'.");
-        }
+            // Validate basic structure
+            if (!gameData.start_room || !gameData.rooms) {
+                 throw new Error("Invalid game data: Missing 'start_room' or 'rooms'.");
+            }
 
-        // Index rooms by ID
-        roomIndex = gameData.rooms.reduce((acc, room) => {
-            acc[room.id] = room;
-            return acc;
-        }, {});
+            // Index rooms by ID
+            roomIndex = gameData.rooms.reduce((acc, room) => {
+                acc[room.id] = room;
+                return acc;
+            }, {});
+        }
 
          if (!roomIndex[gameData.start_room]) {
               throw new Error("Invalid game data: 'start_room' ID not found in rooms list.");